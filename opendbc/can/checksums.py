@@ -0,0 +1,5 @@
+from opendbc.can.checksums_pyx import Checksum, honda_checksum, toyota_checksum, pedal_checksum, volkswagen_mqb_checksum, \
+  xor_checksum, subaru_checksum, chrysler_checksum, hkg_can_fd_checksum, fca_giorgio_checksum  # pylint: disable=no-name-in-module, import-error
+assert Checksum is not None
+assert honda_checksum and toyota_checksum and pedal_checksum and volkswagen_mqb_checksum and xor_checksum
+assert subaru_checksum and chrysler_checksum and hkg_can_fd_checksum and fca_giorgio_checksum
@@ -0,0 +1,90 @@
+# distutils: language = c++
+# cython: c_string_encoding=ascii, language_level=3
+
+from libc.stdint cimport uint8_t, uint32_t
+
+from .common cimport calc_checksum_type, get_checksum_function, Signal, SignalType
+from .common cimport HONDA_CHECKSUM, TOYOTA_CHECKSUM, PEDAL_CHECKSUM, VOLKSWAGEN_MQB_CHECKSUM, XOR_CHECKSUM
+from .common cimport SUBARU_CHECKSUM, CHRYSLER_CHECKSUM, HKG_CAN_FD_CHECKSUM, FCA_GIORGIO_CHECKSUM
+
+import numpy as np
+
+
+cdef class Checksum:
+  """
+  A native checksum function, as used by CANParser and CANPacker. Call it with an
+  address and a payload, or use batch() for many payloads of the same length.
+  checksum_start_bit is only used by xor_checksum, to skip the checksum byte.
+  Payloads too short to hold the checksum raise ValueError.
+  """
+  cdef:
+    calc_checksum_type calc_checksum
+    size_t min_size
+    bint uses_start_bit
+
+  cdef readonly:
+    str name
+
+  @staticmethod
+  cdef Checksum create(str name, SignalType checksum_type, size_t min_size=1, bint uses_start_bit=False):
+    cdef Checksum checksum = Checksum.__new__(Checksum)
+    checksum.name = name
+    checksum.calc_checksum = get_checksum_function(checksum_type)
+    checksum.min_size = min_size
+    checksum.uses_start_bit = uses_start_bit
+    return checksum
+
+  cdef check_size(self, size_t size, int checksum_start_bit):
+    cdef size_t min_size = self.min_size
+    if self.uses_start_bit:
+      if checksum_start_bit < 0:
+        raise ValueError(f"checksum_start_bit must not be negative, got {checksum_start_bit}")
+      min_size = max(min_size, <size_t>(checksum_start_bit // 8 + 1))
+    if size < min_size:
+      raise ValueError(f"{self.name} needs payloads of at least {min_size} bytes, got {size}")
+
+  def __call__(self, uint32_t address, const uint8_t[::1] dat, int checksum_start_bit=0):
+    self.check_size(dat.shape[0], checksum_start_bit)
+    cdef Signal sig
+    sig.start_bit = checksum_start_bit
+    return self.calc_checksum(address, sig, &dat[0], dat.shape[0])
+
+  def batch(self, addresses, dat, int checksum_start_bit=0):
+    """
+    Computes the checksums of an (N, len) uint8 array of payloads. addresses is
+    an array of N addresses, or one address for all of them. Returns N checksums.
+    """
+    dat = np.ascontiguousarray(dat, dtype=np.uint8)
+    if dat.ndim != 2:
+      raise ValueError(f"expected an (N, len) array of payloads, got shape {dat.shape}")
+    addresses = np.ascontiguousarray(np.broadcast_to(addresses, dat.shape[:1]), dtype=np.uint32)
+
+    self.check_size(dat.shape[1], checksum_start_bit)
+    cdef const uint8_t[:, ::1] dat_v = dat
+    cdef const uint32_t[::1] addresses_v = addresses
+    ret = np.empty(dat.shape[0], dtype=np.uint32)
+    cdef uint32_t[::1] ret_v = ret
+
+    cdef Signal sig
+    sig.start_bit = checksum_start_bit
+    cdef size_t i
+    cdef size_t size = dat_v.shape[1]
+    with nogil:
+      for i in range(<size_t>dat_v.shape[0]):
+        ret_v[i] = self.calc_checksum(addresses_v[i], sig, &dat_v[i, 0], size)
+    return ret
+
+  def __repr__(self):
+    return f"<Checksum {self.name}>"
+
+
+honda_checksum = Checksum.create("honda_checksum", HONDA_CHECKSUM)
+toyota_checksum = Checksum.create("toyota_checksum", TOYOTA_CHECKSUM)
+pedal_checksum = Checksum.create("pedal_checksum", PEDAL_CHECKSUM)
+# the counter in the second byte is part of the CRC
+volkswagen_mqb_checksum = Checksum.create("volkswagen_mqb_checksum", VOLKSWAGEN_MQB_CHECKSUM, 2)
+xor_checksum = Checksum.create("xor_checksum", XOR_CHECKSUM, 1, True)
+subaru_checksum = Checksum.create("subaru_checksum", SUBARU_CHECKSUM)
+chrysler_checksum = Checksum.create("chrysler_checksum", CHRYSLER_CHECKSUM)
+hkg_can_fd_checksum = Checksum.create("hkg_can_fd_checksum", HKG_CAN_FD_CHECKSUM)
+fca_giorgio_checksum = Checksum.create("fca_giorgio_checksum", FCA_GIORGIO_CHECKSUM)
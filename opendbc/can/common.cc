@@ -1,16 +1,53 @@
 #include <array>
+#include <cstring>
 #include <unordered_map>
 
 #include "opendbc/can/common.h"
 
-unsigned int honda_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+// The additive checksums below work on 8 bytes at a time: bytes are summed as
+// SIMD-within-a-register lanes, which can't overflow for 8 byte words.
+static inline uint64_t load_word(const uint8_t *d) {
+  uint64_t w;
+  memcpy(&w, d, sizeof(w));
+  return w;
+}
+
+// sum of the bytes d[0..n)
+static inline unsigned int byte_sum(const uint8_t *d, size_t n) {
+  const uint64_t lanes = 0x00FF00FF00FF00FFULL;
+  unsigned int s = 0;
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    const uint64_t w = load_word(d + i);
+    // four 16 bit lanes of at most 2 * 0xFF, summed into the top lane
+    const uint64_t pairs = (w & lanes) + ((w >> 8) & lanes);
+    s += (pairs * 0x0001000100010001ULL) >> 48;
+  }
+  for (; i < n; i++) { s += d[i]; }
+  return s;
+}
+
+// sum of the nibbles of d[0..n)
+static inline unsigned int nibble_sum(const uint8_t *d, size_t n) {
+  const uint64_t lanes = 0x0F0F0F0F0F0F0F0FULL;
+  unsigned int s = 0;
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    const uint64_t w = load_word(d + i);
+    // eight 8 bit lanes of at most 2 * 0xF, summed into the top lane
+    const uint64_t bytes = (w & lanes) + ((w >> 4) & lanes);
+    s += (bytes * 0x0101010101010101ULL) >> 56;
+  }
+  for (; i < n; i++) { s += (d[i] & 0xF) + (d[i] >> 4); }
+  return s;
+}
+
+unsigned int honda_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
   int s = 0;
   bool extended = address > 0x7FF;
   while (address) { s += (address & 0xF); address >>= 4; }
-  for (int i = 0; i < d.size(); i++) {
-    uint8_t x = d[i];
-    if (i == d.size()-1) x >>= 4; // remove checksum
-    s += (x & 0xF) + (x >> 4);
+  if (size > 0) {
+    s += nibble_sum(d, size) - (d[size - 1] & 0xF);  // remove checksum
   }
   s = 8-s;
   if (extended) s += 3;  // extended can
@@ -18,60 +55,44 @@ unsigned int honda_checksum(uint32_t address, const Signal &sig, const std::vect
   return s & 0xF;
 }
 
-unsigned int toyota_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
-  unsigned int s = d.size();
+unsigned int toyota_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
+  unsigned int s = size;
   while (address) { s += address & 0xFF; address >>= 8; }
-  for (int i = 0; i < d.size() - 1; i++) { s += d[i]; }
+  if (size > 0) {
+    s += byte_sum(d, size) - d[size - 1];  // skip checksum in last byte
+  }
 
   return s & 0xFF;
 }
 
-unsigned int subaru_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int subaru_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
   unsigned int s = 0;
   while (address) { s += address & 0xFF; address >>= 8; }
 
   // skip checksum in first byte
-  for (int i = 1; i < d.size(); i++) { s += d[i]; }
+  if (size > 0) {
+    s += byte_sum(d, size) - d[0];
+  }
 
   return s & 0xFF;
 }
 
-unsigned int chrysler_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+// Static lookup table for fast computation of CRCs
+uint8_t crc8_lut_8h2f[256]; // CRC8 poly 0x2F, aka 8H2F/AUTOSAR
+uint8_t crc8_lut_j1850[256]; // CRC8 poly 0x1D, aka SAE J1850
+uint8_t crc8_lut_d5[256]; // CRC8 poly 0xD5
+uint16_t crc16_lut_xmodem[256]; // CRC16 poly 0x1021, aka XMODEM
+
+unsigned int chrysler_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
   // jeep chrysler canbus checksum from http://illmatics.com/Remote%20Car%20Hacking.pdf
+  // is a CRC-8 SAE J1850 with init 0xFF over the payload without the checksum byte
   uint8_t checksum = 0xFF;
-  for (int j = 0; j < (d.size() - 1); j++) {
-    uint8_t shift = 0x80;
-    uint8_t curr = d[j];
-    for (int i = 0; i < 8; i++) {
-      uint8_t bit_sum = curr & shift;
-      uint8_t temp_chk = checksum & 0x80U;
-      if (bit_sum != 0U) {
-        bit_sum = 0x1C;
-        if (temp_chk != 0U) {
-          bit_sum = 1;
-        }
-        checksum = checksum << 1;
-        temp_chk = checksum | 1U;
-        bit_sum ^= temp_chk;
-      } else {
-        if (temp_chk != 0U) {
-          bit_sum = 0x1D;
-        }
-        checksum = checksum << 1;
-        bit_sum ^= checksum;
-      }
-      checksum = bit_sum;
-      shift = shift >> 1;
-    }
+  for (size_t i = 0; i + 1 < size; i++) {
+    checksum = crc8_lut_j1850[checksum ^ d[i]];
   }
   return ~checksum & 0xFF;
 }
 
-// Static lookup table for fast computation of CRCs
-uint8_t crc8_lut_8h2f[256]; // CRC8 poly 0x2F, aka 8H2F/AUTOSAR
-uint8_t crc8_lut_j1850[256]; // CRC8 poly 0x1D, aka SAE J1850
-uint16_t crc16_lut_xmodem[256]; // CRC16 poly 0x1021, aka XMODEM
-
 void gen_crc_lookup_table_8(uint8_t poly, uint8_t crc_lut[]) {
   uint8_t crc;
   int i, j;
@@ -110,6 +131,7 @@ struct CrcInitializer {
   CrcInitializer() {
     gen_crc_lookup_table_8(0x2F, crc8_lut_8h2f);  // CRC-8 8H2F/AUTOSAR for Volkswagen
     gen_crc_lookup_table_8(0x1D, crc8_lut_j1850);  // CRC-8 SAE-J1850
+    gen_crc_lookup_table_8(0xD5, crc8_lut_d5);  // CRC-8 for the comma pedal
     gen_crc_lookup_table_16(0x1021, crc16_lut_xmodem);  // CRC-16 XMODEM for HKG CAN FD
   }
 };
@@ -142,13 +164,13 @@ static const std::unordered_map<uint32_t, std::array<uint8_t, 16>> volkswagen_mq
   {0x65D, {0xAC, 0xB3, 0xAB, 0xEB, 0x7A, 0xE1, 0x3B, 0xF7, 0x73, 0xBA, 0x7C, 0x9E, 0x06, 0x5F, 0x02, 0xD9}},  // ESP_20
 };
 
-unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
   // This is AUTOSAR E2E Profile 2, CRC-8H2F with a "data ID" (varying by message/counter) appended to the payload
 
   uint8_t crc = 0xFF; // CRC-8H2F initial value
 
   // CRC over payload first, skipping the first byte where the CRC lives
-  for (int i = 1; i < d.size(); i++) {
+  for (int i = 1; i < size; i++) {
     crc ^= d[i];
     crc = crc8_lut_8h2f[crc];
   }
@@ -166,42 +188,52 @@ unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const
   return crc ^ 0xFF; // CRC-8H2F final XOR
 }
 
-unsigned int xor_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
-  uint8_t checksum = 0;
-  int checksum_byte = sig.start_bit / 8;
+unsigned int xor_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
+  size_t checksum_byte = sig.start_bit / 8;
 
   // Simple XOR over the payload, except for the byte where the checksum lives.
-  for (int i = 0; i < d.size(); i++) {
-    if (i != checksum_byte) {
-      checksum ^= d[i];
+  if (size < 8) {
+    uint8_t checksum = 0;
+    for (size_t i = 0; i < size; i++) {
+      if (i != checksum_byte) {
+        checksum ^= d[i];
+      }
     }
+    return checksum;
   }
 
+  // longer payloads are XORed a word at a time, then folded down to a byte
+  uint64_t x = 0;
+  size_t i = 0;
+  for (; i + 8 <= size; i += 8) {
+    x ^= load_word(d + i);
+  }
+  for (; i < size; i++) { x ^= d[i]; }
+  x ^= x >> 32;
+  x ^= x >> 16;
+  x ^= x >> 8;
+
+  uint8_t checksum = x & 0xFF;
+  if (checksum_byte < size) {
+    checksum ^= d[checksum_byte];
+  }
   return checksum;
 }
 
-unsigned int pedal_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
-  uint8_t crc = 0xFF;
-  uint8_t poly = 0xD5; // standard crc8
+unsigned int pedal_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
+  uint8_t crc = 0xFF; // standard crc8, poly 0xD5
 
   // skip checksum byte
-  for (int i = d.size()-2; i >= 0; i--) {
-    crc ^= d[i];
-    for (int j = 0; j < 8; j++) {
-      if ((crc & 0x80) != 0) {
-        crc = (uint8_t)((crc << 1) ^ poly);
-      } else {
-        crc <<= 1;
-      }
-    }
+  for (int i = (int)size - 2; i >= 0; i--) {
+    crc = crc8_lut_d5[crc ^ d[i]];
   }
   return crc;
 }
 
-unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
   uint16_t crc = 0;
 
-  for (int i = 2; i < d.size(); i++) {
+  for (int i = 2; i < size; i++) {
     crc = (crc << 8) ^ crc16_lut_xmodem[(crc >> 8) ^ d[i]];
   }
 
@@ -209,24 +241,24 @@ unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const std:
   crc = (crc << 8) ^ crc16_lut_xmodem[(crc >> 8) ^ ((address >> 0) & 0xFF)];
   crc = (crc << 8) ^ crc16_lut_xmodem[(crc >> 8) ^ ((address >> 8) & 0xFF)];
 
-  if (d.size() == 8) {
+  if (size == 8) {
     crc ^= 0x5f29;
-  } else if (d.size() == 16) {
+  } else if (size == 16) {
     crc ^= 0x041d;
-  } else if (d.size() == 24) {
+  } else if (size == 24) {
     crc ^= 0x819d;
-  } else if (d.size() == 32) {
+  } else if (size == 32) {
     crc ^= 0x9f5b;
   }
 
   return crc;
 }
 
-unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size) {
   // CRC is in the last byte, poly is same as SAE J1850 but uses a different init value and final XOR
   uint8_t crc = 0x00;
 
-  for (int i = 0; i < d.size() - 1; i++) {
+  for (size_t i = 0; i + 1 < size; i++) {
     crc ^= d[i];
     crc = crc8_lut_j1850[crc];
   }
@@ -243,3 +275,18 @@ unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const std
   }
 
 }
+
+calc_checksum_type get_checksum_function(SignalType type) {
+  switch (type) {
+    case HONDA_CHECKSUM: return &honda_checksum;
+    case TOYOTA_CHECKSUM: return &toyota_checksum;
+    case PEDAL_CHECKSUM: return &pedal_checksum;
+    case VOLKSWAGEN_MQB_CHECKSUM: return &volkswagen_mqb_checksum;
+    case XOR_CHECKSUM: return &xor_checksum;
+    case SUBARU_CHECKSUM: return &subaru_checksum;
+    case CHRYSLER_CHECKSUM: return &chrysler_checksum;
+    case HKG_CAN_FD_CHECKSUM: return &hkg_can_fd_checksum;
+    case FCA_GIORGIO_CHECKSUM: return &fca_giorgio_checksum;
+    default: return nullptr;
+  }
+}
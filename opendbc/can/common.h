@@ -16,17 +16,57 @@
 
 #define MAX_BAD_COUNTER 5
 #define CAN_INVALID_CNT 5
+#define STD_ADDRESS_COUNT 0x800  // 11-bit CAN identifiers
 
 // Car specific functions
-unsigned int honda_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int toyota_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int subaru_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int chrysler_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int xor_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int pedal_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
+unsigned int honda_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+unsigned int toyota_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+unsigned int subaru_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+unsigned int chrysler_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+unsigned int xor_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+unsigned int pedal_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+
+// Vector versions of the checksum functions, for existing callers
+#define VECTOR_CHECKSUM(name)                                                                     \
+  inline unsigned int name(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) { \
+    return name(address, sig, d.data(), d.size());                                                \
+  }
+VECTOR_CHECKSUM(honda_checksum)
+VECTOR_CHECKSUM(toyota_checksum)
+VECTOR_CHECKSUM(subaru_checksum)
+VECTOR_CHECKSUM(chrysler_checksum)
+VECTOR_CHECKSUM(volkswagen_mqb_checksum)
+VECTOR_CHECKSUM(xor_checksum)
+VECTOR_CHECKSUM(hkg_can_fd_checksum)
+VECTOR_CHECKSUM(fca_giorgio_checksum)
+VECTOR_CHECKSUM(pedal_checksum)
+#undef VECTOR_CHECKSUM
+
+int64_t get_raw_value(const uint8_t *msg, size_t msg_size, const Signal &sig);
+int64_t get_raw_value(const std::vector<uint8_t> &msg, const Signal &sig);
+void set_value(uint8_t *msg, size_t msg_size, const Signal &sig, int64_t ival);
+void set_value(std::vector<uint8_t> &msg, const Signal &sig, int64_t ival);
+
+// A Signal compiled into a 64-bit load plus shift and mask, see compile_signal.
+// Signals spanning 9 bytes (up to 7 bits of offset plus 64 bits of size) also
+// take the top bits from the byte past the loaded word. Scaling is copied from
+// the Signal so decoding only touches it for checksums and counters.
+struct SignalPlan {
+  uint8_t load_offset;  // into MessageState::frame_buf
+  uint8_t shift;
+  uint8_t last_byte;  // frames that end before this byte take the byte-wise get_raw_value path
+  bool big_endian;
+  bool two_words;
+  bool checked;  // checksum or counter signal
+  uint64_t mask;
+  uint64_t sign_bit;  // 0 for unsigned signals
+  double factor, offset;
+};
+
+SignalPlan compile_signal(const Signal &sig);
 
 struct CanFrame {
   long src;
@@ -39,6 +79,72 @@ struct CanData {
   std::vector<CanFrame> frames;
 };
 
+// Packed frame record for zero-copy ingestion, read in place from a caller owned
+// buffer. Matches CAN_FRAME_DTYPE in parser_pyx.pyx.
+struct CanFrameRecord {
+  uint32_t address;
+  uint8_t src;
+  uint8_t len;
+  uint8_t dat[64];
+};
+
+struct CanDataView {
+  uint64_t nanos;
+  const CanFrameRecord *frames;
+  size_t size;
+};
+
+// A whole log of CAN frames in columnar form. Payload i is lengths[i] bytes
+// at dat + i * dat_stride.
+struct CanBatch {
+  size_t size;
+  const uint64_t *nanos;
+  const uint32_t *addresses;
+  const uint8_t *buses;
+  const uint8_t *lengths;
+  const uint8_t *dat;
+  size_t dat_stride;
+};
+
+// Caller owned output of CANParser::decode_batch for one message, sized with
+// CANParser::count_batch. values holds one row of count values per signal.
+struct BatchColumns {
+  size_t count;
+  uint64_t *ts_nanos;
+  double *values;
+  uint8_t *checksum_valid;
+  uint8_t *counter_valid;
+};
+
+// Health counters of one message, kept for the lifetime of the parser.
+// Intervals are measured between frames that passed their checks.
+struct MessageStats {
+  uint64_t frames = 0;  // received, including failed and oversize ones
+  uint64_t checksum_failures = 0;
+  uint64_t counter_failures = 0;  // counter jumps, not only the ones that made the message invalid
+  uint64_t oversize_frames = 0;  // longer than 64 bytes, dropped
+  uint64_t timeouts = 0;  // gaps longer than check_threshold
+  uint64_t intervals = 0;
+  uint64_t interval_min_nanos = 0;
+  uint64_t interval_max_nanos = 0;
+  uint64_t interval_sum_nanos = 0;
+};
+
+// Caller owned output of CANParser::message_stats, one entry per message in
+// address order, sized with CANParser::message_count. A message that is timed
+// out at the time of the snapshot counts as one more timeout.
+struct StatsColumns {
+  uint32_t *address;
+  uint64_t *frames;
+  uint64_t *checksum_failures;
+  uint64_t *counter_failures;
+  uint64_t *oversize_frames;
+  uint64_t *timeouts;
+  uint64_t *interval_min_nanos;
+  double *interval_mean_nanos;
+  uint64_t *interval_max_nanos;
+};
+
 class MessageState {
 public:
   std::string name;
@@ -58,7 +164,26 @@ public:
   bool ignore_checksum = false;
   bool ignore_counter = false;
 
-  bool parse(uint64_t nanos, const std::vector<uint8_t> &dat);
+  MessageStats stats;
+
+  // compiled parse_sigs, and scratch storage reused across decodes. Payloads are
+  // copied into frame_buf after 8 bytes of padding, so every 64-bit load stays
+  // in bounds whatever the signal position.
+  std::vector<SignalPlan> plans;
+  std::vector<double> decoded_vals;
+  uint8_t frame_buf[8 + 64 + 8] = {};
+
+  // value tables of the parse_sigs read as labels (nullptr for the others), and
+  // the CANParser::label_names id of each table's first label
+  std::vector<const std::vector<ValueLabel> *> label_tables;
+  std::vector<int> label_ids;
+
+  void compile_plans();
+  // -1 if signal i isn't read as a label, 0 if its value has no label
+  int label_id(size_t i) const;
+
+  bool parse(uint64_t nanos, const uint8_t *dat, size_t dat_size);
+  void decode(const uint8_t *dat, size_t dat_size, double *out, size_t out_stride, bool &checksum_failed, bool &counter_failed);
   bool update_counter_generic(int64_t v, int cnt_size);
 };
 
@@ -68,6 +193,20 @@ private:
   const DBC *dbc = NULL;
   std::unordered_map<uint32_t, MessageState> message_states;
 
+  // Built once message_states is final. Standard 11-bit addresses index straight
+  // into std_lookup, extended ones are binary searched in the sorted ext_lookup.
+  std::vector<MessageState *> std_lookup;
+  std::vector<std::pair<uint32_t, MessageState *>> ext_lookup;
+
+  // Incremental validity for UpdateValid: a lazy min-heap of message deadlines
+  // (last_seen_nanos + check_threshold, stale entries are dropped when they
+  // reach the top) and running tallies of missing and counter failed messages.
+  std::vector<std::pair<uint64_t, MessageState *>> deadlines;
+  size_t checked_count = 0;
+  size_t missing_count = 0;
+  size_t counter_fail_count = 0;
+  uint64_t max_seen_nanos = 0;
+
 public:
   bool can_valid = false;
   bool bus_timeout = false;
@@ -76,26 +215,94 @@ public:
   uint64_t last_nonempty_nanos = 0;
   uint64_t bus_timeout_threshold = 0;
   uint64_t can_invalid_cnt = CAN_INVALID_CNT;
+  // labels of the signals read as labels, id 0 is for values without one
+  std::vector<std::string> label_names = {""};
 
+  // signals optionally limits which signals of a message are decoded, its
+  // checksum and counter are always included. labels lists signals with a
+  // VAL_ table whose values are also reported as SignalValue::label_id.
   CANParser(int abus, const std::string& dbc_name,
-            const std::vector<std::pair<uint32_t, int>> &messages);
+            const std::vector<std::pair<uint32_t, int>> &messages,
+            const std::unordered_map<uint32_t, std::vector<std::string>> &signals = {},
+            const std::unordered_map<uint32_t, std::vector<std::string>> &labels = {});
   CANParser(int abus, const std::string& dbc_name, bool ignore_checksum, bool ignore_counter);
+  CANParser(const CANParser&) = delete;
+  CANParser& operator=(const CANParser&) = delete;
   void update(const std::vector<CanData> &can_data, std::vector<SignalValue> &vals);
+  void update(const std::vector<CanDataView> &can_data, std::vector<SignalValue> &vals);
   void query_latest(std::vector<SignalValue> &vals, uint64_t last_ts = 0);
+  // Lazy alternative to update + query_latest: only reports which messages were
+  // updated, values are read from message_state. all_vals hold the frames of the
+  // last update, until the next one.
+  void update_addresses(const std::vector<CanData> &can_data, std::vector<uint32_t> &addresses);
+  void update_addresses(const std::vector<CanDataView> &can_data, std::vector<uint32_t> &addresses);
+  void query_updated(std::vector<uint32_t> &addresses, uint64_t last_ts = 0);
+  const MessageState *message_state(uint32_t address) const;
+  void count_batch(const CanBatch &batch, std::unordered_map<uint32_t, size_t> &counts) const;
+  void decode_batch(const CanBatch &batch, std::unordered_map<uint32_t, BatchColumns> &columns) const;
+  std::vector<std::string> signal_names(uint32_t address) const;
+  size_t message_count() const;
+  void message_stats(StatsColumns &columns) const;
 
 protected:
-  void UpdateCans(const CanData &can);
+  void build_lookup();
+  void add_labels(const std::unordered_map<uint32_t, std::vector<std::string>> &labels);
+  void track_parsed(MessageState *state, uint64_t prev_seen_nanos, bool prev_counter_failed);
+  void rebuild_deadlines();
+  bool deadline_passed(uint64_t nanos);
+  MessageState *find_state(uint32_t address) const;
+  bool batch_frame_tracked(const CanBatch &batch, size_t i) const;
+  template <typename Data>
+  uint64_t UpdateAll(const std::vector<Data> &can_data);
+  void clear_all_values();
+  template <typename Frame>
+  void UpdateCans(uint64_t nanos, const Frame *frames, size_t size);
   void UpdateValid(uint64_t nanos);
 };
 
+struct PackRequest {
+  uint32_t address;
+  std::vector<SignalPackValue> values;
+};
+
+// A message with its signals resolved once by CANPacker::prepare, so packing it
+// takes no string hashing or map lookups besides the counter.
+struct PreparedMessage {
+  uint32_t address;
+  unsigned int size;
+  std::vector<const Signal *> signals;
+  int counter_index = -1;  // in signals, if the caller sets COUNTER
+  const Signal *counter = nullptr;
+  const Signal *checksum = nullptr;
+};
+
 class CANPacker {
 private:
   const DBC *dbc = NULL;
   std::map<std::pair<uint32_t, std::string>, Signal> signal_lookup;
   std::map<uint32_t, uint32_t> counters;
 
+  const Signal *lookup_signal(uint32_t address, const std::string &name) const;
+  // these write a whole payload of the message's size to out
+  void pack_message(uint32_t address, const std::vector<SignalPackValue> &signals, uint8_t *out, size_t size);
+  // values[i * stride] is the value of prepared.signals[i]
+  void pack_row(const PreparedMessage &prepared, const double *values, size_t stride, uint8_t *out);
+  void finish(uint32_t address, const Signal *counter_sig, const Signal *checksum_sig, bool counter_set,
+              uint8_t *msg, size_t size);
+
 public:
   CANPacker(const std::string& dbc_name);
   std::vector<uint8_t> pack(uint32_t address, const std::vector<SignalPackValue> &values);
+  void pack_into(uint32_t address, const std::vector<SignalPackValue> &values, std::vector<uint8_t> &out);
+  // packs every request back to back into buffer, message i is [offsets[i], offsets[i + 1])
+  void pack_many(const std::vector<PackRequest> &requests, std::vector<uint8_t> &buffer, std::vector<size_t> &offsets);
+  // the result is owned by the caller and only valid while this packer is alive,
+  // pack_prepared takes one value per signal name
+  PreparedMessage prepare(uint32_t address, const std::vector<std::string> &signal_names) const;
+  void pack_prepared(const PreparedMessage &prepared, const double *values, std::vector<uint8_t> &out);
+  // packs count payloads of one message into out, which holds count * size bytes.
+  // values is signal-major: values[i * count + row] is signal i of row row
+  void pack_columns(uint32_t address, const std::vector<std::string> &signal_names, const double *values,
+                    size_t count, uint8_t *out);
   const Msg* lookup_message(uint32_t address);
 };
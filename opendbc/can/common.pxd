@@ -1,7 +1,7 @@
 # distutils: language = c++
 # cython: language_level=3
 
-from libc.stdint cimport uint8_t, uint32_t, uint64_t
+from libc.stdint cimport int64_t, uint8_t, uint32_t, uint64_t
 from libcpp cimport bool
 from libcpp.pair cimport pair
 from libcpp.string cimport string
@@ -9,7 +9,7 @@ from libcpp.vector cimport vector
 from libcpp.unordered_map cimport unordered_map
 
 
-ctypedef unsigned int (*calc_checksum_type)(uint32_t, const Signal&, const vector[uint8_t] &)
+ctypedef unsigned int (*calc_checksum_type)(uint32_t, const Signal&, const uint8_t *, size_t) noexcept nogil
 
 cdef extern from "common_dbc.h":
   ctypedef enum SignalType:
@@ -40,11 +40,16 @@ cdef extern from "common_dbc.h":
     unsigned int size
     vector[Signal] sigs
 
+  cdef struct ValueLabel:
+    int64_t value
+    string label
+
   cdef struct Val:
     string name
     uint32_t address
     string def_val
     vector[Signal] sigs
+    vector[ValueLabel] labels
 
   cdef struct DBC:
     string name
@@ -59,11 +64,23 @@ cdef extern from "common_dbc.h":
     string name
     double value
     vector[double] all_values
+    int label_id
 
   cdef struct SignalPackValue:
     string name
     double value
 
+  calc_checksum_type get_checksum_function(SignalType)
+
+  cdef struct DBCStats:
+    string name
+    string path
+    double load_ms
+    size_t memory_bytes
+
+  void dbc_preload(const vector[string]&, int) except + nogil
+  vector[DBCStats] dbc_loaded() except +
+
 
 cdef extern from "common.h":
   cdef const DBC* dbc_lookup(const string) except +
@@ -77,12 +94,79 @@ cdef extern from "common.h":
     uint64_t nanos
     vector[CanFrame] frames
 
+  cdef struct CanFrameRecord:
+    uint32_t address
+    uint8_t src
+    uint8_t len
+    uint8_t dat[64]
+
+  cdef struct CanDataView:
+    uint64_t nanos
+    const CanFrameRecord *frames
+    size_t size
+
+  cdef struct CanBatch:
+    size_t size
+    const uint64_t *nanos
+    const uint32_t *addresses
+    const uint8_t *buses
+    const uint8_t *lengths
+    const uint8_t *dat
+    size_t dat_stride
+
+  cdef struct BatchColumns:
+    size_t count
+    uint64_t *ts_nanos
+    double *values
+    uint8_t *checksum_valid
+    uint8_t *counter_valid
+
+  cdef struct StatsColumns:
+    uint32_t *address
+    uint64_t *frames
+    uint64_t *checksum_failures
+    uint64_t *counter_failures
+    uint64_t *oversize_frames
+    uint64_t *timeouts
+    uint64_t *interval_min_nanos
+    double *interval_mean_nanos
+    uint64_t *interval_max_nanos
+
+  cdef cppclass MessageState:
+    vector[Signal] parse_sigs
+    vector[double] vals
+    vector[vector[double]] all_vals
+    uint64_t last_seen_nanos
+    int label_id(size_t)
+
   cdef cppclass CANParser:
     bool can_valid
     bool bus_timeout
-    CANParser(int, string, vector[pair[uint32_t, int]]) except +
+    vector[string] label_names
+    CANParser(int, string, vector[pair[uint32_t, int]], unordered_map[uint32_t, vector[string]],
+              unordered_map[uint32_t, vector[string]]) except +
     void update(vector[CanData]&, vector[SignalValue]&) except +
+    void update(vector[CanDataView]&, vector[SignalValue]&) except +
+    void update_addresses(vector[CanData]&, vector[uint32_t]&) except +
+    void update_addresses(vector[CanDataView]&, vector[uint32_t]&) except +
+    const MessageState *message_state(uint32_t)
+    void count_batch(CanBatch&, unordered_map[uint32_t, size_t]&)
+    void decode_batch(CanBatch&, unordered_map[uint32_t, BatchColumns]&)
+    vector[string] signal_names(uint32_t)
+    size_t message_count()
+    void message_stats(StatsColumns&)
+
+  cdef struct PackRequest:
+    uint32_t address
+    vector[SignalPackValue] values
+
+  cdef cppclass PreparedMessage:
+    uint32_t address
 
   cdef cppclass CANPacker:
    CANPacker(string)
    vector[uint8_t] pack(uint32_t, vector[SignalPackValue]&)
+   void pack_many(vector[PackRequest]&, vector[uint8_t]&, vector[size_t]&)
+   PreparedMessage prepare(uint32_t, vector[string]&) except +
+   void pack_prepared(PreparedMessage&, const double *, vector[uint8_t]&)
+   void pack_columns(uint32_t, vector[string]&, const double *, size_t, uint8_t *) except +
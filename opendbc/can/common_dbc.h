@@ -16,6 +16,7 @@ struct SignalValue {
   std::string name;
   double value;  // latest value
   std::vector<double> all_values;  // all values from this cycle
+  int label_id = -1;  // of value in CANParser::label_names, if the signal is read as a label
 };
 
 enum SignalType {
@@ -32,6 +33,9 @@ enum SignalType {
   FCA_GIORGIO_CHECKSUM,
 };
 
+struct Signal;
+typedef unsigned int (*calc_checksum_type)(uint32_t address, const Signal &sig, const uint8_t *d, size_t size);
+
 struct Signal {
   std::string name;
   int start_bit, msb, lsb, size;
@@ -39,7 +43,7 @@ struct Signal {
   double factor, offset;
   bool is_little_endian;
   SignalType type;
-  unsigned int (*calc_checksum)(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
+  calc_checksum_type calc_checksum;
 };
 
 struct Msg {
@@ -49,11 +53,17 @@ struct Msg {
   std::vector<Signal> sigs;
 };
 
+struct ValueLabel {
+  int64_t value;
+  std::string label;
+};
+
 struct Val {
   std::string name;
   uint32_t address;
   std::string def_val;
   std::vector<Signal> sigs;
+  std::vector<ValueLabel> labels;  // def_val as a table sorted by value, see parse_value_labels
 };
 
 struct DBC {
@@ -71,10 +81,31 @@ typedef struct ChecksumState {
   int counter_start_bit;
   bool little_endian;
   SignalType checksum_type;
-  unsigned int (*calc_checksum)(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
+  calc_checksum_type calc_checksum;
 } ChecksumState;
 
+ChecksumState* get_checksum(const std::string& dbc_name);
+calc_checksum_type get_checksum_function(SignalType type);
+void set_signal_type(Signal& s, ChecksumState* chk, const std::string& dbc_name, int line_num);
+
+std::vector<ValueLabel> parse_value_labels(const std::string &def_val);
+// returns nullptr if value has no label
+const ValueLabel *find_value_label(const std::vector<ValueLabel> &labels, int64_t value);
+
+// A DBC held by the dbc_lookup registry
+struct DBCStats {
+  std::string name;
+  std::string path;
+  double load_ms;  // time spent parsing the DBC or loading its cache
+  size_t memory_bytes;  // estimated heap footprint of the parsed DBC
+};
+
 DBC* dbc_parse(const std::string& dbc_path);
+DBC* dbc_parse_cached(const std::string& dbc_path);
 DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, ChecksumState *checksum = nullptr, bool allow_duplicate_msg_name=false);
 const DBC* dbc_lookup(const std::string& dbc_name);
+// loads DBCs ahead of their first dbc_lookup, num_threads = 0 uses one thread per core
+void dbc_preload(const std::vector<std::string>& dbc_names, int num_threads = 0);
+std::vector<DBCStats> dbc_loaded();
+size_t dbc_memory_usage(const DBC &dbc);
 std::vector<std::string> get_dbc_names();
@@ -1,10 +1,19 @@
 #include <algorithm>
+#include <atomic>
+#include <cctype>
+#include <chrono>
+#include <cstdlib>
 #include <filesystem>
 #include <fstream>
+#include <future>
 #include <map>
-#include <regex>
+#include <memory>
 #include <set>
 #include <sstream>
+#include <string_view>
+#include <thread>
+#include <unordered_map>
+#include <utility>
 #include <vector>
 #include <mutex>
 #include <iterator>
@@ -14,12 +23,6 @@
 #include "opendbc/can/common.h"
 #include "opendbc/can/common_dbc.h"
 
-std::regex bo_regexp(R"(^BO_ (\w+) (\w+) *: (\w+) (\w+))");
-std::regex sg_regexp(R"(^SG_ (\w+) : (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*))");
-std::regex sgm_regexp(R"(^SG_ (\w+) (\w+) *: (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*))");
-std::regex val_regexp(R"(VAL_ (\w+) (\w+) (\s*[-+]?[0-9]+\s+\".+?\"[^;]*))");
-std::regex val_split_regexp{R"([\"]+)"};  // split on "
-
 #define DBC_ASSERT(condition, message)                             \
   do {                                                             \
     if (!(condition)) {                                            \
@@ -44,9 +47,220 @@ inline bool endswith(const std::string& str, const char* suffix) {
   return str.find(suffix, 0) == (str.length() - strlen(suffix));
 }
 
-inline std::string& trim(std::string& s, const char* t = " \t\n\r\f\v") {
-  s.erase(s.find_last_not_of(t) + 1);
-  return s.erase(0, s.find_first_not_of(t));
+inline std::string_view trim(std::string_view s, const char* t = " \t\n\r\f\v") {
+  size_t start = s.find_first_not_of(t);
+  if (start == std::string_view::npos) return {};
+  return s.substr(start, s.find_last_not_of(t) - start + 1);
+}
+
+inline bool is_word_char(char c) {
+  return (c >= '0' && c <= '9') || (c >= 'A' && c <= 'Z') || (c >= 'a' && c <= 'z') || c == '_';
+}
+
+inline bool is_digit_char(char c) {
+  return c >= '0' && c <= '9';
+}
+
+inline bool is_number_char(char c) {
+  return is_digit_char(c) || c == '.' || c == '+' || c == '-' || c == 'e' || c == 'E';
+}
+
+inline bool is_space_char(char c) {
+  return c == ' ' || c == '\t' || c == '\n' || c == '\r' || c == '\f' || c == '\v';
+}
+
+// Single pass tokenizer over one line of a DBC file. It accepts exactly the
+// grammar of the BO_, SG_ and VAL_ regexes it replaced: every method consumes
+// one token from the front of the line, and returns false without consuming
+// anything if the token isn't there.
+class LineTokenizer {
+public:
+  explicit LineTokenizer(std::string_view line) : s(line) {}
+
+  bool empty() const { return s.empty(); }
+  std::string_view rest() const { return s; }
+
+  bool literal(std::string_view lit) {
+    if (s.substr(0, lit.size()) != lit) return false;
+    s.remove_prefix(lit.size());
+    return true;
+  }
+
+  bool one_of(const char *chars, char &out) {
+    if (s.empty() || s.front() == '\0' || strchr(chars, s.front()) == nullptr) return false;
+    out = s.front();
+    s.remove_prefix(1);
+    return true;
+  }
+
+  void spaces() { take_while(' '); }
+
+  // \w+
+  bool word(std::string_view &out) { return take_while(out, is_word_char); }
+
+  // \d+, converted to an integer
+  template <typename T>
+  bool integer(T &out) {
+    std::string_view digits;
+    if (!take_while(digits, is_digit_char)) return false;
+    out = parse_integer<T>(digits);
+    return true;
+  }
+
+  // [0-9.+\-eE]+, converted to a double
+  bool number(double &out) {
+    std::string_view token;
+    if (!take_while(token, is_number_char)) return false;
+    // the token is always followed by a delimiter strtod doesn't accept, so it can't read past it
+    char *end = nullptr;
+    out = std::strtod(token.data(), &end);
+    return end != token.data();
+  }
+
+  // leading digits of a word, like std::stoul on a \w+ token
+  template <typename T>
+  static bool parse_leading_integer(std::string_view token, T &out) {
+    size_t n = 0;
+    while (n < token.size() && is_digit_char(token[n])) n++;
+    if (n == 0) return false;
+    out = parse_integer<T>(token.substr(0, n));
+    return true;
+  }
+
+private:
+  template <typename T>
+  static T parse_integer(std::string_view digits) {
+    uint64_t v = 0;
+    for (char c : digits) v = v * 10 + (c - '0');
+    return v;
+  }
+
+  void take_while(char c) {
+    size_t n = 0;
+    while (n < s.size() && s[n] == c) n++;
+    s.remove_prefix(n);
+  }
+
+  template <typename Pred>
+  bool take_while(std::string_view &out, Pred pred) {
+    size_t n = 0;
+    while (n < s.size() && pred(s[n])) n++;
+    if (n == 0) return false;
+    out = s.substr(0, n);
+    s.remove_prefix(n);
+    return true;
+  }
+
+  std::string_view s;
+};
+
+// BO_ <address> <name> *: <size> <transmitter>
+bool parse_bo(std::string_view line, uint32_t &address, std::string_view &name, unsigned int &size) {
+  LineTokenizer tok(line);
+  std::string_view address_token, size_token, transmitter;
+  if (!(tok.literal("BO_ ") && tok.word(address_token) && tok.literal(" ") && tok.word(name))) return false;
+  tok.spaces();
+  if (!(tok.literal(": ") && tok.word(size_token) && tok.literal(" ") && tok.word(transmitter) && tok.empty())) return false;
+  return LineTokenizer::parse_leading_integer(address_token, address) && LineTokenizer::parse_leading_integer(size_token, size);
+}
+
+// SG_ <name> [<multiplexer> *]: <start>|<size>@<endianness><sign> (<factor>,<offset>) [<min>|<max>] "<unit>" <receivers>
+bool parse_sg(std::string_view line, bool multiplexed, std::string_view &name, Signal &sig) {
+  LineTokenizer tok(line);
+  if (!(tok.literal("SG_ ") && tok.word(name))) return false;
+  if (multiplexed) {
+    std::string_view multiplexer;
+    if (!(tok.literal(" ") && tok.word(multiplexer))) return false;
+    tok.spaces();
+    if (!tok.literal(": ")) return false;
+  } else if (!tok.literal(" : ")) {
+    return false;
+  }
+
+  int endianness;
+  char sign;
+  double min, max;
+  if (!(tok.integer(sig.start_bit) && tok.literal("|") && tok.integer(sig.size) && tok.literal("@") && tok.integer(endianness) &&
+        tok.one_of("+|-", sign) && tok.literal(" (") && tok.number(sig.factor) && tok.literal(",") && tok.number(sig.offset) &&
+        tok.literal(") [") && tok.number(min) && tok.literal("|") && tok.number(max) && tok.literal("] \""))) {
+    return false;
+  }
+  // unit and receivers aren't used, only check that they're there
+  if (tok.rest().find("\" ") == std::string_view::npos) return false;
+
+  sig.is_little_endian = endianness == 1;
+  sig.is_signed = sign == '-';
+  return true;
+}
+
+// VAL_ <address> <signal> <value> "<description>" [<value> "<description>" ...] ;
+// Returns the value/description list, normalized to "<value> <DESCRIPTION> ...".
+bool parse_val(std::string_view line, uint32_t &address, std::string_view &name, std::string &def_val) {
+  LineTokenizer tok(line);
+  std::string_view address_token;
+  if (!(tok.literal("VAL_ ") && tok.word(address_token) && tok.literal(" ") && tok.word(name) && tok.literal(" "))) return false;
+  if (!LineTokenizer::parse_leading_integer(address_token, address)) return false;
+
+  // the first pair must be well formed: \s*[-+]?[0-9]+\s+\".+?\"
+  std::string_view defs = tok.rest();
+  size_t i = 0;
+  while (i < defs.size() && is_space_char(defs[i])) i++;
+  if (i < defs.size() && (defs[i] == '-' || defs[i] == '+')) i++;
+  const size_t digits_start = i;
+  while (i < defs.size() && is_digit_char(defs[i])) i++;
+  if (i == digits_start) return false;
+  const size_t spaces_start = i;
+  while (i < defs.size() && is_space_char(defs[i])) i++;
+  if (i == spaces_start || i == defs.size() || defs[i] != '"') return false;
+  const size_t closing_quote = defs.find('"', i + 2);
+  if (closing_quote == std::string_view::npos) return false;
+  defs = defs.substr(0, defs.find(';', closing_quote + 1));
+
+  // split on runs of quotes, convert descriptions to UPPER_CASE_WITH_UNDERSCORES and join with spaces
+  def_val.clear();
+  def_val.reserve(defs.size());
+  size_t start = 0;
+  while (start <= defs.size()) {
+    size_t end = defs.find('"', start);
+    if (end == std::string_view::npos) end = defs.size();
+    for (char c : trim(defs.substr(start, end - start))) {
+      def_val += c == ' ' ? '_' : static_cast<char>(toupper(c));
+    }
+    def_val += ' ';
+    start = defs.find_first_not_of('"', end);
+    if (start == std::string_view::npos) break;
+  }
+  def_val = std::string(trim(std::string_view(def_val)));
+  return true;
+}
+
+// Splits a normalized def_val into value/label pairs, sorted by value. Like
+// dict(zip(values, labels)), a trailing value without a label is dropped and
+// the last label of a repeated value wins.
+std::vector<ValueLabel> parse_value_labels(const std::string &def_val) {
+  std::vector<std::string> tokens;
+  std::istringstream stream(def_val);
+  for (std::string token; stream >> token;) {
+    tokens.push_back(std::move(token));
+  }
+
+  std::vector<ValueLabel> labels;
+  for (size_t i = 0; i + 1 < tokens.size(); i += 2) {
+    char *end = nullptr;
+    const int64_t value = std::strtoll(tokens[i].c_str(), &end, 10);
+    if (*end != '\0') continue;
+    labels.push_back({value, std::move(tokens[i + 1])});
+  }
+
+  std::stable_sort(labels.begin(), labels.end(), [](const ValueLabel &a, const ValueLabel &b) { return a.value < b.value; });
+  auto last = std::unique(labels.rbegin(), labels.rend(), [](const ValueLabel &a, const ValueLabel &b) { return a.value == b.value; });
+  labels.erase(labels.begin(), last.base());
+  return labels;
+}
+
+const ValueLabel *find_value_label(const std::vector<ValueLabel> &labels, int64_t value) {
+  auto it = std::lower_bound(labels.begin(), labels.end(), value, [](const ValueLabel &l, int64_t v) { return l.value < v; });
+  return it != labels.end() && it->value == value ? &*it : nullptr;
 }
 
 ChecksumState* get_checksum(const std::string& dbc_name) {
@@ -111,30 +325,30 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
   dbc->name = dbc_name;
   std::setlocale(LC_NUMERIC, "C");
 
-  // used to find big endian LSB from MSB and size
-  std::vector<int> be_bits;
-  for (int i = 0; i < 64; i++) {
-    for (int j = 7; j >= 0; j--) {
-      be_bits.push_back(j + i * 8);
-    }
-  }
+  // read everything up front, lines are views into this buffer
+  const std::string content{std::istreambuf_iterator<char>(stream), std::istreambuf_iterator<char>()};
+  const std::string_view content_view(content);
 
-  std::string line;
   int line_num = 0;
-  std::smatch match;
-  // TODO: see if we can speed up the regex statements in this loop, SG_ is specifically the slowest
-  while (std::getline(stream, line)) {
-    line = trim(line);
+  size_t line_start = 0;
+  while (line_start < content_view.size()) {
+    size_t line_end = content_view.find('\n', line_start);
+    if (line_end == std::string_view::npos) line_end = content_view.size();
+    const std::string_view line = trim(content_view.substr(line_start, line_end - line_start));
+    line_start = line_end + 1;
     line_num += 1;
-    if (startswith(line, "BO_ ")) {
+
+    if (line.substr(0, 4) == "BO_ ") {
       // new group
-      bool ret = std::regex_match(line, match, bo_regexp);
+      std::string_view name;
+      unsigned int size;
+      bool ret = parse_bo(line, address, name, size);
       DBC_ASSERT(ret, "bad BO: " << line);
 
       Msg& msg = dbc->msgs.emplace_back();
-      address = msg.address = std::stoul(match[1].str());  // could be hex
-      msg.name = match[2].str();
-      msg.size = std::stoul(match[3].str());
+      msg.address = address;
+      msg.name = name;
+      msg.size = size;
 
       // check for duplicates
       DBC_ASSERT(address_set.find(address) == address_set.end(), "Duplicate message address: " << address << " (" << msg.name << ")");
@@ -144,29 +358,22 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
         DBC_ASSERT(msg_name_set.find(msg.name) == msg_name_set.end(), "Duplicate message name: " << msg.name);
         msg_name_set.insert(msg.name);
       }
-    } else if (startswith(line, "SG_ ")) {
+    } else if (line.substr(0, 4) == "SG_ ") {
       // new signal
-      int offset = 0;
-      if (!std::regex_search(line, match, sg_regexp)) {
-        bool ret = std::regex_search(line, match, sgm_regexp);
-        DBC_ASSERT(ret, "bad SG: " << line);
-        offset = 1;
-      }
-      Signal& sig = signals[address].emplace_back();
-      sig.name = match[1].str();
-      sig.start_bit = std::stoi(match[offset + 2].str());
-      sig.size = std::stoi(match[offset + 3].str());
-      sig.is_little_endian = std::stoi(match[offset + 4].str()) == 1;
-      sig.is_signed = match[offset + 5].str() == "-";
-      sig.factor = std::stod(match[offset + 6].str());
-      sig.offset = std::stod(match[offset + 7].str());
+      std::string_view name;
+      Signal sig = {};
+      bool ret = parse_sg(line, false, name, sig) || parse_sg(line, true, name, sig);
+      DBC_ASSERT(ret, "bad SG: " << line);
+
+      sig.name = name;
       set_signal_type(sig, checksum, dbc_name, line_num);
       if (sig.is_little_endian) {
         sig.lsb = sig.start_bit;
         sig.msb = sig.start_bit + sig.size - 1;
       } else {
-        auto it = find(be_bits.begin(), be_bits.end(), sig.start_bit);
-        sig.lsb = be_bits[(it - be_bits.begin()) + sig.size - 1];
+        // big endian bits are numbered 7..0, 15..8, ... find the LSB by walking size bits in that order from the MSB
+        int be_index = (sig.start_bit / 8) * 8 + (7 - sig.start_bit % 8) + sig.size - 1;
+        sig.lsb = (be_index / 8) * 8 + (7 - be_index % 8);
         sig.msb = sig.start_bit;
       }
       DBC_ASSERT(sig.lsb < (64 * 8) && sig.msb < (64 * 8), "Signal out of bounds: " << line);
@@ -174,29 +381,19 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
       // Check for duplicate signal names
       DBC_ASSERT(signal_name_sets[address].find(sig.name) == signal_name_sets[address].end(), "Duplicate signal name: " << sig.name);
       signal_name_sets[address].insert(sig.name);
-    } else if (startswith(line, "VAL_ ")) {
+      signals[address].push_back(std::move(sig));
+    } else if (line.substr(0, 5) == "VAL_ ") {
       // new signal value/definition
-      bool ret = std::regex_search(line, match, val_regexp);
+      uint32_t val_address;
+      std::string_view name;
+      std::string def_val;
+      bool ret = parse_val(line, val_address, name, def_val);
       DBC_ASSERT(ret, "bad VAL: " << line);
 
       auto& val = dbc->vals.emplace_back();
-      val.address = std::stoul(match[1].str());  // could be hex
-      val.name = match[2].str();
-
-      auto defvals = match[3].str();
-      std::sregex_token_iterator it{defvals.begin(), defvals.end(), val_split_regexp, -1};
-      // convert strings to UPPER_CASE_WITH_UNDERSCORES
-      std::vector<std::string> words{it, {}};
-      for (auto& w : words) {
-        w = trim(w);
-        std::transform(w.begin(), w.end(), w.begin(), ::toupper);
-        std::replace(w.begin(), w.end(), ' ', '_');
-      }
-      // join string
-      std::stringstream s;
-      std::copy(words.begin(), words.end(), std::ostream_iterator<std::string>(s, " "));
-      val.def_val = s.str();
-      val.def_val = trim(val.def_val);
+      val.address = val_address;
+      val.name = name;
+      val.def_val = std::move(def_val);
     }
   }
 
@@ -207,6 +404,7 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
   }
   for (auto& v : dbc->vals) {
     v.sigs = signals[v.address];
+    v.labels = parse_value_labels(v.def_val);
   }
   return dbc;
 }
@@ -230,21 +428,163 @@ const std::string get_dbc_root_path() {
   }
 }
 
-const DBC* dbc_lookup(const std::string& dbc_name) {
-  static std::mutex lock;
-  static std::map<std::string, DBC*> dbcs;
+namespace {
+
+struct RegistryEntry {
+  // ready once dbc and stats are set by the thread loading the DBC
+  std::shared_future<void> loaded;
+  std::unique_ptr<DBC> dbc;
+  DBCStats stats;
+};
+
+// Parsers and packers keep raw pointers into their DBC, so loaded DBCs
+// live until the process exits. The registry is never destroyed to keep
+// them valid during static destruction.
+struct Registry {
+  std::mutex lock;
+  std::unordered_map<std::string, RegistryEntry> dbcs;
+};
+
+Registry &registry() {
+  static Registry *r = new Registry;
+  return *r;
+}
 
+void load_entry(const std::string& dbc_name, RegistryEntry &entry) {
   std::string dbc_file_path = dbc_name;
   if (!std::filesystem::exists(dbc_file_path)) {
     dbc_file_path = get_dbc_root_path() + "/" + dbc_name + ".dbc";
   }
 
-  std::unique_lock lk(lock);
-  auto it = dbcs.find(dbc_name);
-  if (it == dbcs.end()) {
-    it = dbcs.insert(it, {dbc_name, dbc_parse(dbc_file_path)});
+  auto start = std::chrono::steady_clock::now();
+  entry.dbc.reset(dbc_parse_cached(dbc_file_path));
+  entry.stats.load_ms = std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - start).count();
+  entry.stats.name = dbc_name;
+  entry.stats.path = dbc_file_path;
+  entry.stats.memory_bytes = entry.dbc ? dbc_memory_usage(*entry.dbc) : 0;
+}
+
+template <typename T>
+size_t vector_bytes(const std::vector<T> &v) {
+  return v.capacity() * sizeof(T);
+}
+
+size_t string_bytes(const std::string &s) {
+  // short strings are stored inline
+  return s.capacity() > std::string().capacity() ? s.capacity() + 1 : 0;
+}
+
+template <typename K, typename V>
+size_t map_bytes(const std::unordered_map<K, V> &m) {
+  // one node per element, plus the bucket array
+  return m.size() * (sizeof(std::pair<const K, V>) + 2 * sizeof(void*)) + m.bucket_count() * sizeof(void*);
+}
+
+size_t signals_bytes(const std::vector<Signal> &sigs) {
+  size_t bytes = vector_bytes(sigs);
+  for (const auto &sig : sigs) {
+    bytes += string_bytes(sig.name);
+  }
+  return bytes;
+}
+
+}  // namespace
+
+size_t dbc_memory_usage(const DBC &dbc) {
+  size_t bytes = sizeof(DBC) + string_bytes(dbc.name) + vector_bytes(dbc.msgs) + vector_bytes(dbc.vals);
+  for (const auto &msg : dbc.msgs) {
+    bytes += string_bytes(msg.name) + signals_bytes(msg.sigs);
+  }
+  for (const auto &val : dbc.vals) {
+    bytes += string_bytes(val.name) + string_bytes(val.def_val) + signals_bytes(val.sigs) + vector_bytes(val.labels);
+    for (const auto &label : val.labels) {
+      bytes += string_bytes(label.label);
+    }
+  }
+  bytes += map_bytes(dbc.addr_to_msg) + map_bytes(dbc.name_to_msg);
+  for (const auto &[name, msg] : dbc.name_to_msg) {
+    bytes += string_bytes(name);
+  }
+  return bytes;
+}
+
+// The first lookup of a DBC loads it outside the registry lock, so DBCs are
+// loaded in parallel. Concurrent lookups of the same DBC wait for that load.
+const DBC* dbc_lookup(const std::string& dbc_name) {
+  Registry &r = registry();
+  std::unique_lock lk(r.lock);
+  // unordered_map keeps references to its elements valid while others are inserted
+  auto [it, inserted] = r.dbcs.try_emplace(dbc_name);
+  RegistryEntry &entry = it->second;
+  if (!inserted) {
+    std::shared_future<void> loaded = entry.loaded;
+    lk.unlock();
+    loaded.get();
+    return entry.dbc.get();
+  }
+
+  std::promise<void> promise;
+  entry.loaded = promise.get_future().share();
+  lk.unlock();
+
+  try {
+    load_entry(dbc_name, entry);
+  } catch (...) {
+    // fail the waiting lookups, and let the next one try again
+    promise.set_exception(std::current_exception());
+    lk.lock();
+    r.dbcs.erase(dbc_name);
+    throw;
+  }
+  promise.set_value();
+  return entry.dbc.get();
+}
+
+void dbc_preload(const std::vector<std::string>& dbc_names, int num_threads) {
+  if (num_threads <= 0) {
+    num_threads = std::max(1U, std::thread::hardware_concurrency());
+  }
+  num_threads = std::min<int>(num_threads, dbc_names.size());
+
+  std::atomic<size_t> next = 0;
+  std::mutex error_lock;
+  std::exception_ptr error;
+  auto worker = [&]() {
+    for (size_t i = next++; i < dbc_names.size(); i = next++) {
+      try {
+        dbc_lookup(dbc_names[i]);
+      } catch (...) {
+        std::unique_lock lk(error_lock);
+        if (!error) error = std::current_exception();
+      }
+    }
+  };
+
+  std::vector<std::thread> threads;
+  for (int i = 1; i < num_threads; i++) {
+    threads.emplace_back(worker);
+  }
+  worker();
+  for (auto &t : threads) {
+    t.join();
+  }
+  if (error) {
+    std::rethrow_exception(error);
+  }
+}
+
+std::vector<DBCStats> dbc_loaded() {
+  Registry &r = registry();
+  std::unique_lock lk(r.lock);
+  std::vector<DBCStats> ret;
+  for (const auto &[name, entry] : r.dbcs) {
+    const bool ready = entry.loaded.wait_for(std::chrono::seconds(0)) == std::future_status::ready;
+    if (ready && entry.dbc) {
+      ret.push_back(entry.stats);
+    }
   }
-  return it->second;
+  std::sort(ret.begin(), ret.end(), [](const DBCStats &a, const DBCStats &b) { return a.name < b.name; });
+  return ret;
 }
 
 std::vector<std::string> get_dbc_names() {
@@ -0,0 +1,330 @@
+#include <algorithm>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <iterator>
+#include <memory>
+#include <sstream>
+#include <string>
+#include <string_view>
+#include <utility>
+#include <vector>
+
+#include <unistd.h>
+#include <fcntl.h>
+#include <sys/stat.h>
+#include <sys/mman.h>
+
+#include "opendbc/can/common.h"
+#include "opendbc/can/common_dbc.h"
+
+// Parsed DBCs are cached in a compact binary form so that short-lived processes
+// don't have to re-parse the text files. A cache file is keyed by the DBC path and
+// is only valid while the DBC's mtime, size and content hash match the ones recorded in
+// the header. The DBC is only read and hashed once its mtime and size match.
+//
+// By default caches are only read, from the directory generated at build time
+// (DBC_CACHE_PATH). Setting OPENDBC_CACHE_DIR uses that directory instead, which is
+// also written to when a DBC isn't cached yet.
+
+// bump when the layout of the cache or of the DBC structs changes
+#define DBC_CACHE_VERSION 3
+
+namespace {
+
+const char DBC_CACHE_MAGIC[8] = {'D', 'B', 'C', 'C', 'A', 'C', 'H', 'E'};
+
+struct DBCCacheHeader {
+  char magic[8];
+  uint32_t version;
+  uint32_t path_size;
+  int64_t mtime;
+  uint64_t file_size;
+  uint64_t content_hash;
+  uint64_t payload_size;
+  // followed by the DBC path and the payload
+};
+
+uint64_t fnv1a_hash(std::string_view data) {
+  uint64_t hash = 0xcbf29ce484222325ULL;
+  for (unsigned char c : data) {
+    hash ^= c;
+    hash *= 0x100000001b3ULL;
+  }
+  return hash;
+}
+
+// A DBC file, whose content is only read when needed
+struct DBCFile {
+  std::string path;
+  int64_t mtime;
+  uint64_t size;
+  std::string content;
+  uint64_t content_hash = 0;
+  bool content_read = false;
+
+  bool read_content() {
+    if (!content_read) {
+      std::ifstream infile(path);
+      if (!infile) return false;
+      content.assign(std::istreambuf_iterator<char>(infile), std::istreambuf_iterator<char>());
+      content_hash = fnv1a_hash(content);
+      content_read = true;
+    }
+    return true;
+  }
+};
+
+std::string get_dbc_cache_name(const std::string &abs_path) {
+  char key[17];
+  snprintf(key, sizeof(key), "%016llx", (unsigned long long)fnv1a_hash(abs_path));
+  return std::filesystem::path(abs_path).stem().string() + "-" + key + ".bin";
+}
+
+bool same_signal_names(const std::vector<Signal> &a, const std::vector<Signal> &b) {
+  return std::equal(a.begin(), a.end(), b.begin(), b.end(),
+                    [](const Signal &x, const Signal &y) { return x.name == y.name; });
+}
+
+class CacheWriter {
+public:
+  template <typename T>
+  void write(const T &v) {
+    buf.append(reinterpret_cast<const char *>(&v), sizeof(v));
+  }
+
+  void write(const std::string &s) {
+    write((uint32_t)s.size());
+    buf.append(s);
+  }
+
+  void write(const std::vector<Signal> &sigs) {
+    write((uint32_t)sigs.size());
+    for (const auto &sig : sigs) {
+      write(sig.name);
+      write((int32_t)sig.start_bit);
+      write((int32_t)sig.msb);
+      write((int32_t)sig.lsb);
+      write((int32_t)sig.size);
+      write((uint8_t)sig.is_signed);
+      write((uint8_t)sig.is_little_endian);
+      write((uint8_t)(sig.calc_checksum != nullptr));
+      write((uint32_t)sig.type);
+      write(sig.factor);
+      write(sig.offset);
+    }
+  }
+
+  std::string buf;
+};
+
+class CacheReader {
+public:
+  CacheReader(const char *data, size_t size) : p(data), end(data + size) {}
+
+  bool done() const { return p == end; }
+
+  template <typename T>
+  bool read(T &v) {
+    if ((size_t)(end - p) < sizeof(T)) return false;
+    memcpy(&v, p, sizeof(T));
+    p += sizeof(T);
+    return true;
+  }
+
+  bool read(std::string &s) {
+    uint32_t size;
+    if (!read(size) || (size_t)(end - p) < size) return false;
+    s.assign(p, size);
+    p += size;
+    return true;
+  }
+
+  bool read(std::vector<Signal> &sigs) {
+    uint32_t count;
+    if (!read(count)) return false;
+    sigs.resize(count);
+    for (auto &sig : sigs) {
+      int32_t start_bit, msb, lsb, size;
+      uint8_t is_signed, is_little_endian, has_checksum;
+      uint32_t type;
+      if (!(read(sig.name) && read(start_bit) && read(msb) && read(lsb) && read(size) && read(is_signed) &&
+            read(is_little_endian) && read(has_checksum) && read(type) && read(sig.factor) && read(sig.offset))) {
+        return false;
+      }
+      if (type > FCA_GIORGIO_CHECKSUM) return false;
+      sig.start_bit = start_bit;
+      sig.msb = msb;
+      sig.lsb = lsb;
+      sig.size = size;
+      sig.is_signed = is_signed;
+      sig.is_little_endian = is_little_endian;
+      sig.type = (SignalType)type;
+      sig.calc_checksum = has_checksum ? get_checksum_function(sig.type) : nullptr;
+    }
+    return true;
+  }
+
+private:
+  const char *p;
+  const char *end;
+};
+
+std::string serialize_dbc(const DBC *dbc) {
+  CacheWriter w;
+  w.write(dbc->name);
+  w.write((uint32_t)dbc->msgs.size());
+  for (const auto &msg : dbc->msgs) {
+    w.write(msg.name);
+    w.write(msg.address);
+    w.write((uint32_t)msg.size);
+    w.write(msg.sigs);
+  }
+  w.write((uint32_t)dbc->vals.size());
+  for (const auto &val : dbc->vals) {
+    w.write(val.name);
+    w.write(val.address);
+    w.write(val.def_val);
+    // VAL_ signals are almost always the ones of the message at the same address
+    auto msg_it = dbc->addr_to_msg.find(val.address);
+    const bool same_as_msg = msg_it != dbc->addr_to_msg.end() && same_signal_names(msg_it->second->sigs, val.sigs);
+    w.write((uint8_t)same_as_msg);
+    if (!same_as_msg) {
+      w.write(val.sigs);
+    }
+  }
+  return std::move(w.buf);
+}
+
+DBC* deserialize_dbc(const char *data, size_t size) {
+  CacheReader r(data, size);
+  std::unique_ptr<DBC> dbc(new DBC);
+  uint32_t msg_count, val_count;
+  if (!(r.read(dbc->name) && r.read(msg_count))) return nullptr;
+  dbc->msgs.resize(msg_count);
+  for (auto &msg : dbc->msgs) {
+    uint32_t msg_size;
+    if (!(r.read(msg.name) && r.read(msg.address) && r.read(msg_size) && r.read(msg.sigs))) return nullptr;
+    msg.size = msg_size;
+  }
+  for (auto &m : dbc->msgs) {
+    dbc->addr_to_msg[m.address] = &m;
+    dbc->name_to_msg[m.name] = &m;
+  }
+
+  if (!r.read(val_count)) return nullptr;
+  dbc->vals.resize(val_count);
+  for (auto &val : dbc->vals) {
+    uint8_t same_as_msg;
+    if (!(r.read(val.name) && r.read(val.address) && r.read(val.def_val) && r.read(same_as_msg))) return nullptr;
+    if (same_as_msg) {
+      auto msg_it = dbc->addr_to_msg.find(val.address);
+      if (msg_it == dbc->addr_to_msg.end()) return nullptr;
+      val.sigs = msg_it->second->sigs;
+    } else if (!r.read(val.sigs)) {
+      return nullptr;
+    }
+    // cheap to rebuild, so the cache format only holds def_val
+    val.labels = parse_value_labels(val.def_val);
+  }
+  return r.done() ? dbc.release() : nullptr;
+}
+
+// Maps the cache file and returns the DBC if it was generated from the given DBC file.
+DBC* load_cache(const std::string &cache_path, DBCFile &file) {
+  int fd = open(cache_path.c_str(), O_RDONLY);
+  if (fd < 0) return nullptr;
+
+  struct stat cache_st;
+  void *mem = MAP_FAILED;
+  if (fstat(fd, &cache_st) == 0 && cache_st.st_size >= (off_t)sizeof(DBCCacheHeader)) {
+    mem = mmap(nullptr, cache_st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+  }
+  close(fd);
+  if (mem == MAP_FAILED) return nullptr;
+
+  DBC *dbc = nullptr;
+  const char *data = (const char *)mem;
+  DBCCacheHeader header;
+  memcpy(&header, data, sizeof(header));
+  const size_t size = cache_st.st_size;
+  const bool valid = memcmp(header.magic, DBC_CACHE_MAGIC, sizeof(header.magic)) == 0 &&
+                     header.version == DBC_CACHE_VERSION &&
+                     sizeof(header) + header.path_size + header.payload_size == size &&
+                     std::string_view(data + sizeof(header), header.path_size) == file.path &&
+                     header.mtime == file.mtime && header.file_size == file.size &&
+                     file.read_content() && header.content_hash == file.content_hash;
+  if (valid) {
+    dbc = deserialize_dbc(data + sizeof(header) + header.path_size, header.payload_size);
+  }
+  munmap(mem, size);
+  return dbc;
+}
+
+void store_cache(const std::string &cache_path, const DBCFile &file, const DBC *dbc) {
+  const std::string payload = serialize_dbc(dbc);
+
+  DBCCacheHeader header = {};
+  memcpy(header.magic, DBC_CACHE_MAGIC, sizeof(header.magic));
+  header.version = DBC_CACHE_VERSION;
+  header.path_size = file.path.size();
+  header.mtime = file.mtime;
+  header.file_size = file.size;
+  header.content_hash = file.content_hash;
+  header.payload_size = payload.size();
+
+  // write to a temporary file and rename it, so concurrent readers never see a partial cache
+  std::error_code ec;
+  std::filesystem::create_directories(std::filesystem::path(cache_path).parent_path(), ec);
+  const std::string tmp_path = cache_path + ".tmp" + std::to_string(getpid());
+  {
+    std::ofstream out(tmp_path, std::ios::binary | std::ios::trunc);
+    if (!out) return;
+    out.write((const char *)&header, sizeof(header));
+    out.write(file.path.data(), file.path.size());
+    out.write(payload.data(), payload.size());
+    if (!out) {
+      out.close();
+      std::filesystem::remove(tmp_path, ec);
+      return;
+    }
+  }
+  std::filesystem::rename(tmp_path, cache_path, ec);
+  if (ec) std::filesystem::remove(tmp_path, ec);
+}
+
+}  // namespace
+
+DBC* dbc_parse_cached(const std::string& path) {
+  std::error_code ec;
+  DBCFile file;
+  file.path = std::filesystem::absolute(path, ec).lexically_normal();
+  if (ec) return nullptr;
+  const auto mtime = std::filesystem::last_write_time(file.path, ec);
+  if (ec) return nullptr;
+  file.size = std::filesystem::file_size(file.path, ec);
+  if (ec) return nullptr;
+  file.mtime = mtime.time_since_epoch().count();
+
+  const std::string cache_name = get_dbc_cache_name(file.path);
+  const char *cache_dir = std::getenv("OPENDBC_CACHE_DIR");  // empty to disable the cache
+  DBC *dbc = nullptr;
+  if (cache_dir == nullptr) {
+    dbc = load_cache(std::string(DBC_CACHE_PATH) + "/" + cache_name, file);
+  } else if (*cache_dir != '\0') {
+    dbc = load_cache(std::string(cache_dir) + "/" + cache_name, file);
+  }
+  if (dbc != nullptr) return dbc;
+
+  if (!file.read_content()) return nullptr;
+  const std::string dbc_name = std::filesystem::path(file.path).filename();
+  std::unique_ptr<ChecksumState> checksum(get_checksum(dbc_name));
+  std::istringstream stream(file.content);
+  dbc = dbc_parse_from_stream(dbc_name, stream, checksum.get());
+  if (cache_dir != nullptr && *cache_dir != '\0') {
+    store_cache(std::string(cache_dir) + "/" + cache_name, file, dbc);
+  }
+  return dbc;
+}
@@ -0,0 +1,18 @@
+// Populates the binary DBC cache (see dbc_cache.cc) for every DBC in opendbc/dbc,
+// and prints the name of each DBC it cached. scons runs it with OPENDBC_CACHE_DIR
+// set to opendbc/can/dbc_cache, the read-only cache shipped with the package.
+
+#include <cstdio>
+
+#include "opendbc/can/common_dbc.h"
+
+int main() {
+  for (const auto &name : get_dbc_names()) {
+    if (dbc_lookup(name) == nullptr) {
+      fprintf(stderr, "failed to load %s\n", name.c_str());
+      return 1;
+    }
+    printf("%s\n", name.c_str());
+  }
+  return 0;
+}
@@ -2,20 +2,21 @@
 #include <cassert>
 #include <cmath>
 #include <map>
+#include <sstream>
 #include <stdexcept>
 #include <utility>
 
 #include "opendbc/can/common.h"
 
 
-void set_value(std::vector<uint8_t> &msg, const Signal &sig, int64_t ival) {
+void set_value(uint8_t *msg, size_t msg_size, const Signal &sig, int64_t ival) {
   int i = sig.lsb / 8;
   int bits = sig.size;
   if (sig.size < 64) {
     ival &= ((1ULL << sig.size) - 1);
   }
 
-  while (i >= 0 && i < msg.size() && bits > 0) {
+  while (i >= 0 && i < msg_size && bits > 0) {
     int shift = (int)(sig.lsb / 8) == i ? sig.lsb % 8 : 0;
     int size = std::min(bits, 8 - shift);
 
@@ -28,6 +29,10 @@ void set_value(std::vector<uint8_t> &msg, const Signal &sig, int64_t ival) {
   }
 }
 
+void set_value(std::vector<uint8_t> &msg, const Signal &sig, int64_t ival) {
+  set_value(msg.data(), msg.size(), sig, ival);
+}
+
 CANPacker::CANPacker(const std::string& dbc_name) {
   dbc = dbc_lookup(dbc_name);
   assert(dbc);
@@ -39,14 +44,74 @@ CANPacker::CANPacker(const std::string& dbc_name) {
   }
 }
 
+static void pack_value(uint8_t *msg, size_t msg_size, const Signal &sig, double value) {
+  int64_t ival = (int64_t)(round((value - sig.offset) / sig.factor));
+  if (ival < 0) {
+    ival = (1ULL << sig.size) + ival;
+  }
+  set_value(msg, msg_size, sig, ival);
+}
+
+void CANPacker::finish(uint32_t address, const Signal *counter_sig, const Signal *checksum_sig, bool counter_set,
+                       uint8_t *msg, size_t size) {
+  // set message counter
+  if (!counter_set && counter_sig != nullptr) {
+    uint32_t &counter = counters[address];
+    set_value(msg, size, *counter_sig, counter);
+    counter = (counter + 1) % (1 << counter_sig->size);
+  }
+
+  // set message checksum
+  if (checksum_sig != nullptr && checksum_sig->calc_checksum != nullptr) {
+    unsigned int checksum = checksum_sig->calc_checksum(address, *checksum_sig, msg, size);
+    set_value(msg, size, *checksum_sig, checksum);
+  }
+}
+
+const Signal *CANPacker::lookup_signal(uint32_t address, const std::string &name) const {
+  auto it = signal_lookup.find(std::make_pair(address, name));
+  return it == signal_lookup.end() ? nullptr : &it->second;
+}
+
 std::vector<uint8_t> CANPacker::pack(uint32_t address, const std::vector<SignalPackValue> &signals) {
+  std::vector<uint8_t> ret;
+  pack_into(address, signals, ret);
+  return ret;
+}
+
+void CANPacker::pack_many(const std::vector<PackRequest> &requests, std::vector<uint8_t> &buffer, std::vector<size_t> &offsets) {
+  offsets.assign(1, 0);
+  for (const auto &request : requests) {
+    auto msg_it = dbc->addr_to_msg.find(request.address);
+    if (msg_it == dbc->addr_to_msg.end()) {
+      LOGE("undefined address %d", request.address);
+    }
+    offsets.push_back(offsets.back() + (msg_it == dbc->addr_to_msg.end() ? 0 : msg_it->second->size));
+  }
+
+  // pack straight into the buffer
+  buffer.resize(offsets.back());
+  for (size_t i = 0; i < requests.size(); i++) {
+    if (offsets[i + 1] > offsets[i]) {
+      pack_message(requests[i].address, requests[i].values, buffer.data() + offsets[i], offsets[i + 1] - offsets[i]);
+    }
+  }
+}
+
+void CANPacker::pack_into(uint32_t address, const std::vector<SignalPackValue> &signals, std::vector<uint8_t> &ret) {
   auto msg_it = dbc->addr_to_msg.find(address);
   if (msg_it == dbc->addr_to_msg.end()) {
     LOGE("undefined address %d", address);
-    return {};
+    ret.clear();
+    return;
   }
 
-  std::vector<uint8_t> ret(msg_it->second->size, 0);
+  ret.resize(msg_it->second->size);
+  pack_message(address, signals, ret.data(), ret.size());
+}
+
+void CANPacker::pack_message(uint32_t address, const std::vector<SignalPackValue> &signals, uint8_t *out, size_t size) {
+  std::fill(out, out + size, 0);
 
   // set all values for all given signal/value pairs
   bool counter_set = false;
@@ -57,13 +122,7 @@ std::vector<uint8_t> CANPacker::pack(uint32_t address, const std::vector<SignalP
       LOGE("undefined signal %s - %d\n", sigval.name.c_str(), address);
       continue;
     }
-    const auto &sig = sig_it->second;
-
-    int64_t ival = (int64_t)(round((sigval.value - sig.offset) / sig.factor));
-    if (ival < 0) {
-      ival = (1ULL << sig.size) + ival;
-    }
-    set_value(ret, sig, ival);
+    pack_value(out, size, sig_it->second, sigval.value);
 
     if (sigval.name == "COUNTER") {
       counters[address] = sigval.value;
@@ -71,29 +130,62 @@ std::vector<uint8_t> CANPacker::pack(uint32_t address, const std::vector<SignalP
     }
   }
 
-  // set message counter
-  auto sig_it_counter = signal_lookup.find(std::make_pair(address, "COUNTER"));
-  if (!counter_set && sig_it_counter != signal_lookup.end()) {
-    const auto& sig = sig_it_counter->second;
+  finish(address, lookup_signal(address, "COUNTER"), lookup_signal(address, "CHECKSUM"), counter_set, out, size);
+}
 
-    if (counters.find(address) == counters.end()) {
-      counters[address] = 0;
-    }
-    set_value(ret, sig, counters[address]);
-    counters[address] = (counters[address] + 1) % (1 << sig.size);
+PreparedMessage CANPacker::prepare(uint32_t address, const std::vector<std::string> &signal_names) const {
+  auto msg_it = dbc->addr_to_msg.find(address);
+  if (msg_it == dbc->addr_to_msg.end()) {
+    std::stringstream is;
+    is << "undefined address " << address;
+    throw std::runtime_error(is.str());
   }
 
-  // set message checksum
-  auto sig_it_checksum = signal_lookup.find(std::make_pair(address, "CHECKSUM"));
-  if (sig_it_checksum != signal_lookup.end()) {
-    const auto &sig = sig_it_checksum->second;
-    if (sig.calc_checksum != nullptr) {
-      unsigned int checksum = sig.calc_checksum(address, sig, ret);
-      set_value(ret, sig, checksum);
+  PreparedMessage prepared;
+  prepared.address = address;
+  prepared.size = msg_it->second->size;
+  for (size_t i = 0; i < signal_names.size(); i++) {
+    const Signal *sig = lookup_signal(address, signal_names[i]);
+    if (sig == nullptr) {
+      std::stringstream is;
+      is << "undefined signal " << signal_names[i] << " - " << address;
+      throw std::runtime_error(is.str());
+    }
+    prepared.signals.push_back(sig);
+    if (signal_names[i] == "COUNTER") {
+      prepared.counter_index = i;
     }
   }
+  prepared.counter = lookup_signal(address, "COUNTER");
+  prepared.checksum = lookup_signal(address, "CHECKSUM");
+  return prepared;
+}
 
-  return ret;
+void CANPacker::pack_row(const PreparedMessage &prepared, const double *values, size_t stride, uint8_t *out) {
+  std::fill(out, out + prepared.size, 0);
+  for (size_t i = 0; i < prepared.signals.size(); i++) {
+    pack_value(out, prepared.size, *prepared.signals[i], values[i * stride]);
+  }
+
+  const bool counter_set = prepared.counter_index >= 0;
+  if (counter_set) {
+    counters[prepared.address] = values[prepared.counter_index * stride];
+  }
+  finish(prepared.address, prepared.counter, prepared.checksum, counter_set, out, prepared.size);
+}
+
+void CANPacker::pack_prepared(const PreparedMessage &prepared, const double *values, std::vector<uint8_t> &out) {
+  out.resize(prepared.size);
+  pack_row(prepared, values, 1, out.data());
+}
+
+void CANPacker::pack_columns(uint32_t address, const std::vector<std::string> &signal_names, const double *values,
+                             size_t count, uint8_t *out) {
+  const PreparedMessage prepared = prepare(address, signal_names);
+  for (size_t row = 0; row < count; row++) {
+    // counters and checksums depend on the whole payload, so go row by row
+    pack_row(prepared, values + row, count, out + row * prepared.size);
+  }
 }
 
 // This function has a definition in common.h and is used in PlotJuggler
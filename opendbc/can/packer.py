@@ -1,2 +1,3 @@
-from opendbc.can.packer_pyx import CANPacker # pylint: disable=no-name-in-module, import-error
+from opendbc.can.packer_pyx import CANPacker, PreparedMessage # pylint: disable=no-name-in-module, import-error
 assert CANPacker
+assert PreparedMessage is not None
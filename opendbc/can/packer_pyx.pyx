@@ -2,10 +2,15 @@
 # cython: c_string_encoding=ascii, language_level=3
 
 from libc.stdint cimport uint8_t, uint32_t
+from libc.stddef cimport size_t
+from libcpp.string cimport string
 from libcpp.vector cimport vector
 
 from .common cimport CANPacker as cpp_CANPacker
-from .common cimport dbc_lookup, SignalPackValue, DBC, Msg
+from .common cimport PreparedMessage as cpp_PreparedMessage
+from .common cimport dbc_lookup, SignalPackValue, PackRequest, DBC, Msg
+
+import numpy as np
 
 
 cdef class CANPacker:
@@ -24,8 +29,7 @@ cdef class CANPacker:
     if self.packer:
       del self.packer
 
-  cdef vector[uint8_t] pack(self, addr, values):
-    cdef vector[SignalPackValue] values_thing
+  cdef void fill_values(self, values, vector[SignalPackValue] &values_thing):
     values_thing.reserve(len(values))
     cdef SignalPackValue spv
 
@@ -34,20 +38,123 @@ cdef class CANPacker:
       spv.value = value
       values_thing.push_back(spv)
 
+  cdef vector[uint8_t] pack(self, addr, values):
+    cdef vector[SignalPackValue] values_thing
+    self.fill_values(values, values_thing)
     return self.packer.pack(addr, values_thing)
 
-  cpdef make_can_msg(self, name_or_addr, bus, values):
-    cdef uint32_t addr = 0
+  cdef uint32_t lookup_address(self, name_or_addr):
     cdef const Msg* m
     if isinstance(name_or_addr, int):
-      addr = name_or_addr
-    else:
-      try:
-        m = self.dbc.name_to_msg.at(name_or_addr.encode("utf8"))
-        addr = m.address
-      except IndexError:
-        # The C++ pack function will log an error message for invalid addresses
-        pass
+      return name_or_addr
+    try:
+      m = self.dbc.name_to_msg.at(name_or_addr.encode("utf8"))
+      return m.address
+    except IndexError:
+      # The C++ pack function will log an error message for invalid addresses
+      return 0
+
+  cdef uint32_t message_address(self, name_or_addr) except *:
+    cdef const Msg* m
+    if isinstance(name_or_addr, int):
+      return name_or_addr
+    try:
+      m = self.dbc.name_to_msg.at(name_or_addr.encode("utf8"))
+    except IndexError:
+      raise RuntimeError(f"could not find message {repr(name_or_addr)} in DBC")
+    return m.address
+
+  def prepare(self, name_or_addr, signal_names):
+    """
+    Resolves a message and a fixed sequence of its signals once. The returned
+    PreparedMessage packs values given in the same order, without looking up names.
+    """
+    cdef uint32_t addr = self.message_address(name_or_addr)
+    cdef vector[string] names = [name.encode("utf8") for name in signal_names]
+    cdef PreparedMessage prepared = PreparedMessage.__new__(PreparedMessage)
+    prepared.prepared = self.packer.prepare(addr, names)
+    # the prepared signals point into the packer, which is kept alive by the handle
+    prepared.packer = self
+    prepared.address = addr
+    prepared.values.resize(names.size())
+    return prepared
+
+  def pack_array(self, name_or_addr, values, count=None):
+    """
+    Packs many payloads of one message. values maps signal names to arrays of
+    length count (or scalars, which are broadcast). Returns a (count, size) uint8
+    array whose rows match calling make_can_msg once per row, including counters
+    and checksums.
+    """
+    cdef uint32_t addr = self.message_address(name_or_addr)
+    if not self.dbc.addr_to_msg.count(addr):
+      raise RuntimeError(f"could not find message {repr(name_or_addr)} in DBC")
+
+    cdef vector[string] names = [name.encode("utf8") for name in values]
+    if count is None:
+      shape = np.broadcast_shapes(*[np.shape(v) for v in values.values()])
+      if len(shape) != 1:
+        raise ValueError(f"expected one-dimensional signal values, got shape {shape}")
+      count = shape[0]
+
+    columns = np.empty((names.size(), count), dtype=np.float64)
+    for i, value in enumerate(values.values()):
+      columns[i] = value
+    cdef const double[:, ::1] columns_v = columns
 
+    cdef const Msg* m = self.dbc.addr_to_msg.at(addr)
+    out = np.empty((count, m.size), dtype=np.uint8)
+    cdef uint8_t[:, ::1] out_v = out
+    if count > 0:
+      self.packer.pack_columns(addr, names, &columns_v[0, 0] if names.size() > 0 else NULL, count, &out_v[0, 0])
+    return out
+
+  cpdef make_can_msg(self, name_or_addr, bus, values):
+    cdef uint32_t addr = self.lookup_address(name_or_addr)
     cdef vector[uint8_t] val = self.pack(addr, values)
     return addr, (<char *>&val[0])[:val.size()], bus
+
+  def make_can_msgs(self, msgs):
+    """
+    Packs a list of (name_or_addr, bus, values) in one call, equivalent to calling
+    make_can_msg on each in order. Returns a list of (addr, dat, bus).
+    """
+    cdef vector[PackRequest] requests
+    requests.resize(len(msgs))
+    buses = []
+    cdef size_t i = 0
+    for name_or_addr, bus, values in msgs:
+      requests[i].address = self.lookup_address(name_or_addr)
+      self.fill_values(values, requests[i].values)
+      buses.append(bus)
+      i += 1
+
+    cdef vector[uint8_t] buffer
+    cdef vector[size_t] offsets
+    self.packer.pack_many(requests, buffer, offsets)
+
+    cdef char *dat = <char *>buffer.data()
+    return [(requests[i].address, dat[offsets[i]:offsets[i + 1]], buses[i]) for i in range(requests.size())]
+
+
+cdef class PreparedMessage:
+  cdef:
+    CANPacker packer
+    cpp_PreparedMessage prepared
+    vector[double] values
+    vector[uint8_t] dat
+
+  cdef readonly:
+    uint32_t address
+
+  cpdef make_can_msg(self, bus, values):
+    if len(values) != self.values.size():
+      raise ValueError(f"expected {self.values.size()} values, got {len(values)}")
+
+    cdef size_t i = 0
+    for value in values:
+      self.values[i] = value
+      i += 1
+
+    self.packer.packer.pack_prepared(self.prepared, self.values.data(), self.dat)
+    return self.address, (<char *>self.dat.data())[:self.dat.size()], bus
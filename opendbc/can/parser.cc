@@ -1,9 +1,12 @@
 #include <algorithm>
 #include <cassert>
 #include <cstring>
+#include <functional>
 #include <limits>
 #include <stdexcept>
 #include <sstream>
+#include <unordered_map>
+#include <utility>
 
 #include <unistd.h>
 #include <fcntl.h>
@@ -12,12 +15,12 @@
 
 #include "opendbc/can/common.h"
 
-int64_t get_raw_value(const std::vector<uint8_t> &msg, const Signal &sig) {
+int64_t get_raw_value(const uint8_t *msg, size_t msg_size, const Signal &sig) {
   int64_t ret = 0;
 
   int i = sig.msb / 8;
   int bits = sig.size;
-  while (i >= 0 && i < msg.size() && bits > 0) {
+  while (i >= 0 && i < msg_size && bits > 0) {
     int lsb = (int)(sig.lsb / 8) == i ? sig.lsb : i*8;
     int msb = (int)(sig.msb / 8) == i ? sig.msb : (i+1)*8 - 1;
     int size = msb - lsb + 1;
@@ -31,36 +34,80 @@ int64_t get_raw_value(const std::vector<uint8_t> &msg, const Signal &sig) {
   return ret;
 }
 
+int64_t get_raw_value(const std::vector<uint8_t> &msg, const Signal &sig) {
+  return get_raw_value(msg.data(), msg.size(), sig);
+}
 
-bool MessageState::parse(uint64_t nanos, const std::vector<uint8_t> &dat) {
-  std::vector<double> tmp_vals(parse_sigs.size());
-  bool checksum_failed = false;
-  bool counter_failed = false;
+static_assert(__BYTE_ORDER__ == __ORDER_LITTLE_ENDIAN__, "signal plans assume a little-endian host");
+
+SignalPlan compile_signal(const Signal &sig) {
+  SignalPlan plan = {};
+  plan.big_endian = !sig.is_little_endian;
+  plan.shift = sig.lsb % 8;
+  plan.two_words = plan.shift + sig.size > 64;
+  plan.mask = sig.size >= 64 ? ~0ULL : (1ULL << sig.size) - 1;
+  plan.sign_bit = sig.is_signed ? 1ULL << (sig.size - 1) : 0;
+  plan.checked = sig.calc_checksum != nullptr || sig.type == SignalType::COUNTER;
+  plan.factor = sig.factor;
+  plan.offset = sig.offset;
+  if (plan.big_endian) {
+    // the word ends at the byte holding the lsb, read back to front
+    plan.load_offset = 8 + sig.lsb / 8 - 7;
+    plan.last_byte = sig.lsb / 8;
+  } else {
+    plan.load_offset = 8 + sig.lsb / 8;
+    plan.last_byte = sig.msb / 8;
+  }
+  return plan;
+}
 
-  for (int i = 0; i < parse_sigs.size(); i++) {
-    const auto &sig = parse_sigs[i];
+static inline uint64_t load_word(const uint8_t *p) {
+  uint64_t word;
+  memcpy(&word, p, sizeof(word));
+  return word;
+}
 
-    int64_t tmp = get_raw_value(dat, sig);
-    if (sig.is_signed) {
-      tmp -= ((tmp >> (sig.size-1)) & 0x1) ? (1ULL << sig.size) : 0;
-    }
+static inline uint64_t extract_raw_value(const SignalPlan &plan, const uint8_t *buf) {
+  uint64_t word;
+  uint64_t extra = 0;
+  if (plan.big_endian) {
+    word = __builtin_bswap64(load_word(buf + plan.load_offset));
+    if (plan.two_words) extra = buf[plan.load_offset - 1];
+  } else {
+    word = load_word(buf + plan.load_offset);
+    if (plan.two_words) extra = buf[plan.load_offset + 8];
+  }
+  uint64_t raw = word >> plan.shift;
+  if (plan.two_words) raw |= extra << (64 - plan.shift);
+  return raw & plan.mask;
+}
 
-    //DEBUG("parse 0x%X %s -> %ld\n", address, sig.name, tmp);
+void MessageState::compile_plans() {
+  plans.clear();
+  for (const auto &sig : parse_sigs) {
+    plans.push_back(compile_signal(sig));
+  }
+  decoded_vals.assign(parse_sigs.size(), 0);
+}
 
-    if (!ignore_checksum) {
-      if (sig.calc_checksum != nullptr && sig.calc_checksum(address, sig, dat) != tmp) {
-        checksum_failed = true;
-      }
-    }
+int MessageState::label_id(size_t i) const {
+  if (label_tables.empty() || label_tables[i] == nullptr) return -1;
 
-    if (!ignore_counter) {
-      if (sig.type == SignalType::COUNTER && !update_counter_generic(tmp, sig.size)) {
-        counter_failed = true;
-      }
-    }
+  // values are looked up like int(value) in Python, out of range ones have no label
+  const double value = vals[i];
+  if (!(value > -9.2e18 && value < 9.2e18)) return 0;
+  const std::vector<ValueLabel> &table = *label_tables[i];
+  const ValueLabel *label = find_value_label(table, (int64_t)value);
+  return label == nullptr ? 0 : label_ids[i] + (int)(label - table.data());
+}
 
-    tmp_vals[i] = tmp * sig.factor + sig.offset;
-  }
+
+bool MessageState::parse(uint64_t nanos, const uint8_t *dat, size_t dat_size) {
+  bool checksum_failed = false;
+  bool counter_failed = false;
+  decode(dat, dat_size, decoded_vals.data(), 1, checksum_failed, counter_failed);
+  stats.frames++;
+  stats.checksum_failures += checksum_failed;
 
   // only update values if both checksum and counter are valid
   if (checksum_failed || counter_failed) {
@@ -68,8 +115,17 @@ bool MessageState::parse(uint64_t nanos, const std::vector<uint8_t> &dat) {
     return false;
   }
 
+  if (last_seen_nanos != 0 && nanos >= last_seen_nanos) {
+    const uint64_t interval = nanos - last_seen_nanos;
+    stats.interval_min_nanos = stats.intervals == 0 ? interval : std::min(stats.interval_min_nanos, interval);
+    stats.interval_max_nanos = std::max(stats.interval_max_nanos, interval);
+    stats.interval_sum_nanos += interval;
+    stats.intervals++;
+    stats.timeouts += check_threshold > 0 && interval > check_threshold;
+  }
+
   for (int i = 0; i < parse_sigs.size(); i++) {
-    vals[i] = tmp_vals[i];
+    vals[i] = decoded_vals[i];
     all_vals[i].push_back(vals[i]);
   }
   last_seen_nanos = nanos;
@@ -77,9 +133,46 @@ bool MessageState::parse(uint64_t nanos, const std::vector<uint8_t> &dat) {
   return true;
 }
 
+void MessageState::decode(const uint8_t *dat, size_t dat_size, double *out, size_t out_stride, bool &checksum_failed, bool &counter_failed) {
+  assert(plans.size() == parse_sigs.size() && dat_size <= 64);
+  checksum_failed = false;
+  counter_failed = false;
+  memcpy(frame_buf + 8, dat, dat_size);
+
+  for (int i = 0; i < parse_sigs.size(); i++) {
+    const auto &plan = plans[i];
+
+    const uint64_t raw = plan.last_byte < dat_size ? extract_raw_value(plan, frame_buf) : get_raw_value(dat, dat_size, parse_sigs[i]);
+    // sign extend from sign_bit
+    const int64_t tmp = (int64_t)((raw ^ plan.sign_bit) - plan.sign_bit);
+
+    //DEBUG("parse 0x%X %s -> %ld\n", address, parse_sigs[i].name, tmp);
+
+    if (plan.checked) {
+      const auto &sig = parse_sigs[i];
+      if (!ignore_checksum) {
+        if (sig.calc_checksum != nullptr) {
+          if (sig.calc_checksum(address, sig, dat, dat_size) != tmp) {
+            checksum_failed = true;
+          }
+        }
+      }
+
+      if (!ignore_counter) {
+        if (sig.type == SignalType::COUNTER && !update_counter_generic(tmp, sig.size)) {
+          counter_failed = true;
+        }
+      }
+    }
+
+    out[i * out_stride] = tmp * plan.factor + plan.offset;
+  }
+}
 
 bool MessageState::update_counter_generic(int64_t v, int cnt_size) {
   if (((counter + 1) & ((1 << cnt_size) -1)) != v) {
+    // the first decoded frame has no counter to follow
+    stats.counter_failures += stats.frames > stats.oversize_frames;
     counter_fail = std::min(counter_fail + 1, MAX_BAD_COUNTER);
     if (counter_fail > 1) {
       INFO("0x%X COUNTER FAIL #%d -- %d -> %d\n", address, counter_fail, counter, (int)v);
@@ -92,7 +185,9 @@ bool MessageState::update_counter_generic(int64_t v, int cnt_size) {
 }
 
 
-CANParser::CANParser(int abus, const std::string& dbc_name, const std::vector<std::pair<uint32_t, int>> &messages)
+CANParser::CANParser(int abus, const std::string& dbc_name, const std::vector<std::pair<uint32_t, int>> &messages,
+                     const std::unordered_map<uint32_t, std::vector<std::string>> &signals,
+                     const std::unordered_map<uint32_t, std::vector<std::string>> &labels)
   : bus(abus) {
   dbc = dbc_lookup(dbc_name);
   assert(dbc);
@@ -124,10 +219,62 @@ CANParser::CANParser(int abus, const std::string& dbc_name, const std::vector<st
     state.size = msg->size;
     assert(state.size <= 64);  // max signal size is 64 bytes
 
-    // track all signals for this message
-    state.parse_sigs = msg->sigs;
-    state.vals.resize(msg->sigs.size());
-    state.all_vals.resize(msg->sigs.size());
+    auto signals_it = signals.find(address);
+    if (signals_it == signals.end()) {
+      // track all signals for this message
+      state.parse_sigs = msg->sigs;
+    } else {
+      const auto &names = signals_it->second;
+      for (const auto &name : names) {
+        auto it = std::find_if(msg->sigs.begin(), msg->sigs.end(), [&](const Signal &sig) { return sig.name == name; });
+        if (it == msg->sigs.end()) {
+          std::stringstream is;
+          is << "could not find signal " << name << " in message " << msg->name;
+          throw std::runtime_error(is.str());
+        }
+      }
+      // keep DBC order, checksum and counter are always checked
+      for (const auto &sig : msg->sigs) {
+        if (sig.type != SignalType::DEFAULT || std::find(names.begin(), names.end(), sig.name) != names.end()) {
+          state.parse_sigs.push_back(sig);
+        }
+      }
+    }
+    state.vals.resize(state.parse_sigs.size());
+    state.all_vals.resize(state.parse_sigs.size());
+    state.compile_plans();
+  }
+  add_labels(labels);
+  build_lookup();
+}
+
+void CANParser::add_labels(const std::unordered_map<uint32_t, std::vector<std::string>> &labels) {
+  for (const auto &[address, names] : labels) {
+    auto state_it = message_states.find(address);
+    if (state_it == message_states.end()) {
+      std::stringstream is;
+      is << "labels requested for message " << address << ", which isn't parsed";
+      throw std::runtime_error(is.str());
+    }
+    MessageState &state = state_it->second;
+    state.label_tables.assign(state.parse_sigs.size(), nullptr);
+    state.label_ids.assign(state.parse_sigs.size(), 0);
+
+    for (const auto &name : names) {
+      auto sig_it = std::find_if(state.parse_sigs.begin(), state.parse_sigs.end(), [&](const Signal &sig) { return sig.name == name; });
+      auto val_it = std::find_if(dbc->vals.begin(), dbc->vals.end(), [&](const Val &val) { return val.address == address && val.name == name; });
+      if (sig_it == state.parse_sigs.end() || val_it == dbc->vals.end()) {
+        std::stringstream is;
+        is << "signal " << name << " in message " << state.name << (sig_it == state.parse_sigs.end() ? " isn't parsed" : " has no VAL_ table");
+        throw std::runtime_error(is.str());
+      }
+      const size_t i = sig_it - state.parse_sigs.begin();
+      state.label_tables[i] = &val_it->labels;
+      state.label_ids[i] = label_names.size();
+      for (const auto &label : val_it->labels) {
+        label_names.push_back(label.label);
+      }
+    }
   }
 }
 
@@ -152,12 +299,74 @@ CANParser::CANParser(int abus, const std::string& dbc_name, bool ignore_checksum
       state.vals.push_back(0);
       state.all_vals.push_back({});
     }
+    state.compile_plans();
 
     message_states[state.address] = state;
   }
+  build_lookup();
+}
+
+void CANParser::build_lookup() {
+  std_lookup.assign(STD_ADDRESS_COUNT, nullptr);
+  ext_lookup.clear();
+  for (auto &[address, state] : message_states) {
+    if (address < STD_ADDRESS_COUNT) {
+      std_lookup[address] = &state;
+    } else {
+      ext_lookup.emplace_back(address, &state);
+    }
+  }
+  std::sort(ext_lookup.begin(), ext_lookup.end());
+
+  checked_count = missing_count = 0;
+  for (const auto &[_, state] : message_states) {
+    if (state.check_threshold > 0) {
+      checked_count++;
+      missing_count += state.last_seen_nanos == 0;
+    }
+  }
+  rebuild_deadlines();
+}
+
+MessageState *CANParser::find_state(uint32_t address) const {
+  if (address < STD_ADDRESS_COUNT) {
+    return std_lookup[address];
+  }
+  auto it = std::lower_bound(ext_lookup.begin(), ext_lookup.end(), address,
+                             [](const auto &entry, uint32_t addr) { return entry.first < addr; });
+  return (it != ext_lookup.end() && it->first == address) ? it->second : nullptr;
 }
 
 void CANParser::update(const std::vector<CanData> &can_data, std::vector<SignalValue> &vals) {
+  query_latest(vals, UpdateAll(can_data));
+}
+
+void CANParser::update(const std::vector<CanDataView> &can_data, std::vector<SignalValue> &vals) {
+  query_latest(vals, UpdateAll(can_data));
+}
+
+void CANParser::update_addresses(const std::vector<CanData> &can_data, std::vector<uint32_t> &addresses) {
+  clear_all_values();
+  query_updated(addresses, UpdateAll(can_data));
+}
+
+void CANParser::update_addresses(const std::vector<CanDataView> &can_data, std::vector<uint32_t> &addresses) {
+  clear_all_values();
+  query_updated(addresses, UpdateAll(can_data));
+}
+
+inline const CanFrame *frames_begin(const CanData &c) { return c.frames.data(); }
+inline size_t frames_size(const CanData &c) { return c.frames.size(); }
+inline const CanFrameRecord *frames_begin(const CanDataView &c) { return c.frames; }
+inline size_t frames_size(const CanDataView &c) { return c.size; }
+
+inline const uint8_t *frame_dat(const CanFrame &f) { return f.dat.data(); }
+inline size_t frame_size(const CanFrame &f) { return f.dat.size(); }
+inline const uint8_t *frame_dat(const CanFrameRecord &f) { return f.dat; }
+inline size_t frame_size(const CanFrameRecord &f) { return f.len; }
+
+template <typename Data>
+uint64_t CANParser::UpdateAll(const std::vector<Data> &can_data) {
   uint64_t current_nanos = 0;
   for (const auto &c : can_data) {
     if (first_nanos == 0) {
@@ -168,77 +377,142 @@ void CANParser::update(const std::vector<CanData> &can_data, std::vector<SignalV
     }
     last_nanos = c.nanos;
 
-    UpdateCans(c);
+    UpdateCans(c.nanos, frames_begin(c), frames_size(c));
     UpdateValid(last_nanos);
   }
-  query_latest(vals, current_nanos);
+  return current_nanos;
 }
 
-void CANParser::UpdateCans(const CanData &can) {
-  //DEBUG("got %zu messages\n", can.frames.size());
+template <typename Frame>
+void CANParser::UpdateCans(uint64_t nanos, const Frame *frames, size_t size) {
+  //DEBUG("got %zu messages\n", size);
 
   bool bus_empty = true;
 
-  for (const auto &frame : can.frames) {
+  for (size_t i = 0; i < size; i++) {
+    const Frame &frame = frames[i];
     if (frame.src != bus) {
       // DEBUG("skip %d: wrong bus\n", cmsg.getAddress());
       continue;
     }
     bus_empty = false;
 
-    auto state_it = message_states.find(frame.address);
-    if (state_it == message_states.end()) {
+    MessageState *state = find_state(frame.address);
+    if (state == nullptr) {
       // DEBUG("skip %d: not specified\n", cmsg.getAddress());
       continue;
     }
-    if (frame.dat.size() > 64) {
-      DEBUG("got message longer than 64 bytes: 0x%X %zu\n", frame.address, frame.dat.size());
+    if (frame_size(frame) > 64) {
+      DEBUG("got message longer than 64 bytes: 0x%X %zu\n", frame.address, frame_size(frame));
+      state->stats.frames++;
+      state->stats.oversize_frames++;
       continue;
     }
 
     // TODO: this actually triggers for some cars. fix and enable this
-    //if (dat.size() != state_it->second.size) {
-    //  DEBUG("got message with unexpected length: expected %d, got %zu for %d", state_it->second.size, dat.size(), cmsg.getAddress());
+    //if (dat.size() != state->size) {
+    //  DEBUG("got message with unexpected length: expected %d, got %zu for %d", state->size, dat.size(), cmsg.getAddress());
     //  continue;
     //}
 
-    state_it->second.parse(can.nanos, frame.dat);
+    const uint64_t prev_seen_nanos = state->last_seen_nanos;
+    const bool prev_counter_failed = state->counter_fail >= MAX_BAD_COUNTER;
+    state->parse(nanos, frame_dat(frame), frame_size(frame));
+    track_parsed(state, prev_seen_nanos, prev_counter_failed);
   }
 
   // update bus timeout
   if (!bus_empty) {
-    last_nonempty_nanos = can.nanos;
+    last_nonempty_nanos = nanos;
   }
-  bus_timeout = (can.nanos - last_nonempty_nanos) > bus_timeout_threshold;
+  bus_timeout = (nanos - last_nonempty_nanos) > bus_timeout_threshold;
 }
 
-void CANParser::UpdateValid(uint64_t nanos) {
-  const bool show_missing = (nanos - first_nanos) > 8e9;
+void CANParser::track_parsed(MessageState *state, uint64_t prev_seen_nanos, bool prev_counter_failed) {
+  const bool counter_failed = state->counter_fail >= MAX_BAD_COUNTER;
+  if (counter_failed != prev_counter_failed) {
+    counter_fail_count += counter_failed ? 1 : -1;
+  }
+
+  if (state->check_threshold == 0 || state->last_seen_nanos == prev_seen_nanos) {
+    return;
+  }
+  if (prev_seen_nanos == 0) {
+    missing_count--;
+  }
+  max_seen_nanos = std::max(max_seen_nanos, state->last_seen_nanos);
+
+  // every frame pushes a new deadline, compact once stale entries dominate
+  if (deadlines.size() >= 4 * checked_count + 16) {
+    rebuild_deadlines();
+  } else {
+    deadlines.emplace_back(state->last_seen_nanos + state->check_threshold, state);
+    std::push_heap(deadlines.begin(), deadlines.end(), std::greater<>());
+  }
+}
 
-  bool _valid = true;
-  bool _counters_valid = true;
-  for (const auto& kv : message_states) {
-    const auto& state = kv.second;
+void CANParser::rebuild_deadlines() {
+  deadlines.clear();
+  for (auto &[_, state] : message_states) {
+    if (state.check_threshold > 0 && state.last_seen_nanos != 0) {
+      deadlines.emplace_back(state.last_seen_nanos + state.check_threshold, &state);
+    }
+  }
+  std::make_heap(deadlines.begin(), deadlines.end(), std::greater<>());
+}
 
-    if (state.counter_fail >= MAX_BAD_COUNTER) {
-      _counters_valid = false;
+bool CANParser::deadline_passed(uint64_t nanos) {
+  while (!deadlines.empty()) {
+    const auto [deadline, state] = deadlines.front();
+    if (deadline == state->last_seen_nanos + state->check_threshold) {
+      return (nanos - state->last_seen_nanos) > state->check_threshold;
     }
+    std::pop_heap(deadlines.begin(), deadlines.end(), std::greater<>());
+    deadlines.pop_back();
+  }
+  return false;
+}
+
+inline bool state_missing(const MessageState &state) {
+  return state.last_seen_nanos == 0;
+}
 
-    const bool missing = state.last_seen_nanos == 0;
-    const bool timed_out = (nanos - state.last_seen_nanos) > state.check_threshold;
-    if (state.check_threshold > 0 && (missing || timed_out)) {
-      if (show_missing && !bus_timeout) {
-        if (missing) {
-          LOGE_100("0x%X '%s' NOT SEEN", state.address, state.name.c_str());
-        } else if (timed_out) {
-          LOGE_100("0x%X '%s' TIMED OUT", state.address, state.name.c_str());
+inline bool state_timed_out(const MessageState &state, uint64_t nanos) {
+  return (nanos - state.last_seen_nanos) > state.check_threshold;
+}
+
+void CANParser::UpdateValid(uint64_t nanos) {
+  const bool show_missing = (nanos - first_nanos) > 8e9;
+
+  bool _valid = missing_count == 0;
+  if (_valid) {
+    if (nanos >= max_seen_nanos) {
+      _valid = !deadline_passed(nanos);
+    } else {
+      // time went backwards, messages seen after nanos count as timed out
+      // too, which the deadline heap doesn't capture
+      for (const auto &[_, state] : message_states) {
+        if (state.check_threshold > 0 && state_timed_out(state, nanos)) {
+          _valid = false;
+          break;
         }
       }
-      _valid = false;
     }
   }
+
+  if (!_valid && show_missing && !bus_timeout) {
+    for (const auto &[_, state] : message_states) {
+      if (state.check_threshold == 0) continue;
+      if (state_missing(state)) {
+        LOGE_100("0x%X '%s' NOT SEEN", state.address, state.name.c_str());
+      } else if (state_timed_out(state, nanos)) {
+        LOGE_100("0x%X '%s' TIMED OUT", state.address, state.name.c_str());
+      }
+    }
+  }
+
   can_invalid_cnt = _valid ? 0 : (can_invalid_cnt + 1);
-  can_valid = (can_invalid_cnt < CAN_INVALID_CNT) && _counters_valid;
+  can_valid = (can_invalid_cnt < CAN_INVALID_CNT) && counter_fail_count == 0;
 }
 
 void CANParser::query_latest(std::vector<SignalValue> &vals, uint64_t last_ts) {
@@ -259,7 +533,117 @@ void CANParser::query_latest(std::vector<SignalValue> &vals, uint64_t last_ts) {
       v.name = sig.name;
       v.value = state.vals[i];
       v.all_values = state.all_vals[i];
+      v.label_id = state.label_id(i);
       state.all_vals[i].clear();
     }
   }
 }
+
+void CANParser::query_updated(std::vector<uint32_t> &addresses, uint64_t last_ts) {
+  if (last_ts == 0) {
+    last_ts = last_nanos;
+  }
+  for (const auto &[address, state] : message_states) {
+    if (last_ts == 0 || state.last_seen_nanos >= last_ts) {
+      addresses.push_back(address);
+    }
+  }
+}
+
+void CANParser::clear_all_values() {
+  for (auto &[_, state] : message_states) {
+    for (auto &all_vals : state.all_vals) {
+      all_vals.clear();
+    }
+  }
+}
+
+const MessageState *CANParser::message_state(uint32_t address) const {
+  return find_state(address);
+}
+
+bool CANParser::batch_frame_tracked(const CanBatch &batch, size_t i) const {
+  return batch.buses[i] == bus && batch.lengths[i] <= 64 && batch.lengths[i] <= batch.dat_stride &&
+         find_state(batch.addresses[i]) != nullptr;
+}
+
+void CANParser::count_batch(const CanBatch &batch, std::unordered_map<uint32_t, size_t> &counts) const {
+  for (size_t i = 0; i < batch.size; i++) {
+    if (batch_frame_tracked(batch, i)) {
+      counts[batch.addresses[i]]++;
+    }
+  }
+}
+
+void CANParser::decode_batch(const CanBatch &batch, std::unordered_map<uint32_t, BatchColumns> &columns) const {
+  // decode with fresh message states, so counters are checked from the start
+  // of the batch and the parser's own state is left untouched. Only what
+  // decode reads is copied, not the value history.
+  std::unordered_map<uint32_t, std::pair<MessageState, size_t>> states;
+  for (const auto &[address, _] : columns) {
+    const MessageState &tracked = message_states.at(address);
+    MessageState state = {
+      .address = tracked.address,
+      .size = tracked.size,
+      .parse_sigs = tracked.parse_sigs,
+      .counter = 0,
+      .counter_fail = 0,
+      .ignore_checksum = tracked.ignore_checksum,
+      .ignore_counter = tracked.ignore_counter,
+      .plans = tracked.plans,
+    };
+    states.emplace(address, std::make_pair(std::move(state), 0));
+  }
+
+  for (size_t i = 0; i < batch.size; i++) {
+    if (!batch_frame_tracked(batch, i)) continue;
+    auto state_it = states.find(batch.addresses[i]);
+    if (state_it == states.end()) continue;
+
+    auto &[state, row] = state_it->second;
+    BatchColumns &out = columns.at(batch.addresses[i]);
+    assert(row < out.count);
+
+    bool checksum_failed, counter_failed;
+    state.decode(batch.dat + i * batch.dat_stride, batch.lengths[i], out.values + row, out.count, checksum_failed, counter_failed);
+    out.ts_nanos[row] = batch.nanos[i];
+    out.checksum_valid[row] = !checksum_failed;
+    out.counter_valid[row] = !counter_failed;
+    row++;
+  }
+}
+
+std::vector<std::string> CANParser::signal_names(uint32_t address) const {
+  std::vector<std::string> names;
+  for (const auto &sig : message_states.at(address).parse_sigs) {
+    names.push_back(sig.name);
+  }
+  return names;
+}
+
+size_t CANParser::message_count() const {
+  return message_states.size();
+}
+
+void CANParser::message_stats(StatsColumns &columns) const {
+  std::vector<const MessageState *> states;
+  for (const auto &[_, state] : message_states) {
+    states.push_back(&state);
+  }
+  std::sort(states.begin(), states.end(), [](const MessageState *a, const MessageState *b) { return a->address < b->address; });
+
+  for (size_t i = 0; i < states.size(); i++) {
+    const MessageState &state = *states[i];
+    const MessageStats &stats = state.stats;
+    const bool timed_out = state.check_threshold > 0 && !state_missing(state) && state_timed_out(state, last_nanos);
+    columns.address[i] = state.address;
+    columns.frames[i] = stats.frames;
+    columns.checksum_failures[i] = stats.checksum_failures;
+    columns.counter_failures[i] = stats.counter_failures;
+    columns.oversize_frames[i] = stats.oversize_frames;
+    columns.timeouts[i] = stats.timeouts + timed_out;
+    columns.interval_min_nanos[i] = stats.interval_min_nanos;
+    columns.interval_mean_nanos[i] = stats.intervals > 0 ? (double)stats.interval_sum_nanos / stats.intervals : 0;
+    columns.interval_max_nanos[i] = stats.interval_max_nanos;
+  }
+}
@@ -1,2 +1,6 @@
-from opendbc.can.parser_pyx import CANParser, CANDefine  # pylint: disable=no-name-in-module, import-error
+from opendbc.can.parser_pyx import CANParser, CANParserGroup, CANDefine, CAN_FRAME_DTYPE  # pylint: disable=no-name-in-module, import-error
+from opendbc.can.parser_pyx import preload_dbcs, loaded_dbcs  # pylint: disable=no-name-in-module, import-error
 assert CANParser, CANDefine
+assert CANParserGroup is not None
+assert CAN_FRAME_DTYPE is not None
+assert preload_dbcs and loaded_dbcs
@@ -1,17 +1,37 @@
 # distutils: language = c++
 # cython: c_string_encoding=ascii, language_level=3
 
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_C_CONTIGUOUS
 from cython.operator cimport dereference as deref, preincrement as preinc
+from libcpp cimport bool
 from libcpp.pair cimport pair
 from libcpp.string cimport string
+from libcpp.unordered_map cimport unordered_map
+from libcpp.unordered_set cimport unordered_set
 from libcpp.vector cimport vector
-from libc.stdint cimport uint32_t
+from libc.stdint cimport uint8_t, uint32_t, uint64_t, uintptr_t
+from libc.string cimport memcpy
 
 from .common cimport CANParser as cpp_CANParser
-from .common cimport dbc_lookup, SignalValue, DBC, CanData, CanFrame
+from .common cimport dbc_lookup, SignalValue, DBC, CanData, CanFrame, CanFrameRecord, CanDataView
+from .common cimport CanBatch, BatchColumns, StatsColumns, MessageState, DBCStats, Val, dbc_preload, dbc_loaded
+
+cdef extern from *:
+  """
+  static const size_t CAN_FRAME_RECORD_ALIGN = alignof(CanFrameRecord);
+  """
+  const size_t CAN_FRAME_RECORD_ALIGN
 
 import numbers
+import sys
 from collections import defaultdict
+from types import MappingProxyType
+
+import numpy as np
+
+# Record layout of the frame buffers taken by CANParser.update_frames
+CAN_FRAME_DTYPE = np.dtype([("address", "<u4"), ("bus", "u1"), ("len", "u1"), ("dat", "u1", 64)], align=True)
+assert CAN_FRAME_DTYPE.itemsize == sizeof(CanFrameRecord)
 
 
 cdef class CANParser:
@@ -19,15 +39,33 @@ cdef class CANParser:
     cpp_CANParser *can
     const DBC *dbc
     vector[uint32_t] addresses
+    vector[CanDataView] can_data_views
+    tuple label_values  # by SignalValue.label_id, None for values without a label
 
   cdef readonly:
     dict vl
     dict vl_all
     dict ts_nanos
     string dbc_name
-
-  def __init__(self, dbc_name, messages, bus=0):
+    int bus
+    bint lazy
+
+  def __init__(self, dbc_name, messages, bus=0, lazy=False, labels=None):
+    """
+    messages are (message, frequency) pairs, or (message, frequency, signals) to only
+    decode the listed signals of a message, plus its checksum and counter.
+
+    labels maps messages to signals with a VAL_ table to read as labels: vl holds
+    the interned label of their value, like CANDefine.dv, or None if the value has
+    no label. vl_all and ts_nanos are unchanged.
+
+    With lazy=True, vl, vl_all and ts_nanos hold a MessageView per message instead of
+    dicts. Views read the parser's latest values on access, so updates don't create
+    Python objects for signals that are never read.
+    """
     self.dbc_name = dbc_name
+    self.bus = bus
+    self.lazy = lazy
     self.dbc = dbc_lookup(dbc_name)
     if not self.dbc:
       raise RuntimeError(f"Can't find DBC: {dbc_name}")
@@ -38,6 +76,7 @@ cdef class CANParser:
 
     # Convert message names into addresses and check existence in DBC
     cdef vector[pair[uint32_t, int]] message_v
+    cdef unordered_map[uint32_t, vector[string]] signals_v
     for i in range(len(messages)):
       c = messages[i]
       try:
@@ -47,6 +86,8 @@ cdef class CANParser:
 
       address = m.address
       message_v.push_back((address, c[1]))
+      if len(c) > 2:
+        signals_v[address] = c[2]
       self.addresses.push_back(address)
 
       name = m.name.decode("utf8")
@@ -57,9 +98,32 @@ cdef class CANParser:
       self.ts_nanos[address] = {}
       self.ts_nanos[name] = self.ts_nanos[address]
 
-    self.can = new cpp_CANParser(bus, dbc_name, message_v)
+    cdef unordered_map[uint32_t, vector[string]] labels_v
+    for msg, sigs in (labels or {}).items():
+      try:
+        m = self.dbc.addr_to_msg.at(msg) if isinstance(msg, numbers.Number) else self.dbc.name_to_msg.at(msg)
+      except IndexError:
+        raise RuntimeError(f"could not find message {repr(msg)} in DBC {self.dbc_name}")
+      labels_v[m.address] = sigs
+
+    self.can = new cpp_CANParser(bus, dbc_name, message_v, signals_v, labels_v)
+    self.label_values = (None,) + tuple(sys.intern(self.can.label_names[i].decode("utf8"))
+                                        for i in range(1, self.can.label_names.size()))
+    if self.lazy:
+      self._create_views()
     self.update_strings([])
 
+  cdef _create_views(self):
+    cdef const MessageState *state
+    for address in self.addresses:
+      state = self.can.message_state(address)
+      index = {<unicode>state.parse_sigs[i].name: i for i in range(state.parse_sigs.size())}
+      m = self.dbc.addr_to_msg.at(address)
+      name = m.name.decode("utf8")
+      self.vl[address] = self.vl[name] = MessageView.create(self, state, index, VIEW_VALUES)
+      self.vl_all[address] = self.vl_all[name] = MessageView.create(self, state, index, VIEW_ALL_VALUES)
+      self.ts_nanos[address] = self.ts_nanos[name] = MessageView.create(self, state, index, VIEW_TS_NANOS)
+
   def __dealloc__(self):
     if self.can:
       del self.can
@@ -68,16 +132,6 @@ cdef class CANParser:
     # input format:
     # [nanos, [[address, data, src], ...]]
     # [[nanos, [[address, data, src], ...], ...]]
-    for address in self.addresses:
-      self.vl_all[address].clear()
-
-    cur_address = -1
-    vl = {}
-    vl_all = {}
-    ts_nanos = {}
-    updated_addrs = set()
-
-    cdef vector[SignalValue] new_vals
     cdef CanFrame* frame
     cdef CanData* can_data
     cdef vector[CanData] can_data_array
@@ -99,7 +153,82 @@ cdef class CANParser:
     except TypeError:
       raise RuntimeError("invalid parameter")
 
-    self.can.update(can_data_array, new_vals)
+    return self._update_data(can_data_array)
+
+  cdef _clear_vl_all(self):
+    for address in self.addresses:
+      self.vl_all[address].clear()
+
+  def update_frames(self, frames):
+    """
+    Like update_strings, but takes [nanos, frames] or a list of them, where frames is
+    any C-contiguous buffer (bytes, memoryview, NumPy array) of packed CAN_FRAME_DTYPE
+    records. Payloads are read in place, without being copied, unless the buffer
+    isn't aligned for CAN_FRAME_DTYPE.
+    """
+    if len(frames) and not isinstance(frames[0], (list, tuple)):
+      frames = [frames]
+
+    cdef vector[Py_buffer] buffers
+    cdef vector[vector[CanFrameRecord]] aligned_copies
+    cdef Py_buffer *buf
+    cdef CanDataView *view
+    self.can_data_views.clear()
+    buffers.reserve(len(frames))
+    aligned_copies.reserve(len(frames))
+    try:
+      for nanos, buffer in frames:
+        buf = &buffers.emplace_back()
+        try:
+          PyObject_GetBuffer(buffer, buf, PyBUF_C_CONTIGUOUS)
+        except BaseException:
+          buffers.pop_back()
+          raise
+        if buf.len % sizeof(CanFrameRecord) != 0:
+          raise ValueError(f"frame buffer size must be a multiple of {sizeof(CanFrameRecord)} bytes")
+
+        view = &self.can_data_views.emplace_back()
+        view.nanos = nanos
+        view.size = buf.len // sizeof(CanFrameRecord)
+        if <uintptr_t>buf.buf % CAN_FRAME_RECORD_ALIGN == 0:
+          view.frames = <const CanFrameRecord *>buf.buf
+        else:
+          aligned_copies.emplace_back(view.size)
+          if view.size > 0:
+            memcpy(aligned_copies.back().data(), buf.buf, buf.len)
+          view.frames = aligned_copies.back().data()
+
+      return self._update_views(self.can_data_views)
+    finally:
+      for i in range(buffers.size()):
+        PyBuffer_Release(&buffers[i])
+
+  cdef _update_data(self, vector[CanData] &can_data):
+    cdef vector[SignalValue] new_vals
+    cdef vector[uint32_t] updated
+    if self.lazy:
+      self.can.update_addresses(can_data, updated)
+      return set(updated)
+    self._clear_vl_all()
+    self.can.update(can_data, new_vals)
+    return self._update_vl(new_vals)
+
+  cdef _update_views(self, vector[CanDataView] &can_data):
+    cdef vector[SignalValue] new_vals
+    cdef vector[uint32_t] updated
+    if self.lazy:
+      self.can.update_addresses(can_data, updated)
+      return set(updated)
+    self._clear_vl_all()
+    self.can.update(can_data, new_vals)
+    return self._update_vl(new_vals)
+
+  cdef _update_vl(self, vector[SignalValue] &new_vals):
+    cur_address = -1
+    vl = {}
+    vl_all = {}
+    ts_nanos = {}
+    updated_addrs = set()
 
     cdef vector[SignalValue].iterator it = new_vals.begin()
     cdef SignalValue* cv
@@ -116,13 +245,133 @@ cdef class CANParser:
 
       # Cast char * directly to unicode
       cv_name = <unicode>cv.name
-      vl[cv_name] = cv.value
+      vl[cv_name] = cv.value if cv.label_id < 0 else self.label_values[cv.label_id]
       vl_all[cv_name] = cv.all_values
       ts_nanos[cv_name] = cv.ts_nanos
       preinc(it)
 
     return updated_addrs
 
+  def decode_batch(self, nanos, addresses, buses, dat, lengths=None):
+    """
+    Decodes a whole log in one call, without creating Python objects per frame.
+
+    Takes one array per column: frame timestamps, addresses, buses and an NxW array
+    of payloads, with optional payload lengths (defaults to W). Returns
+    {message: {"ts_nanos": ..., "checksum_valid": ..., "counter_valid": ..., "values": {signal: ...}}}
+    for every tracked message on this parser's bus, keyed by both name and address.
+    Messages without frames in the batch have empty arrays.
+
+    Every frame is decoded, including ones that fail their checks, which are flagged
+    in checksum_valid and counter_valid. Counters are checked from the start of the
+    batch; the state used by update_strings is not touched.
+    """
+    cdef const uint64_t[::1] nanos_v = np.ascontiguousarray(nanos, dtype=np.uint64)
+    cdef const uint32_t[::1] addresses_v = np.ascontiguousarray(addresses, dtype=np.uint32)
+    cdef const uint8_t[::1] buses_v = np.ascontiguousarray(buses, dtype=np.uint8)
+    dat = np.ascontiguousarray(dat, dtype=np.uint8)
+    if dat.ndim != 2:
+      raise ValueError("dat must be a 2D array of payloads")
+    if lengths is None:
+      lengths = np.full(dat.shape[0], dat.shape[1], dtype=np.uint8)
+    cdef const uint8_t[::1] lengths_v = np.ascontiguousarray(lengths, dtype=np.uint8)
+    cdef const uint8_t[:, ::1] dat_v = dat
+
+    cdef size_t n = nanos_v.shape[0]
+    if not (addresses_v.shape[0] == buses_v.shape[0] == lengths_v.shape[0] == dat_v.shape[0] == n):
+      raise ValueError("all columns must have the same length")
+
+    cdef CanBatch batch
+    batch.size = n
+    batch.dat_stride = dat_v.shape[1]
+    if n > 0:
+      batch.nanos = &nanos_v[0]
+      batch.addresses = &addresses_v[0]
+      batch.buses = &buses_v[0]
+      batch.lengths = &lengths_v[0]
+      batch.dat = &dat_v[0, 0] if batch.dat_stride > 0 else NULL
+
+    cdef unordered_map[uint32_t, size_t] counts
+    self.can.count_batch(batch, counts)
+
+    # preallocate the output, the C++ side writes straight into these arrays
+    cdef unordered_map[uint32_t, BatchColumns] columns
+    cdef BatchColumns *col
+    cdef uint64_t[::1] ts_v
+    cdef double[:, ::1] values_v
+    cdef uint8_t[::1] checksum_v, counter_v
+    ret = {}
+    for address in self.addresses:
+      count = counts[address] if counts.count(address) else 0
+      sig_names = [<unicode>name for name in self.can.signal_names(address)]
+      ts_nanos = np.empty(count, dtype=np.uint64)
+      values = np.empty((len(sig_names), count), dtype=np.float64)
+      checksum_valid = np.empty(count, dtype=np.bool_)
+      counter_valid = np.empty(count, dtype=np.bool_)
+
+      ts_v = ts_nanos
+      values_v = values
+      checksum_v = checksum_valid.view(np.uint8)
+      counter_v = counter_valid.view(np.uint8)
+      if count > 0:
+        col = &columns[address]
+        col.count = count
+        col.ts_nanos = &ts_v[0]
+        col.values = &values_v[0, 0] if len(sig_names) else NULL
+        col.checksum_valid = &checksum_v[0]
+        col.counter_valid = &counter_v[0]
+
+      assert len(values) == len(sig_names)
+      ret[address] = {
+        "ts_nanos": ts_nanos,
+        "checksum_valid": checksum_valid,
+        "counter_valid": counter_valid,
+        "values": dict(zip(sig_names, values)),
+      }
+      m = self.dbc.addr_to_msg.at(address)
+      ret[m.name.decode("utf8")] = ret[address]
+
+    self.can.decode_batch(batch, columns)
+    return ret
+
+  def message_stats(self):
+    """
+    Returns health counters of every tracked message as one array per counter,
+    ordered by "address": frames received, checksum_failures, counter_failures,
+    oversize_frames (dropped), timeouts, and the min, mean and max nanoseconds
+    between frames that passed their checks. Counters are never reset, diff
+    snapshots to get rates.
+    """
+    cdef size_t n = self.can.message_count()
+    ret = {
+      "address": np.zeros(n, dtype=np.uint32),
+      **{name: np.zeros(n, dtype=np.uint64) for name in ("frames", "checksum_failures", "counter_failures",
+                                                         "oversize_frames", "timeouts", "interval_min_nanos")},
+      "interval_mean_nanos": np.zeros(n, dtype=np.float64),
+      "interval_max_nanos": np.zeros(n, dtype=np.uint64),
+    }
+    if n == 0:
+      return ret
+
+    cdef uint32_t[::1] address_v = ret["address"]
+    cdef uint64_t[::1] frames_v = ret["frames"], checksum_v = ret["checksum_failures"]
+    cdef uint64_t[::1] counter_v = ret["counter_failures"], oversize_v = ret["oversize_frames"]
+    cdef uint64_t[::1] timeouts_v = ret["timeouts"]
+    cdef uint64_t[::1] min_v = ret["interval_min_nanos"], max_v = ret["interval_max_nanos"]
+    cdef double[::1] mean_v = ret["interval_mean_nanos"]
+    cdef StatsColumns columns
+    columns.address = &address_v[0]
+    columns.frames = &frames_v[0]
+    columns.checksum_failures = &checksum_v[0]
+    columns.counter_failures = &counter_v[0]
+    columns.oversize_frames = &oversize_v[0]
+    columns.timeouts = &timeouts_v[0]
+    columns.interval_min_nanos = &min_v[0]
+    columns.interval_mean_nanos = &mean_v[0]
+    columns.interval_max_nanos = &max_v[0]
+    self.can.message_stats(columns)
+    return ret
+
   @property
   def can_valid(self):
     return self.can.can_valid
@@ -132,7 +381,174 @@ cdef class CANParser:
     return self.can.bus_timeout
 
 
+cdef enum ViewKind:
+  VIEW_VALUES
+  VIEW_ALL_VALUES
+  VIEW_TS_NANOS
+
+
+cdef class MessageView:
+  """
+  Read-only mapping of signal name to the latest value, all values from the last
+  update, or timestamp of one message, as used in CANParser.vl, vl_all and
+  ts_nanos in lazy mode. Python objects are only created for the signals read.
+  """
+  cdef:
+    CANParser parser  # keeps the C++ parser owning state alive
+    const MessageState *state
+    dict index
+    ViewKind kind
+
+  @staticmethod
+  cdef MessageView create(CANParser parser, const MessageState *state, dict index, ViewKind kind):
+    cdef MessageView view = MessageView.__new__(MessageView)
+    view.parser = parser
+    view.state = state
+    view.index = index
+    view.kind = kind
+    return view
+
+  cdef _value(self, size_t i):
+    cdef int label_id
+    if self.kind == VIEW_VALUES:
+      label_id = self.state.label_id(i)
+      return self.state.vals[i] if label_id < 0 else self.parser.label_values[label_id]
+    elif self.kind == VIEW_ALL_VALUES:
+      return self.state.all_vals[i]
+    return self.state.last_seen_nanos
+
+  def __getitem__(self, name):
+    return self._value(self.index[name])
+
+  def get(self, name, default=None):
+    i = self.index.get(name)
+    return default if i is None else self._value(i)
+
+  def __contains__(self, name):
+    return name in self.index
+
+  def __iter__(self):
+    return iter(self.index)
+
+  def __len__(self):
+    return len(self.index)
+
+  def keys(self):
+    return self.index.keys()
+
+  def values(self):
+    return [self._value(i) for i in self.index.values()]
+
+  def items(self):
+    return [(name, self._value(i)) for name, i in self.index.items()]
+
+  def __eq__(self, other):
+    return dict(self.items()) == (dict(other.items()) if isinstance(other, MessageView) else other)
+
+  def __repr__(self):
+    return repr(dict(self.items()))
+
+
+cdef class CANParserGroup:
+  """
+  Updates several CANParsers from one list of packets, such as all the parsers of
+  a car interface. The packets are converted once and each frame is only handed
+  to the parsers on its bus, and only copied if one of them tracks its address.
+  """
+  cdef:
+    list parsers
+    vector[size_t] parser_bus
+    unordered_map[long, size_t] bus_index
+    vector[unordered_set[uint32_t]] bus_addresses
+    vector[vector[CanData]] bus_data
+    vector[bool] bus_seen
+
+  def __init__(self, parsers):
+    self.parsers = list(parsers)
+
+    cdef CANParser cp
+    for cp in self.parsers:
+      if self.bus_index.count(cp.bus) == 0:
+        self.bus_index[cp.bus] = self.bus_addresses.size()
+        self.bus_addresses.emplace_back()
+        self.bus_data.emplace_back()
+        self.bus_seen.push_back(False)
+      b = self.bus_index[cp.bus]
+      self.parser_bus.push_back(b)
+      for address in cp.addresses:
+        self.bus_addresses[b].insert(address)
+
+  def update_strings(self, strings, sendcan=False):
+    """
+    Same input as CANParser.update_strings. Returns the updated addresses of each
+    parser, in the order the parsers were given.
+    """
+    cdef CANParser cp
+    cdef size_t b, i
+    cdef uint32_t address
+    cdef long src
+    cdef CanFrame *frame
+    cdef unordered_map[long, size_t].iterator bus_it
+    for b in range(self.bus_data.size()):
+      self.bus_data[b].clear()
+
+    try:
+      if len(strings) and not isinstance(strings[0], (list, tuple)):
+        strings = [strings]
+
+      for b in range(self.bus_data.size()):
+        self.bus_data[b].reserve(len(strings))
+      for s in strings:
+        for b in range(self.bus_data.size()):
+          self.bus_data[b].emplace_back().nanos = s[0]
+          self.bus_seen[b] = False
+
+        for f in s[1]:
+          src = f[2]
+          bus_it = self.bus_index.find(src)
+          if bus_it == self.bus_index.end():
+            continue
+          b = deref(bus_it).second
+
+          # untracked frames are only needed to tell the parsers their bus isn't empty
+          address = f[0]
+          tracked = self.bus_addresses[b].count(address) > 0
+          if not tracked and self.bus_seen[b]:
+            continue
+          frame = &self.bus_data[b].back().frames.emplace_back()
+          if tracked:
+            frame.dat = f[1]
+          frame.address = address
+          frame.src = src
+          self.bus_seen[b] = True
+    except TypeError:
+      raise RuntimeError("invalid parameter")
+
+    updated = []
+    for i in range(len(self.parsers)):
+      cp = self.parsers[i]
+      updated.append(cp._update_data(self.bus_data[self.parser_bus[i]]))
+    return updated
+
+  @property
+  def can_valid(self):
+    return all(cp.can_valid for cp in self.parsers)
+
+  @property
+  def bus_timeout(self):
+    return any(cp.bus_timeout for cp in self.parsers)
+
+
+# value tables by DBC name, shared by all CANDefines of a DBC
+_dv_cache = {}
+
+
 cdef class CANDefine():
+  """
+  Value tables of a DBC: dv[message][signal] maps values to labels, with messages
+  by name or address. The value tables are built once per DBC and shared as
+  read-only mappings, the dicts holding them belong to this CANDefine.
+  """
   cdef:
     const DBC *dbc
 
@@ -146,13 +562,19 @@ cdef class CANDefine():
     if not self.dbc:
       raise RuntimeError(f"Can't find DBC: '{dbc_name}'")
 
+    tables = _dv_cache.get(dbc_name)
+    if tables is None:
+      tables = _dv_cache[dbc_name] = self._build_dv()
+    self.dv = {msg: dict(sigs) for msg, sigs in tables.items()}
+
+  cdef dict _build_dv(self):
+    cdef const Val *val
     dv = defaultdict(dict)
 
     for i in range(self.dbc[0].vals.size()):
-      val = self.dbc[0].vals[i]
+      val = &self.dbc[0].vals[i]
 
       sgname = val.name.decode("utf8")
-      def_val = val.def_val.decode("utf8")
       address = val.address
       try:
         m = self.dbc.addr_to_msg.at(address)
@@ -160,13 +582,36 @@ cdef class CANDefine():
         raise KeyError(address)
       msgname = m.name.decode("utf-8")
 
-      # separate definition/value pairs
-      def_val = def_val.split()
-      values = [int(v) for v in def_val[::2]]
-      defs = def_val[1::2]
+      labels = MappingProxyType({val.labels[j].value: sys.intern(val.labels[j].label.decode("utf8"))
+                                 for j in range(val.labels.size())})
 
       # two ways to lookup: address or msg name
-      dv[address][sgname] = dict(zip(values, defs))
-      dv[msgname][sgname] = dv[address][sgname]
-
-    self.dv = dict(dv)
+      dv[address][sgname] = labels
+      dv[msgname][sgname] = labels
+
+    return dict(dv)
+
+
+def preload_dbcs(dbc_names, int num_threads=0):
+  """
+  Loads DBCs in parallel ahead of their first use by a CANParser, CANPacker or
+  CANDefine. num_threads=0 uses one thread per core. Other Python threads keep
+  running while the DBCs load.
+  """
+  cdef vector[string] names = [name.encode("utf8") for name in dbc_names]
+  with nogil:
+    dbc_preload(names, num_threads)
+
+
+def loaded_dbcs():
+  """
+  Returns the DBCs loaded in this process, with their load time and estimated
+  memory footprint.
+  """
+  cdef vector[DBCStats] stats = dbc_loaded()
+  return [{
+    "name": s.name.decode("utf8"),
+    "path": s.path.decode("utf8"),
+    "load_ms": s.load_ms,
+    "memory_bytes": s.memory_bytes,
+  } for s in stats]
@@ -0,0 +1,220 @@
+// Checks the checksum functions in common.cc against their original byte-wise
+// and bit-serial implementations on random payloads, and times every
+// checksum algorithm on payloads of the size its cars send.
+//
+// usage: checksum_benchmark [iterations]
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <string>
+#include <vector>
+
+#include "opendbc/can/common.h"
+
+namespace {
+
+// the original checksum signature
+typedef unsigned int (*vector_checksum_type)(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
+
+unsigned int legacy_honda_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+  int s = 0;
+  bool extended = address > 0x7FF;
+  while (address) { s += (address & 0xF); address >>= 4; }
+  for (int i = 0; i < d.size(); i++) {
+    uint8_t x = d[i];
+    if (i == d.size()-1) x >>= 4; // remove checksum
+    s += (x & 0xF) + (x >> 4);
+  }
+  s = 8-s;
+  if (extended) s += 3;  // extended can
+
+  return s & 0xF;
+}
+
+unsigned int legacy_toyota_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+  unsigned int s = d.size();
+  while (address) { s += address & 0xFF; address >>= 8; }
+  for (int i = 0; i < d.size() - 1; i++) { s += d[i]; }
+
+  return s & 0xFF;
+}
+
+unsigned int legacy_subaru_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+  unsigned int s = 0;
+  while (address) { s += address & 0xFF; address >>= 8; }
+
+  // skip checksum in first byte
+  for (int i = 1; i < d.size(); i++) { s += d[i]; }
+
+  return s & 0xFF;
+}
+
+unsigned int legacy_chrysler_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+  // jeep chrysler canbus checksum from http://illmatics.com/Remote%20Car%20Hacking.pdf
+  uint8_t checksum = 0xFF;
+  for (int j = 0; j < (d.size() - 1); j++) {
+    uint8_t shift = 0x80;
+    uint8_t curr = d[j];
+    for (int i = 0; i < 8; i++) {
+      uint8_t bit_sum = curr & shift;
+      uint8_t temp_chk = checksum & 0x80U;
+      if (bit_sum != 0U) {
+        bit_sum = 0x1C;
+        if (temp_chk != 0U) {
+          bit_sum = 1;
+        }
+        checksum = checksum << 1;
+        temp_chk = checksum | 1U;
+        bit_sum ^= temp_chk;
+      } else {
+        if (temp_chk != 0U) {
+          bit_sum = 0x1D;
+        }
+        checksum = checksum << 1;
+        bit_sum ^= checksum;
+      }
+      checksum = bit_sum;
+      shift = shift >> 1;
+    }
+  }
+  return ~checksum & 0xFF;
+}
+
+unsigned int legacy_xor_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+  uint8_t checksum = 0;
+  int checksum_byte = sig.start_bit / 8;
+
+  // Simple XOR over the payload, except for the byte where the checksum lives.
+  for (int i = 0; i < d.size(); i++) {
+    if (i != checksum_byte) {
+      checksum ^= d[i];
+    }
+  }
+
+  return checksum;
+}
+
+unsigned int legacy_pedal_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+  uint8_t crc = 0xFF;
+  uint8_t poly = 0xD5; // standard crc8
+
+  // skip checksum byte
+  for (int i = d.size()-2; i >= 0; i--) {
+    crc ^= d[i];
+    for (int j = 0; j < 8; j++) {
+      if ((crc & 0x80) != 0) {
+        crc = (uint8_t)((crc << 1) ^ poly);
+      } else {
+        crc <<= 1;
+      }
+    }
+  }
+  return crc;
+}
+
+struct Algorithm {
+  std::string name;
+  calc_checksum_type calc_checksum;
+  vector_checksum_type legacy;  // nullptr if unchanged
+  std::vector<size_t> sizes;  // payload sizes to check and time
+  std::vector<uint32_t> addresses;
+  int checksum_start_bit = 0;
+};
+
+std::vector<Algorithm> algorithms() {
+  return {
+    {"honda", honda_checksum, legacy_honda_checksum, {1, 3, 4, 5, 6, 8}, {0x1a6, 0x1fa, 0x18daf1b0}},
+    {"toyota", toyota_checksum, legacy_toyota_checksum, {1, 2, 5, 8}, {0x2e4, 0x343, 0x412}},
+    {"subaru", subaru_checksum, legacy_subaru_checksum, {1, 2, 8}, {0x122, 0x221, 0x321}},
+    {"chrysler", chrysler_checksum, legacy_chrysler_checksum, {1, 3, 4, 6, 8}, {0x292, 0x2a6, 0x1f6}},
+    {"xor", xor_checksum, legacy_xor_checksum, {1, 7, 8, 24, 64}, {0x2b0, 0x1f0}, 56},
+    {"pedal", pedal_checksum, legacy_pedal_checksum, {1, 6, 8}, {0x200, 0x201}},
+    {"volkswagen_mqb", volkswagen_mqb_checksum, nullptr, {8}, {0x126, 0x12b, 0x30c}},
+    {"hkg_can_fd", hkg_can_fd_checksum, nullptr, {8, 16, 24, 32, 64}, {0x50, 0x12a, 0x1cf}},
+    {"fca_giorgio", fca_giorgio_checksum, nullptr, {8}, {0xde, 0x106, 0x1f0}},
+  };
+}
+
+// returns the number of payloads that got a different checksum
+int check(const Algorithm &algorithm, std::mt19937 &rng) {
+  if (algorithm.legacy == nullptr) return 0;
+
+  Signal sig = {};
+  sig.start_bit = algorithm.checksum_start_bit;
+
+  int mismatches = 0;
+  for (size_t size = 1; size <= 64; size++) {
+    for (int i = 0; i < 500; i++) {
+      std::vector<uint8_t> dat(size);
+      for (auto &b : dat) b = rng();
+      const uint32_t address = i % 2 == 0 ? rng() % 0x800 : rng() % 0x20000000;
+      const unsigned int expected = algorithm.legacy(address, sig, dat);
+      const unsigned int got = algorithm.calc_checksum(address, sig, dat.data(), dat.size());
+      if (got != expected) {
+        if (mismatches < 10) {
+          printf("%s: 0x%X with %zu bytes got 0x%X, expected 0x%X\n", algorithm.name.c_str(), address, size, got, expected);
+        }
+        mismatches++;
+      }
+    }
+  }
+  return mismatches;
+}
+
+template <typename F>
+double time_ns(F calc_checksum, const Algorithm &algorithm, const std::vector<std::vector<uint8_t>> &payloads,
+               int iterations) {
+  Signal sig = {};
+  sig.start_bit = algorithm.checksum_start_bit;
+
+  volatile unsigned int sink = 0;
+  auto start = std::chrono::steady_clock::now();
+  for (int it = 0; it < iterations; it++) {
+    for (size_t i = 0; i < payloads.size(); i++) {
+      sink = sink + calc_checksum(algorithm.addresses[i % algorithm.addresses.size()], sig, payloads[i]);
+    }
+  }
+  const double elapsed = std::chrono::duration<double, std::nano>(std::chrono::steady_clock::now() - start).count();
+  return elapsed / ((double)payloads.size() * iterations);
+}
+
+void benchmark(const Algorithm &algorithm, int iterations, std::mt19937 &rng) {
+  for (size_t size : algorithm.sizes) {
+    std::vector<std::vector<uint8_t>> payloads(256, std::vector<uint8_t>(size));
+    for (auto &dat : payloads) {
+      for (auto &b : dat) b = rng();
+    }
+
+    const double ns = time_ns([&](uint32_t address, const Signal &sig, const std::vector<uint8_t> &dat) {
+      return algorithm.calc_checksum(address, sig, dat.data(), dat.size());
+    }, algorithm, payloads, iterations);
+    if (algorithm.legacy != nullptr) {
+      const double legacy_ns = time_ns(algorithm.legacy, algorithm, payloads, iterations);
+      printf("%-15s %2zu bytes  original %6.1f ns/frame  now %6.1f ns/frame  %4.1fx\n", algorithm.name.c_str(), size,
+             legacy_ns, ns, legacy_ns / ns);
+    } else {
+      printf("%-15s %2zu bytes  %6.1f ns/frame\n", algorithm.name.c_str(), size, ns);
+    }
+  }
+}
+
+}  // namespace
+
+int main(int argc, char **argv) {
+  const int iterations = argc > 1 ? std::atoi(argv[1]) : 10000;
+  std::mt19937 rng(0);
+
+  int mismatches = 0;
+  for (const auto &algorithm : algorithms()) {
+    mismatches += check(algorithm, rng);
+    benchmark(algorithm, iterations, rng);
+  }
+
+  if (mismatches > 0) {
+    printf("%d checksums differ from the original implementations\n", mismatches);
+    return 1;
+  }
+  return 0;
+}
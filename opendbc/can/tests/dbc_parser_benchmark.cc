@@ -0,0 +1,205 @@
+// Parses every DBC in opendbc/dbc with the tokenizer in dbc.cc and with the
+// std::regex parser it replaced, checks that both produce the same DBC and
+// reports how long each one took.
+//
+// usage: dbc_parser_benchmark [iterations]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <fstream>
+#include <iterator>
+#include <map>
+#include <memory>
+#include <regex>
+#include <sstream>
+#include <string>
+#include <vector>
+
+#include "opendbc/can/common.h"
+#include "opendbc/can/common_dbc.h"
+
+namespace {
+
+#define REGEX_ASSERT(condition, message)                           \
+  do {                                                             \
+    if (!(condition)) {                                            \
+      std::stringstream is;                                        \
+      is << "[" << dbc_name << ":" << line_num << "] " << message; \
+      throw std::runtime_error(is.str());                          \
+    }                                                              \
+  } while (false)
+
+const std::regex bo_regexp(R"(^BO_ (\w+) (\w+) *: (\w+) (\w+))");
+const std::regex sg_regexp(R"(^SG_ (\w+) : (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*))");
+const std::regex sgm_regexp(R"(^SG_ (\w+) (\w+) *: (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*))");
+const std::regex val_regexp(R"(VAL_ (\w+) (\w+) (\s*[-+]?[0-9]+\s+\".+?\"[^;]*))");
+const std::regex val_split_regexp{R"([\"]+)"};  // split on "
+
+std::string& trim(std::string& s, const char* t = " \t\n\r\f\v") {
+  s.erase(s.find_last_not_of(t) + 1);
+  return s.erase(0, s.find_first_not_of(t));
+}
+
+// The std::regex based parser as it was before the tokenizer. Checksum and
+// counter signal types are assigned by the same rules as in dbc.cc.
+DBC* regex_parse_from_stream(const std::string &dbc_name, std::istream &stream, ChecksumState *checksum) {
+  uint32_t address = 0;
+  std::map<uint32_t, std::vector<Signal>> signals;
+  DBC* dbc = new DBC;
+  dbc->name = dbc_name;
+
+  std::vector<int> be_bits;
+  for (int i = 0; i < 64; i++) {
+    for (int j = 7; j >= 0; j--) {
+      be_bits.push_back(j + i * 8);
+    }
+  }
+
+  std::string line;
+  int line_num = 0;
+  std::smatch match;
+  while (std::getline(stream, line)) {
+    line = trim(line);
+    line_num += 1;
+    if (line.find("BO_ ") == 0) {
+      bool ret = std::regex_match(line, match, bo_regexp);
+      REGEX_ASSERT(ret, "bad BO: " << line);
+
+      Msg& msg = dbc->msgs.emplace_back();
+      address = msg.address = std::stoul(match[1].str());
+      msg.name = match[2].str();
+      msg.size = std::stoul(match[3].str());
+    } else if (line.find("SG_ ") == 0) {
+      int offset = 0;
+      if (!std::regex_search(line, match, sg_regexp)) {
+        bool ret = std::regex_search(line, match, sgm_regexp);
+        REGEX_ASSERT(ret, "bad SG: " << line);
+        offset = 1;
+      }
+      Signal& sig = signals[address].emplace_back();
+      sig.name = match[1].str();
+      sig.start_bit = std::stoi(match[offset + 2].str());
+      sig.size = std::stoi(match[offset + 3].str());
+      sig.is_little_endian = std::stoi(match[offset + 4].str()) == 1;
+      sig.is_signed = match[offset + 5].str() == "-";
+      sig.factor = std::stod(match[offset + 6].str());
+      sig.offset = std::stod(match[offset + 7].str());
+      set_signal_type(sig, checksum, dbc_name, line_num);
+      if (sig.is_little_endian) {
+        sig.lsb = sig.start_bit;
+        sig.msb = sig.start_bit + sig.size - 1;
+      } else {
+        auto it = find(be_bits.begin(), be_bits.end(), sig.start_bit);
+        sig.lsb = be_bits[(it - be_bits.begin()) + sig.size - 1];
+        sig.msb = sig.start_bit;
+      }
+    } else if (line.find("VAL_ ") == 0) {
+      bool ret = std::regex_search(line, match, val_regexp);
+      REGEX_ASSERT(ret, "bad VAL: " << line);
+
+      auto& val = dbc->vals.emplace_back();
+      val.address = std::stoul(match[1].str());
+      val.name = match[2].str();
+
+      auto defvals = match[3].str();
+      std::sregex_token_iterator it{defvals.begin(), defvals.end(), val_split_regexp, -1};
+      std::vector<std::string> words{it, {}};
+      for (auto& w : words) {
+        w = trim(w);
+        std::transform(w.begin(), w.end(), w.begin(), ::toupper);
+        std::replace(w.begin(), w.end(), ' ', '_');
+      }
+      std::stringstream s;
+      std::copy(words.begin(), words.end(), std::ostream_iterator<std::string>(s, " "));
+      val.def_val = s.str();
+      val.def_val = trim(val.def_val);
+    }
+  }
+
+  for (auto& m : dbc->msgs) {
+    m.sigs = signals[m.address];
+  }
+  for (auto& v : dbc->vals) {
+    v.sigs = signals[v.address];
+  }
+  return dbc;
+}
+
+bool same_signals(const std::vector<Signal> &a, const std::vector<Signal> &b) {
+  if (a.size() != b.size()) return false;
+  for (size_t i = 0; i < a.size(); i++) {
+    if (a[i].name != b[i].name || a[i].start_bit != b[i].start_bit || a[i].msb != b[i].msb || a[i].lsb != b[i].lsb ||
+        a[i].size != b[i].size || a[i].is_signed != b[i].is_signed || a[i].factor != b[i].factor || a[i].offset != b[i].offset ||
+        a[i].is_little_endian != b[i].is_little_endian || a[i].type != b[i].type || a[i].calc_checksum != b[i].calc_checksum) {
+      return false;
+    }
+  }
+  return true;
+}
+
+bool same_dbc(const DBC &a, const DBC &b) {
+  if (a.msgs.size() != b.msgs.size() || a.vals.size() != b.vals.size()) return false;
+  for (size_t i = 0; i < a.msgs.size(); i++) {
+    const Msg &ma = a.msgs[i], &mb = b.msgs[i];
+    if (ma.name != mb.name || ma.address != mb.address || ma.size != mb.size || !same_signals(ma.sigs, mb.sigs)) return false;
+  }
+  for (size_t i = 0; i < a.vals.size(); i++) {
+    const Val &va = a.vals[i], &vb = b.vals[i];
+    if (va.name != vb.name || va.address != vb.address || va.def_val != vb.def_val || !same_signals(va.sigs, vb.sigs)) return false;
+  }
+  return true;
+}
+
+template <typename ParseFn>
+double time_parse(const std::string &content, int iterations, ParseFn parse) {
+  auto start = std::chrono::steady_clock::now();
+  for (int i = 0; i < iterations; i++) {
+    std::istringstream stream(content);
+    delete parse(stream);
+  }
+  return std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - start).count() / iterations;
+}
+
+}  // namespace
+
+int main(int argc, char **argv) {
+  const int iterations = argc > 1 ? std::atoi(argv[1]) : 10;
+
+  std::vector<std::string> names = get_dbc_names();
+  std::sort(names.begin(), names.end());
+
+  int mismatches = 0;
+  double total_regex = 0, total_tokenizer = 0;
+  for (const auto &name : names) {
+    const std::string dbc_name = name + ".dbc";
+    std::ifstream infile(std::string(DBC_FILE_PATH) + "/" + dbc_name);
+    const std::string content{std::istreambuf_iterator<char>(infile), std::istreambuf_iterator<char>()};
+    std::unique_ptr<ChecksumState> checksum(get_checksum(dbc_name));
+
+    auto regex_parse = [&](std::istream &stream) { return regex_parse_from_stream(dbc_name, stream, checksum.get()); };
+    auto tokenizer_parse = [&](std::istream &stream) { return dbc_parse_from_stream(dbc_name, stream, checksum.get(), true); };
+
+    std::istringstream regex_stream(content), tokenizer_stream(content);
+    std::unique_ptr<DBC> expected(regex_parse(regex_stream));
+    std::unique_ptr<DBC> actual(tokenizer_parse(tokenizer_stream));
+    const bool same = same_dbc(*expected, *actual);
+    mismatches += !same;
+
+    const double regex_ms = time_parse(content, iterations, regex_parse);
+    const double tokenizer_ms = time_parse(content, iterations, tokenizer_parse);
+    total_regex += regex_ms;
+    total_tokenizer += tokenizer_ms;
+    printf("%-50s regex %8.3f ms  tokenizer %8.3f ms  %6.1fx%s\n", name.c_str(), regex_ms, tokenizer_ms,
+           regex_ms / tokenizer_ms, same ? "" : "  MISMATCH");
+  }
+
+  printf("%zu DBCs: regex %.1f ms, tokenizer %.1f ms, %.1fx faster\n", names.size(), total_regex, total_tokenizer,
+         total_regex / total_tokenizer);
+  if (mismatches > 0) {
+    printf("%d DBCs parsed differently\n", mismatches);
+    return 1;
+  }
+  return 0;
+}
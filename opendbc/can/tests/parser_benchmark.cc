@@ -0,0 +1,276 @@
+// Replays synthetic Toyota drives through CANParser and reports the cost per
+// frame. Like in a real car, many of the frames aren't tracked by the parser.
+// The original CANParser::update, which looked up every frame in a hash map
+// and rescanned all messages for validity every cycle, is timed on the same
+// frames for reference.
+//
+// usage: parser_benchmark [iterations]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <limits>
+#include <string>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+#include "opendbc/can/common.h"
+#include "opendbc/can/common_dbc.h"
+
+namespace {
+
+const uint64_t CYCLE_NANOS = 10000000ULL;  // 100 Hz, like controlsd
+const int CYCLES = 6000;
+
+struct Source {
+  uint32_t address;
+  long src;
+  int period;  // in cycles
+  std::vector<uint8_t> dat;
+};
+
+struct Scenario {
+  std::string name;
+  std::string dbc_name;
+  int bus;
+  std::vector<std::pair<uint32_t, int>> messages;  // tracked addresses and frequencies
+  std::vector<Source> sources;
+  size_t batch_size;  // CanData per update call
+};
+
+// Toyota CarState: every DBC message on bus 0, with camera, radar and 29-bit
+// diagnostic traffic mixed in, updated once per cycle.
+Scenario carstate_scenario() {
+  Scenario scenario = {"carstate", "toyota_new_mc_pt_generated", 0, {}, {}, 1};
+  const DBC *dbc = dbc_lookup(scenario.dbc_name);
+
+  // message name and frequency, as requested by the Toyota CarState
+  const std::vector<std::pair<std::string, int>> tracked = {
+    {"LIGHT_STALK", 1}, {"BLINKERS_STATE", 0}, {"BODY_CONTROL_STATE", 3}, {"BODY_CONTROL_STATE_2", 2},
+    {"ESP_CONTROL", 3}, {"EPS_STATUS", 25}, {"BRAKE_MODULE", 40}, {"WHEEL_SPEEDS", 80},
+    {"STEER_ANGLE_SENSOR", 80}, {"PCM_CRUISE", 33}, {"PCM_CRUISE_SM", 1}, {"STEER_TORQUE_SENSOR", 50},
+    {"GEAR_PACKET", 1}, {"VSC1S07", 20}, {"PCM_CRUISE_2", 33}, {"ACC_CONTROL", 33},
+  };
+  for (const auto &[name, frequency] : tracked) {
+    scenario.messages.emplace_back(dbc->name_to_msg.at(name)->address, frequency);
+  }
+
+  const int periods[] = {1, 2, 3, 5, 10};
+  for (size_t i = 0; i < dbc->msgs.size(); i++) {
+    const Msg &msg = dbc->msgs[i];
+    scenario.sources.push_back({msg.address, 0, periods[i % 5], {}});
+    if (i % 4 == 0) {
+      scenario.sources.push_back({msg.address, 2, periods[i % 5], {}});
+    }
+  }
+  for (uint32_t address = 0x210; address < 0x220; address++) {
+    scenario.sources.push_back({address, 1, 5, std::vector<uint8_t>(8, 0x55)});
+  }
+  for (uint32_t address = 0x18DAF100; address < 0x18DAF108; address++) {
+    scenario.sources.push_back({address, 0, 50, std::vector<uint8_t>(8, 0xAA)});
+  }
+  return scenario;
+}
+
+// Toyota radar: 32 tracks at 20 Hz on bus 1, replayed from a log in batches
+// of 100 cycles.
+Scenario radar_scenario() {
+  Scenario scenario = {"radar", "toyota_adas", 1, {}, {}, 100};
+  for (uint32_t address = 0x210; address < 0x230; address++) {
+    scenario.messages.emplace_back(address, 20);
+    scenario.sources.push_back({address, 1, 5, {}});
+  }
+  for (uint32_t address = 0x100; address < 0x140; address++) {
+    scenario.sources.push_back({address, 0, 1 + (int)(address % 5), std::vector<uint8_t>(8, 0x55)});
+  }
+  return scenario;
+}
+
+std::vector<CanData> build_replay(const Scenario &scenario) {
+  const DBC *dbc = dbc_lookup(scenario.dbc_name);
+  CANPacker packer(scenario.dbc_name);
+
+  std::vector<CanData> replay(CYCLES);
+  for (int cycle = 0; cycle < CYCLES; cycle++) {
+    replay[cycle].nanos = (cycle + 1) * CYCLE_NANOS;
+    for (const auto &source : scenario.sources) {
+      if (cycle % source.period != 0) continue;
+      // pack every time so counters and checksums stay valid
+      std::vector<uint8_t> dat = dbc->addr_to_msg.count(source.address) ? packer.pack(source.address, {}) : source.dat;
+      replay[cycle].frames.push_back({source.src, source.address, std::move(dat)});
+    }
+  }
+  return replay;
+}
+
+// CANParser::update as it was before the flat lookup tables and the
+// incremental validity tracking
+class LegacyParser {
+public:
+  bool can_valid = false;
+  std::vector<SignalValue> vals;
+
+  LegacyParser(const Scenario &scenario) : bus(scenario.bus) {
+    const DBC *dbc = dbc_lookup(scenario.dbc_name);
+    bus_timeout_threshold = std::numeric_limits<uint64_t>::max();
+    for (const auto &[address, frequency] : scenario.messages) {
+      const Msg *msg = dbc->addr_to_msg.at(address);
+      MessageState &state = message_states[address];
+      state.name = msg->name;
+      state.address = address;
+      state.size = msg->size;
+      if (frequency > 0) {
+        state.check_threshold = (1000000000ULL / frequency) * 10;
+        bus_timeout_threshold = std::min(bus_timeout_threshold, state.check_threshold);
+      }
+      state.parse_sigs = msg->sigs;
+      state.vals.resize(state.parse_sigs.size());
+      state.all_vals.resize(state.parse_sigs.size());
+      state.compile_plans();
+    }
+  }
+
+  void update(const std::vector<CanData> &can_data) {
+    uint64_t current_nanos = 0;
+    for (const auto &c : can_data) {
+      if (current_nanos == 0) {
+        current_nanos = c.nanos;
+      }
+      last_nanos = c.nanos;
+
+      UpdateCans(c.nanos, c.frames);
+      UpdateValid(last_nanos);
+    }
+    query_latest(current_nanos);
+  }
+
+private:
+  const int bus;
+  std::unordered_map<uint32_t, MessageState> message_states;
+  uint64_t last_nanos = 0;
+  uint64_t last_nonempty_nanos = 0;
+  uint64_t bus_timeout_threshold = 0;
+  uint64_t can_invalid_cnt = CAN_INVALID_CNT;
+  bool bus_timeout = false;
+
+  void UpdateCans(uint64_t nanos, const std::vector<CanFrame> &frames) {
+    bool bus_empty = true;
+    for (const auto &frame : frames) {
+      if (frame.src != bus) continue;
+      bus_empty = false;
+
+      auto state_it = message_states.find(frame.address);
+      if (state_it == message_states.end()) continue;
+      if (frame.dat.size() > 64) continue;
+
+      state_it->second.parse(nanos, frame.dat.data(), frame.dat.size());
+    }
+
+    if (!bus_empty) {
+      last_nonempty_nanos = nanos;
+    }
+    bus_timeout = (nanos - last_nonempty_nanos) > bus_timeout_threshold;
+  }
+
+  void UpdateValid(uint64_t nanos) {
+    bool valid = true;
+    bool counters_valid = true;
+    for (const auto &[_, state] : message_states) {
+      if (state.counter_fail >= MAX_BAD_COUNTER) {
+        counters_valid = false;
+      }
+      const bool missing = state.last_seen_nanos == 0;
+      const bool timed_out = (nanos - state.last_seen_nanos) > state.check_threshold;
+      if (state.check_threshold > 0 && (missing || timed_out)) {
+        valid = false;
+      }
+    }
+    can_invalid_cnt = valid ? 0 : (can_invalid_cnt + 1);
+    can_valid = (can_invalid_cnt < CAN_INVALID_CNT) && counters_valid;
+  }
+
+  void query_latest(uint64_t last_ts) {
+    if (last_ts == 0) {
+      last_ts = last_nanos;
+    }
+    for (auto &[_, state] : message_states) {
+      if (last_ts != 0 && state.last_seen_nanos < last_ts) continue;
+
+      for (size_t i = 0; i < state.parse_sigs.size(); i++) {
+        SignalValue &v = vals.emplace_back();
+        v.address = state.address;
+        v.ts_nanos = state.last_seen_nanos;
+        v.name = state.parse_sigs[i].name;
+        v.value = state.vals[i];
+        v.all_values = state.all_vals[i];
+        state.all_vals[i].clear();
+      }
+    }
+  }
+};
+
+class CurrentParser : public CANParser {
+public:
+  std::vector<SignalValue> vals;
+
+  CurrentParser(const Scenario &scenario) : CANParser(scenario.bus, scenario.dbc_name, scenario.messages) {}
+  void update(const std::vector<CanData> &can_data) { CANParser::update(can_data, vals); }
+};
+
+// best ns/frame over the iterations, with a fresh parser for every replay
+template <typename Parser>
+double time_ns(const Scenario &scenario, const std::vector<std::vector<CanData>> &batches, size_t frames,
+               int iterations, bool &can_valid) {
+  double best_ns = 0;
+  for (int i = 0; i < iterations; i++) {
+    Parser parser(scenario);
+
+    std::chrono::nanoseconds elapsed{0};
+    for (const auto &batch : batches) {
+      parser.vals.clear();
+      auto start = std::chrono::steady_clock::now();
+      parser.update(batch);
+      elapsed += std::chrono::steady_clock::now() - start;
+    }
+    const double ns = (double)elapsed.count() / frames;
+    best_ns = i == 0 ? ns : std::min(best_ns, ns);
+    can_valid = can_valid && parser.can_valid;
+  }
+  return best_ns;
+}
+
+bool run(const Scenario &scenario, int iterations) {
+  const std::vector<CanData> replay = build_replay(scenario);
+  size_t frames = 0;
+  for (const auto &c : replay) {
+    frames += c.frames.size();
+  }
+
+  std::vector<std::vector<CanData>> batches;
+  for (size_t i = 0; i < replay.size(); i += scenario.batch_size) {
+    batches.emplace_back(replay.begin() + i, replay.begin() + std::min(i + scenario.batch_size, replay.size()));
+  }
+
+  bool can_valid = true;
+  const double legacy_ns = time_ns<LegacyParser>(scenario, batches, frames, iterations, can_valid);
+  const double ns = time_ns<CurrentParser>(scenario, batches, frames, iterations, can_valid);
+
+  printf("%-10s %zu frames over %d cycles, %zu tracked messages, %zu cycles per update:  original %5.1f ns/frame  now %5.1f ns/frame  %4.1fx%s\n",
+         scenario.name.c_str(), frames, CYCLES, scenario.messages.size(), scenario.batch_size, legacy_ns, ns,
+         legacy_ns / ns, can_valid ? "" : "  INVALID");
+  return can_valid;
+}
+
+}  // namespace
+
+int main(int argc, char **argv) {
+  const int iterations = argc > 1 ? std::atoi(argv[1]) : 10;
+
+  bool ok = true;
+  for (const auto &scenario : {carstate_scenario(), radar_scenario()}) {
+    ok = run(scenario, iterations) && ok;
+  }
+  return ok ? 0 : 1;
+}
@@ -0,0 +1,136 @@
+// Decodes random payloads for every message of every DBC with the compiled
+// signal plans in MessageState::decode, checks them against the byte-wise
+// get_raw_value, and times both on 64-byte HKG CAN FD and 8-byte Toyota frames.
+//
+// Plans pay off on long frames, where signals span more bytes. Big-endian
+// plans are a byte-swapped word load too, but most signals in 8-byte Toyota
+// frames only span one or two bytes. Those are already cheap byte-wise, so
+// the Toyota timings are close and vary between machines (1.0x to 1.3x).
+//
+// usage: signal_decode_benchmark [iterations]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <string>
+#include <vector>
+
+#include "opendbc/can/common.h"
+#include "opendbc/can/common_dbc.h"
+
+namespace {
+
+MessageState make_state(const Msg &msg) {
+  MessageState state = {
+    .name = msg.name,
+    .address = msg.address,
+    .size = msg.size,
+    .ignore_checksum = true,
+    .ignore_counter = true,
+  };
+  state.parse_sigs = msg.sigs;
+  state.compile_plans();
+  return state;
+}
+
+double legacy_value(const uint8_t *dat, size_t dat_size, const Signal &sig) {
+  int64_t tmp = get_raw_value(dat, dat_size, sig);
+  if (sig.is_signed) {
+    tmp -= ((tmp >> (sig.size-1)) & 0x1) ? (1ULL << sig.size) : 0;
+  }
+  return tmp * sig.factor + sig.offset;
+}
+
+// returns the number of signals that decoded differently
+int check_dbc(const DBC &dbc, std::mt19937 &rng) {
+  int mismatches = 0;
+  std::vector<uint8_t> dat(64);
+  std::vector<double> out;
+  for (const auto &msg : dbc.msgs) {
+    MessageState state = make_state(msg);
+    out.resize(msg.sigs.size());
+    for (int i = 0; i < 200; i++) {
+      // mostly full frames, but also short ones that take the byte-wise path
+      const size_t dat_size = i % 4 == 0 ? rng() % (msg.size + 1) : msg.size;
+      for (auto &b : dat) b = rng();
+
+      bool checksum_failed, counter_failed;
+      state.decode(dat.data(), dat_size, out.data(), 1, checksum_failed, counter_failed);
+      for (size_t j = 0; j < msg.sigs.size(); j++) {
+        const double expected = legacy_value(dat.data(), dat_size, msg.sigs[j]);
+        if (out[j] != expected) {
+          printf("%s: %s.%s decoded %f, expected %f (%zu bytes)\n", dbc.name.c_str(), msg.name.c_str(),
+                 msg.sigs[j].name.c_str(), out[j], expected, dat_size);
+          mismatches++;
+        }
+      }
+    }
+  }
+  return mismatches;
+}
+
+void benchmark(const std::string &dbc_name, int iterations, std::mt19937 &rng) {
+  const DBC *dbc = dbc_lookup(dbc_name);
+
+  std::vector<MessageState> states;
+  std::vector<std::vector<uint8_t>> payloads;
+  size_t signals = 0;
+  for (const auto &msg : dbc->msgs) {
+    states.push_back(make_state(msg));
+    std::vector<uint8_t> &dat = payloads.emplace_back(msg.size);
+    for (auto &b : dat) b = rng();
+    signals += msg.sigs.size();
+  }
+
+  std::vector<double> out(256);
+  volatile double sink = 0;
+  auto time_ns = [&](auto decode) {
+    auto start = std::chrono::steady_clock::now();
+    for (int it = 0; it < iterations; it++) {
+      for (size_t m = 0; m < states.size(); m++) {
+        decode(states[m], payloads[m]);
+        sink = sink + out[0];
+      }
+    }
+    return std::chrono::duration<double, std::nano>(std::chrono::steady_clock::now() - start).count();
+  };
+
+  const double legacy_ns = time_ns([&](MessageState &state, const std::vector<uint8_t> &dat) {
+    for (size_t i = 0; i < state.parse_sigs.size(); i++) {
+      out[i] = legacy_value(dat.data(), dat.size(), state.parse_sigs[i]);
+    }
+  });
+  const double plan_ns = time_ns([&](MessageState &state, const std::vector<uint8_t> &dat) {
+    bool checksum_failed, counter_failed;
+    state.decode(dat.data(), dat.size(), out.data(), 1, checksum_failed, counter_failed);
+  });
+
+  const double frames = (double)states.size() * iterations;
+  printf("%-30s %4zu msgs %5zu sigs  byte-wise %7.1f ns/frame  plans %7.1f ns/frame  %4.1fx\n", dbc_name.c_str(),
+         states.size(), signals, legacy_ns / frames, plan_ns / frames, legacy_ns / plan_ns);
+}
+
+}  // namespace
+
+int main(int argc, char **argv) {
+  const int iterations = argc > 1 ? std::atoi(argv[1]) : 1000;
+  std::mt19937 rng(0);
+
+  std::vector<std::string> names = get_dbc_names();
+  std::sort(names.begin(), names.end());
+  int mismatches = 0;
+  for (const auto &name : names) {
+    mismatches += check_dbc(*dbc_lookup(name), rng);
+  }
+
+  benchmark("hyundai_canfd", iterations, rng);
+  benchmark("toyota_new_mc_pt_generated", iterations, rng);
+
+  if (mismatches > 0) {
+    printf("%d signals decoded differently\n", mismatches);
+    return 1;
+  }
+  return 0;
+}
@@ -1,10 +1,68 @@
 import copy
+import numpy as np
+import os
+import pytest
+import subprocess
+
+from opendbc.can import checksums
 from opendbc.can.parser import CANParser
 from opendbc.can.packer import CANPacker
 
+CHECKSUM_BENCHMARK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checksum_benchmark")
+
 
 class TestCanChecksums:
 
+  @pytest.mark.skipif(not os.path.exists(CHECKSUM_BENCHMARK), reason="built without extras")
+  def test_match_original_implementations(self):
+    # fails if any checksum differs from the original byte-wise or bit-serial implementation
+    subprocess.check_call([CHECKSUM_BENCHMARK, "1"], stdout=subprocess.DEVNULL)
+
+  def test_checksum_module(self):
+    # known-good VW LWI_01 and FCA EPS_2 messages, with the checksum in the first and last byte
+    lwi_01 = [b'\x6b\x00\xbd\x00\x00\x00\x00\x00', b'\xee\x01\x0a\x00\x00\x00\x00\x00', b'\x03\x03\xbe\xa2\x12\x00\x00\x00']
+    eps_2 = [b'\x7c\x43\x57\x60\x00\x00\xa1', b'\x7c\x63\x58\xe0\x00\x01\xd5', b'\x7c\x63\x58\xe0\x00\x02\xf2']
+    for dat in lwi_01:
+      assert checksums.volkswagen_mqb_checksum(0x86, dat) == dat[0]
+    for dat in eps_2:
+      assert checksums.fca_giorgio_checksum(0x106, dat) == dat[-1]
+    lwi_01_array = np.frombuffer(b''.join(lwi_01), dtype=np.uint8).reshape(3, 8)
+    assert checksums.volkswagen_mqb_checksum.batch(0x86, lwi_01_array).tolist() == list(lwi_01_array[:, 0])
+
+    # same checksums as packed by CANPacker
+    packer = CANPacker("toyota_nodsu_pt_generated")
+    for torque in range(-100, 100, 7):
+      _, dat, _ = packer.make_can_msg("STEERING_LKA", 0, {"STEER_TORQUE_CMD": torque})
+      assert checksums.toyota_checksum(0x2e4, dat) == dat[-1]
+
+    # batch matches the scalar functions
+    rng = np.random.default_rng(0)
+    for checksum in (checksums.honda_checksum, checksums.toyota_checksum, checksums.pedal_checksum, checksums.xor_checksum,
+                     checksums.subaru_checksum, checksums.chrysler_checksum, checksums.hkg_can_fd_checksum,
+                     checksums.fca_giorgio_checksum):
+      for size in (1, 8, 32):
+        dat = rng.integers(0, 256, (100, size), dtype=np.uint8)
+        addresses = rng.integers(0, 0x800, 100, dtype=np.uint32)
+        start_bit = 8 if size > 1 else 0
+        expected = [checksum(int(a), d.tobytes(), checksum_start_bit=start_bit) for a, d in zip(addresses, dat, strict=True)]
+        assert checksum.batch(addresses, dat, checksum_start_bit=start_bit).tolist() == expected, checksum
+
+    with pytest.raises(ValueError):
+      checksums.toyota_checksum.batch(0x2e4, np.zeros(8, dtype=np.uint8))
+    with pytest.raises(ValueError):
+      checksums.toyota_checksum.batch([0x2e4, 0x2e5], np.zeros((3, 8), dtype=np.uint8))
+
+    # payloads too short for the checksum are rejected instead of read out of bounds
+    for checksum, dat in ((checksums.volkswagen_mqb_checksum, b""), (checksums.volkswagen_mqb_checksum, b"\x00"),
+                          (checksums.toyota_checksum, b""), (checksums.xor_checksum, b"\x00")):
+      with pytest.raises(ValueError):
+        checksum(0x86, dat, checksum_start_bit=8)
+      with pytest.raises(ValueError):
+        checksum.batch(0x86, np.zeros((3, len(dat)), dtype=np.uint8), checksum_start_bit=8)
+    with pytest.raises(ValueError):
+      checksums.xor_checksum(0x86, b"\x00\x00", checksum_start_bit=-8)
+    assert checksums.volkswagen_mqb_checksum.batch(0x86, np.zeros((0, 8), dtype=np.uint8)).tolist() == []
+
   def verify_checksum(self, subtests, dbc_file: str, msg_name: str, msg_addr: int, test_messages: list[bytes],
                       checksum_field: str = 'CHECKSUM', counter_field = 'COUNTER'):
     """
@@ -28,3 +28,21 @@ class TestCanParserPackerExceptions:
     CANParser(dbc_file, [], 0)
     CANPacker(dbc_file)
     CANDefine(dbc_file)
+
+  @pytest.mark.parametrize("line, error", [
+    ("BO_ 228 STEERING_CONTROL: 5 EON extra", "bad BO"),
+    ("BO_ 228 STEERING_CONTROL 5 EON", "bad BO"),
+    (" SG_ STEER_TORQUE : 7|16@0+ (1,0) [-3840|3840] EPS", "bad SG"),
+    (' SG_ STEER_TORQUE : 7|16@0+ (1;0) [-3840|3840] "" EPS', "bad SG"),
+    (' SG_ STEER_TORQUE M : 7|16@0 (1,0) [-3840|3840] "" EPS', "bad SG"),
+    (' SG_ STEER_TORQUE : 7|16@0+ (1,0) [-3840|3840] ""', "bad SG"),
+    ('VAL_ 228 STEER_TORQUE 1 "" ;', "bad VAL"),
+    ("VAL_ 228 STEER_TORQUE ON OFF ;", "bad VAL"),
+    (' SG_ STEER_TORQUE : 7|16@0- (1,0) [-3840|3840] "" EPS\n SG_ STEER_TORQUE : 23|8@0+ (1,0) [0|1] "" EPS', "Duplicate signal name"),
+    (' SG_ STEER_TORQUE : 505|16@1- (1,0) [-3840|3840] "" EPS', "Signal out of bounds"),
+  ])
+  def test_bad_lines(self, tmp_path, line, error):
+    dbc_file = tmp_path / "bad.dbc"
+    dbc_file.write_text(f"BO_ 228 STEERING_CONTROL: 5 EON\n{line}\n")
+    with pytest.raises(RuntimeError, match=rf"^\[bad.dbc:\d\] {error}"):
+      CANParser(str(dbc_file), [], 0)
@@ -1,5 +1,19 @@
-from opendbc.can.parser import CANParser
-from opendbc.can.tests import ALL_DBCS
+import os
+import pytest
+import subprocess
+import sys
+
+from opendbc.can.parser import CANParser, loaded_dbcs, preload_dbcs
+from opendbc.can.tests import ALL_DBCS, TEST_DBC
+
+PARSER_BENCHMARK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dbc_parser_benchmark")
+DECODE_BENCHMARK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "signal_decode_benchmark")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
+
+TEST_CACHE_DBC = """
+BO_ 100 MSG: 8 XXX
+ SG_ {} : 7|8@0+ (1,0) [0|255] "" XXX
+"""
 
 
 class TestDBCParser:
@@ -19,3 +33,114 @@ class TestDBCParser:
     for dbc in ALL_DBCS:
       with subtests.test(dbc=dbc):
         CANParser(dbc, [], 0)
+
+  @pytest.mark.skipif(not os.path.exists(PARSER_BENCHMARK), reason="built without extras")
+  def test_tokenizer_matches_regex(self):
+    # fails if any DBC parses differently than with the old std::regex parser
+    subprocess.check_call([PARSER_BENCHMARK, "1"], stdout=subprocess.DEVNULL)
+
+  @pytest.mark.skipif(not os.path.exists(DECODE_BENCHMARK), reason="built without extras")
+  def test_signal_plans_match_get_raw_value(self):
+    # fails if any signal of any DBC decodes differently than byte by byte
+    subprocess.check_call([DECODE_BENCHMARK, "1"], stdout=subprocess.DEVNULL)
+
+  def test_preload(self):
+    preload_dbcs(ALL_DBCS + [TEST_DBC, "not_a_dbc"], num_threads=4)
+    loaded = {s["name"]: s for s in loaded_dbcs()}
+    assert set(ALL_DBCS) | {TEST_DBC} <= loaded.keys()
+    assert "not_a_dbc" not in loaded
+    for name in ALL_DBCS:
+      assert loaded[name]["path"].endswith(f"/{name}.dbc")
+      assert loaded[name]["memory_bytes"] > 0
+      assert loaded[name]["load_ms"] >= 0
+
+    # already loaded DBCs aren't loaded again
+    preload_dbcs(ALL_DBCS)
+    assert {s["name"]: s for s in loaded_dbcs()} == loaded
+    CANParser(ALL_DBCS[0], [], 0)
+
+  def test_concurrent_loads(self, tmp_path):
+    bad_dbc = tmp_path / "bad.dbc"
+    bad_dbc.write_text(TEST_CACHE_DBC.format("SIG_A") + TEST_CACHE_DBC.format("SIG_B"))
+
+    # in a fresh process with an empty cache, so every DBC is parsed here
+    code = f"""
+import random, threading
+from opendbc.can.parser import CANDefine, loaded_dbcs, preload_dbcs
+from opendbc.can.tests import ALL_DBCS
+
+errors = []
+def load(preload):
+  names = random.sample(ALL_DBCS, len(ALL_DBCS))
+  try:
+    if preload:
+      preload_dbcs(names, num_threads=4)
+    else:
+      for name in names:
+        CANDefine(name)
+  except Exception as e:
+    errors.append(e)
+
+threads = [threading.Thread(target=load, args=(i % 2 == 0,)) for i in range(6)]
+for t in threads:
+  t.start()
+for t in threads:
+  t.join()
+assert not errors, errors
+assert sorted(s["name"] for s in loaded_dbcs()) == sorted(ALL_DBCS)
+
+# a DBC that fails to parse raises in every lookup, and doesn't stop the others from loading
+for _ in range(2):
+  try:
+    preload_dbcs([{str(bad_dbc)!r}] + ALL_DBCS)
+    raise AssertionError("expected a parse error")
+  except RuntimeError as e:
+    assert "Duplicate message" in str(e), e
+assert len(loaded_dbcs()) == len(ALL_DBCS)
+"""
+    env = {**os.environ, "OPENDBC_CACHE_DIR": str(tmp_path / "cache")}
+    subprocess.check_call([sys.executable, "-c", code], cwd=ROOT, env=env)
+
+  def test_dbc_cache(self, tmp_path):
+    cache_dir = tmp_path / "cache"
+    dbc_file = tmp_path / "cached.dbc"
+
+    def load_signals(env=None):
+      # DBCs are only loaded once per process
+      code = f"from opendbc.can.parser import CANParser; print(*CANParser({str(dbc_file)!r}, [('MSG', 0)], 0).vl['MSG'])"
+      env = env or {**os.environ, "OPENDBC_CACHE_DIR": str(cache_dir)}
+      return subprocess.check_output([sys.executable, "-c", code], cwd=ROOT, env=env, encoding="utf8").split()
+
+    dbc_file.write_text(TEST_CACHE_DBC.format("SIG_A"))
+    assert load_signals() == ["SIG_A"]
+    cache_files = list(cache_dir.iterdir())
+    assert len(cache_files) == 1
+
+    # same mtime and size, but different content: not a cache hit
+    st = dbc_file.stat()
+    dbc_file.write_text(TEST_CACHE_DBC.format("SIG_B"))
+    os.utime(dbc_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert load_signals() == ["SIG_B"]
+
+    # unchanged: a cache hit, the cache isn't written again
+    cache_mtime = cache_files[0].stat().st_mtime_ns
+    assert load_signals() == ["SIG_B"]
+    assert cache_files[0].stat().st_mtime_ns == cache_mtime
+
+    # changed content: re-parsed and cached again
+    dbc_file.write_text(TEST_CACHE_DBC.format("SIG_C"))
+    assert load_signals() == ["SIG_C"]
+    assert list(cache_dir.iterdir()) == cache_files
+
+    # corrupt caches are ignored
+    cache_files[0].write_bytes(cache_files[0].read_bytes()[:-4])
+    assert load_signals() == ["SIG_C"]
+
+    # by default, caches are only read from the one generated at build time
+    home = tmp_path / "home"
+    home.mkdir()
+    env = {k: v for k, v in os.environ.items() if k != "OPENDBC_CACHE_DIR"}
+    env.update(HOME=str(home), XDG_CACHE_HOME=str(home / ".cache"))
+    assert load_signals(env) == ["SIG_C"]
+    assert list(home.iterdir()) == []
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache", "cached.dbc", "home"]
@@ -1,3 +1,5 @@
+import pytest
+
 from opendbc.can.can_define import CANDefine
 from opendbc.can.tests import ALL_DBCS
 
@@ -24,3 +26,20 @@ class TestCADNDefine:
     for dbc in ALL_DBCS:
       with subtests.test(dbc=dbc):
         CANDefine(dbc)
+
+  def test_shared_value_tables(self):
+    dbc_file = "toyota_nodsu_pt_generated"
+    defs = CANDefine(dbc_file)
+    other = CANDefine(dbc_file)
+    assert defs.dv["GEAR_PACKET"]["GEAR"] == {0: 'D', 1: 'S', 8: 'N', 16: 'R', 32: 'P'}
+    assert defs.dv[956]["GEAR"] is defs.dv["GEAR_PACKET"]["GEAR"]
+    assert other.dv["GEAR_PACKET"]["GEAR"] is defs.dv["GEAR_PACKET"]["GEAR"]
+
+    # shared value tables are read-only, and changes to the dicts holding them stay in one CANDefine
+    with pytest.raises(TypeError):
+      defs.dv["GEAR_PACKET"]["GEAR"][64] = "B"
+    defs.dv["GEAR_PACKET"]["GEAR"] = {**defs.dv["GEAR_PACKET"]["GEAR"], 64: "B"}
+    defs.dv["NEW_MSG"] = {}
+    assert 64 not in other.dv["GEAR_PACKET"]["GEAR"]
+    assert "NEW_MSG" not in other.dv
+    assert 64 not in CANDefine(dbc_file).dv["GEAR_PACKET"]["GEAR"]
@@ -1,9 +1,11 @@
+import numpy as np
 import pytest
 import random
 
-from opendbc.can.parser import CANParser
-from opendbc.can.packer import CANPacker
+from opendbc.can.parser import CANDefine, CANParser, CANParserGroup, CAN_FRAME_DTYPE
+from opendbc.can.packer import CANPacker, PreparedMessage
 from opendbc.can.tests import TEST_DBC
+from opendbc.can.tests.test_packer_performance import carcontroller_msgs
 
 MAX_BAD_COUNTER = 5
 
@@ -91,6 +93,30 @@ class TestCanParserPacker:
     parser.update_strings([0, [msg]])
     assert parser.can_valid
 
+  def test_parser_timeouts_can_valid(self):
+    # validity is tracked incrementally, check it against a full recompute every update
+    dbc_file = "toyota_new_mc_pt_generated"
+    msgs = [("WHEEL_SPEEDS", 80), ("STEER_ANGLE_SENSOR", 80), ("PCM_CRUISE", 33), ("GEAR_PACKET", 1), ("BLINKERS_STATE", 0)]
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, msgs, 0)
+    thresholds = {name: (1000000000 // freq) * 10 if freq > 0 else 0 for name, freq in msgs}
+
+    random.seed(0)
+    last_seen = dict.fromkeys(thresholds, 0)
+    invalid_cnt = 5
+    t = int(1e9)
+    for _ in range(5000):
+      # mostly forward, sometimes backwards in time
+      t += random.randint(0, int(100e6)) if random.random() > 0.02 else -random.randint(0, int(200e6))
+      sent = [name for name in thresholds if random.random() < 0.5]
+      parser.update_strings([t, [packer.make_can_msg(name, 0, {}) for name in sent]])
+
+      for name in sent:
+        last_seen[name] = t
+      valid = all(thr == 0 or (last_seen[name] != 0 and (t - last_seen[name]) % 2**64 <= thr) for name, thr in thresholds.items())
+      invalid_cnt = 0 if valid else invalid_cnt + 1
+      assert parser.can_valid == (invalid_cnt < 5)
+
   def test_parser_no_partial_update(self):
     """
     Ensure that the CANParser doesn't partially update messages with invalid signals (COUNTER/CHECKSUM).
@@ -354,3 +380,344 @@ class TestCanParserPacker:
     assert packer.make_can_msg("ACC_CONTROL", 0, {"UNKNOWN_SIGNAL": 0}) == (835, b'\x00\x00\x00\x00\x00\x00\x00N', 0)
     assert packer.make_can_msg("UNKNOWN_MESSAGE", 0, {"UNKNOWN_SIGNAL": 0}) == (0, b'', 0)
     assert packer.make_can_msg(0, 0, {"UNKNOWN_SIGNAL": 0}) == (0, b'', 0)
+
+  def test_decode_batch(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    msgs = [("STEERING_CONTROL", 100), ("VSA_STATUS", 50), ("POWERTRAIN_DATA", 100)]
+    packer = CANPacker(dbc_file)
+    packer_bus1 = CANPacker(dbc_file)
+
+    log = []
+    for i in range(200):
+      t = int(0.01 * i * 1e9)
+      frames = [
+        packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": random.randint(-1000, 1000)}),
+        packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": random.randrange(100)}),
+        packer_bus1.make_can_msg("VSA_STATUS", 1, {"USER_BRAKE": 42}),  # other bus
+        (0x123, b"\x01\x02", 0),  # not tracked
+      ]
+      if i % 20 == 10:
+        # corrupt the checksum
+        addr, dat, bus = frames[0]
+        frames[0] = (addr, dat[:-1] + bytes([dat[-1] ^ 0x1]), bus)
+      log.extend((t, *f) for f in frames)
+
+    width = max(len(f[2]) for f in log)
+    nanos = np.array([f[0] for f in log])
+    addresses = np.array([f[1] for f in log])
+    buses = np.array([f[3] for f in log])
+    lengths = np.array([len(f[2]) for f in log])
+    dat = np.array([list(f[2].ljust(width, b"\x00")) for f in log])
+
+    batch = CANParser(dbc_file, msgs, 0).decode_batch(nanos, addresses, buses, dat, lengths)
+    assert set(batch) == {"STEERING_CONTROL", 228, "VSA_STATUS", 420, "POWERTRAIN_DATA", 380}
+    assert batch["STEERING_CONTROL"] is batch[228]
+
+    # tracked messages without frames are empty
+    powertrain = batch["POWERTRAIN_DATA"]
+    assert len(powertrain["ts_nanos"]) == len(powertrain["checksum_valid"]) == len(powertrain["counter_valid"]) == 0
+    assert "PEDAL_GAS" in powertrain["values"]
+    assert all(len(v) == 0 for v in powertrain["values"].values())
+
+    steer = batch["STEERING_CONTROL"]
+    assert len(steer["ts_nanos"]) == 200
+    assert steer["checksum_valid"].sum() == 190
+    assert steer["counter_valid"].all()
+    assert batch["VSA_STATUS"]["checksum_valid"].all()
+    assert batch["VSA_STATUS"]["counter_valid"].all()
+
+    # same values as parsing frame by frame, with invalid frames flagged instead of dropped
+    parser = CANParser(dbc_file, msgs, 0)
+    for t, addr, dat, bus in log:
+      if bus != 0 or addr not in batch:
+        continue
+      parser.update_strings([t, [(addr, dat, bus)]])
+      msg = batch[addr]
+      row = np.searchsorted(msg["ts_nanos"], t)
+      assert msg["ts_nanos"][row] == t
+      if msg["checksum_valid"][row] and msg["counter_valid"][row]:
+        for sig, values in msg["values"].items():
+          assert values[row] == parser.vl[addr][sig]
+
+  def test_update_frames(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    msgs = [("STEERING_CONTROL", 100), ("VSA_STATUS", 50)]
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, msgs, 0)
+    frames_parser = CANParser(dbc_file, msgs, 0)
+
+    for i in range(100):
+      t = int(0.01 * i * 1e9)
+      msgs = [
+        packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": random.randint(-1000, 1000)}),
+        packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": random.randrange(100)}),
+        packer.make_can_msg("VSA_STATUS", 1, {"USER_BRAKE": 42}),
+      ]
+      frames = np.zeros(len(msgs), dtype=CAN_FRAME_DTYPE)
+      for frame, (addr, dat, bus) in zip(frames, msgs, strict=True):
+        frame["address"] = addr
+        frame["bus"] = bus
+        frame["len"] = len(dat)
+        frame["dat"][:len(dat)] = list(dat)
+
+      # any buffer works, NumPy arrays are read in place and misaligned buffers are copied
+      buf = [frames, frames.tobytes(), memoryview(bytearray(b"\x00" + frames.tobytes()))[1:]][i % 3]
+      assert parser.update_strings([t, msgs]) == frames_parser.update_frames([t, buf])
+      assert parser.vl == frames_parser.vl
+      assert parser.vl_all == frames_parser.vl_all
+      assert parser.ts_nanos == frames_parser.ts_nanos
+      assert parser.can_valid == frames_parser.can_valid
+
+    with pytest.raises(ValueError):
+      frames_parser.update_frames([0, b"\x00" * (CAN_FRAME_DTYPE.itemsize - 1)])
+    with pytest.raises(BufferError):
+      frames_parser.update_frames([0, memoryview(bytes(CAN_FRAME_DTYPE.itemsize * 2))[::2]])
+
+  def test_parser_group(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    configs = [
+      ([("STEERING_CONTROL", 100)], 0),
+      ([("VSA_STATUS", 50), ("POWERTRAIN_DATA", 100)], 0),
+      ([("STEERING_CONTROL", 100)], 2),
+      ([("VSA_STATUS", 50)], 1),
+    ]
+    packer = CANPacker(dbc_file)
+    packer_cam = CANPacker(dbc_file)
+    parsers = [CANParser(dbc_file, msgs, bus) for msgs, bus in configs]
+    group_parsers = [CANParser(dbc_file, msgs, bus) for msgs, bus in configs]
+    group = CANParserGroup(group_parsers)
+
+    for i in range(200):
+      t = int(0.01 * i * 1e9)
+      msgs = [
+        packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": random.randint(-1000, 1000)}),
+        packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": random.randrange(100)}),
+        packer.make_can_msg("SCM_FEEDBACK", 0, {}),
+        packer_cam.make_can_msg("STEERING_CONTROL", 2, {"STEER_TORQUE": random.randint(-1000, 1000)}),
+        packer.make_can_msg("SCM_FEEDBACK", 2, {}),
+        packer.make_can_msg("VSA_STATUS", 3, {}),
+      ]
+      # untracked frames still keep bus 1 from timing out
+      if i < 100:
+        msgs.append(packer.make_can_msg("SCM_FEEDBACK", 1, {}))
+      random.shuffle(msgs)
+
+      updated = [cp.update_strings([t, msgs]) for cp in parsers]
+      assert group.update_strings([t, msgs]) == updated
+      for cp, group_cp in zip(parsers, group_parsers, strict=True):
+        assert cp.vl == group_cp.vl
+        assert cp.vl_all == group_cp.vl_all
+        assert cp.ts_nanos == group_cp.ts_nanos
+        assert cp.can_valid == group_cp.can_valid
+        assert cp.bus_timeout == group_cp.bus_timeout
+
+    assert group.bus_timeout
+    assert not group.can_valid
+
+  def test_extended_addresses(self):
+    # 29-bit addresses are looked up separately from standard 11-bit ones
+    dbc_file = "acura_rdx_2020_can_generated"
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [("LKAS_HUD_B", 0), ("STEERING_CONTROL", 0)], 0)
+
+    for i in range(10):
+      msgs = [
+        packer.make_can_msg("LKAS_HUD_A", 0, {"DTC": 1}),
+        packer.make_can_msg("LKAS_HUD_B", 0, {"DTC": i % 2}),
+        packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": i}),
+        (0x1FFFFFFF, b"\xff" * 8, 0),
+      ]
+      assert parser.update_strings([int(0.01 * i * 1e9), msgs]) == {13275, 0xe4}
+      assert parser.vl["LKAS_HUD_B"]["DTC"] == i % 2
+      assert parser.vl["STEERING_CONTROL"]["STEER_TORQUE"] == i
+
+  def test_lazy_parser(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    msgs = [("STEERING_CONTROL", 100), ("VSA_STATUS", 50), ("POWERTRAIN_DATA", 0)]
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, msgs, 0)
+    lazy_parser = CANParser(dbc_file, msgs, 0, lazy=True)
+    group_parser = CANParser(dbc_file, msgs, 0, lazy=True)
+    group = CANParserGroup([group_parser])
+    assert lazy_parser.vl == parser.vl
+
+    for i in range(100):
+      t = int(0.01 * i * 1e9)
+      msgs = [packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": random.randint(-1000, 1000)})]
+      for _ in range(i % 3):
+        msgs.append(packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": random.randrange(100)}))
+
+      updated = parser.update_strings([t, msgs])
+      assert lazy_parser.update_strings([t, msgs]) == updated
+      assert group.update_strings([t, msgs]) == [updated]
+      for lp in (lazy_parser, group_parser):
+        assert lp.can_valid == parser.can_valid
+        for name in ("STEERING_CONTROL", "VSA_STATUS", 0x1a4):
+          assert lp.vl[name] == parser.vl[name]
+          assert dict(lp.ts_nanos[name].items()) == parser.ts_nanos[name]
+          for sig in lp.vl_all[name]:
+            assert lp.vl_all[name][sig] == parser.vl_all[name][sig]
+
+    view = lazy_parser.vl["STEERING_CONTROL"]
+    assert view is lazy_parser.vl[0xe4]
+    assert "STEER_TORQUE" in view and "NOT_A_SIGNAL" not in view
+    assert view.get("NOT_A_SIGNAL", 1.0) == 1.0
+    with pytest.raises(KeyError):
+      view["NOT_A_SIGNAL"]
+
+  def test_signal_subset(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [("STEERING_CONTROL", 0, ["STEER_TORQUE"]), ("VSA_STATUS", 0)], 0)
+
+    # checksum and counter are always decoded and checked
+    msg = packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 100, "STEER_TORQUE_REQUEST": 1})
+    parser.update_strings([0, [msg]])
+    assert parser.vl["STEERING_CONTROL"] == {"STEER_TORQUE": 100, "COUNTER": 0, "CHECKSUM": msg[1][-1] & 0xf}
+    assert len(parser.vl["VSA_STATUS"]) > 3
+
+    for _ in range(MAX_BAD_COUNTER):
+      parser.update_strings([0, [msg]])
+    assert not parser.can_valid
+
+    with pytest.raises(RuntimeError):
+      CANParser(dbc_file, [("STEERING_CONTROL", 0, ["NOT_A_SIGNAL"])], 0)
+
+  def test_value_labels(self):
+    dbc_file = "toyota_nodsu_pt_generated"
+    shifter_values = CANDefine(dbc_file).dv["GEAR_PACKET"]["GEAR"]
+    packer = CANPacker(dbc_file)
+    msgs = [("GEAR_PACKET", 0), ("BRAKE_MODULE", 0)]
+    parsers = [CANParser(dbc_file, msgs, 0, lazy=lazy, labels={"GEAR_PACKET": ["GEAR"]}) for lazy in (False, True)]
+
+    for gear in (0, 32, 16, 5):
+      msg = packer.make_can_msg("GEAR_PACKET", 0, {"GEAR": gear, "SPORT_ON": 1})
+      for parser in parsers:
+        parser.update_strings([0, [msg]])
+        assert parser.vl["GEAR_PACKET"]["GEAR"] is shifter_values.get(gear)
+        assert parser.vl["GEAR_PACKET"]["SPORT_ON"] == 1
+        assert parser.vl_all["GEAR_PACKET"]["GEAR"] == [gear]
+
+    with pytest.raises(RuntimeError):
+      CANParser(dbc_file, msgs, 0, labels={"GEAR_PACKET": ["COUNTER"]})
+    with pytest.raises(RuntimeError):
+      CANParser(dbc_file, msgs, 0, labels={"PCM_CRUISE": ["CRUISE_ACTIVE"]})
+
+  def test_message_stats(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [("STEERING_CONTROL", 100), ("VSA_STATUS", 0)], 0)
+
+    def send(t, msg):
+      parser.update_strings([int(t * 1e6), [msg]])
+
+    # good frames 10 ms apart, then one 20 ms later
+    for i in range(10):
+      send(10 * (i + 1), packer.make_can_msg("STEERING_CONTROL", 0, {}))
+    send(120, packer.make_can_msg("STEERING_CONTROL", 0, {}))
+
+    msg = packer.make_can_msg("STEERING_CONTROL", 0, {})
+    send(130, (msg[0], msg[1][:-1] + bytes([msg[1][-1] ^ 1]), 0))  # bad checksum
+    send(140, packer.make_can_msg("STEERING_CONTROL", 0, {"COUNTER": 0}))  # counter jump, still valid
+    send(150, (msg[0], bytes(65), 0))  # oversize
+    send(400, packer.make_can_msg("STEERING_CONTROL", 0, {}))  # after a timeout
+
+    stats = parser.message_stats()
+    assert list(stats["address"]) == [0xe4, 0x1a4]
+    assert list(stats["frames"]) == [15, 0]
+    assert list(stats["checksum_failures"]) == [1, 0]
+    assert list(stats["counter_failures"]) == [1, 0]
+    assert list(stats["oversize_frames"]) == [1, 0]
+    assert list(stats["timeouts"]) == [1, 0]
+    assert stats["interval_min_nanos"][0] == 10e6
+    assert stats["interval_max_nanos"][0] == 260e6
+    assert stats["interval_mean_nanos"][0] == pytest.approx(390e6 / 12)
+
+    # timed out at the time of the snapshot
+    parser.update_strings([int(600e6), []])
+    assert parser.message_stats()["timeouts"][0] == 2
+
+  def test_prepared_message(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+    prepared_packer = CANPacker(dbc_file)
+
+    steer = prepared_packer.prepare("STEERING_CONTROL", ("STEER_TORQUE", "STEER_TORQUE_REQUEST"))
+    steer_counter = prepared_packer.prepare(0xe4, ("STEER_TORQUE", "COUNTER"))
+    assert isinstance(steer, PreparedMessage)
+    assert steer.address == 0xe4
+
+    for i in range(100):
+      torque = random.randint(-1000, 1000)
+      if i % 10 == 9:
+        values = {"STEER_TORQUE": torque, "COUNTER": i % 4}
+        prepared = steer_counter.make_can_msg(0, [torque, i % 4])
+      else:
+        values = {"STEER_TORQUE": torque, "STEER_TORQUE_REQUEST": i % 2}
+        prepared = steer.make_can_msg(0, (torque, i % 2))
+      assert prepared == packer.make_can_msg("STEERING_CONTROL", 0, values)
+
+    with pytest.raises(ValueError):
+      steer.make_can_msg(0, [1])
+    with pytest.raises(RuntimeError):
+      packer.prepare("STEERING_CONTROL", ["NOT_A_SIGNAL"])
+    with pytest.raises(RuntimeError):
+      packer.prepare("NOT_A_MESSAGE", [])
+
+    # prepared messages own their resolved signals and keep their packer alive
+    steer = CANPacker(dbc_file).prepare("STEERING_CONTROL", ("STEER_TORQUE", "STEER_TORQUE_REQUEST"))
+    expected = CANPacker(dbc_file).make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 10, "STEER_TORQUE_REQUEST": 1})
+    assert steer.make_can_msg(0, (10, 1)) == expected
+
+  def test_make_can_msgs(self):
+    dbc_file = "hyundai_canfd"
+    packer = CANPacker(dbc_file)
+    batch_packer = CANPacker(dbc_file)
+
+    for frame in range(200):
+      msgs = carcontroller_msgs(frame)
+      # unknown messages pack to an empty payload, like make_can_msg
+      msgs.append(("NOT_A_MESSAGE", 2, {}))
+      expected = [packer.make_can_msg(*m) for m in msgs]
+      assert batch_packer.make_can_msgs(msgs) == expected
+
+    assert batch_packer.make_can_msgs([]) == []
+
+  def test_pack_array(self):
+    for dbc_file, msg, signals in [
+      ("toyota_new_mc_pt_generated", "STEERING_LKA", ("STEER_TORQUE_CMD", "STEER_REQUEST")),
+      ("hyundai_canfd", "LFA", ("TORQUE_REQUEST", "STEER_REQ")),
+      ("vw_mqb_2010", "HCA_01", ("HCA_01_LM_Offset", "HCA_01_Status_HCA")),
+    ]:
+      packer = CANPacker(dbc_file)
+      array_packer = CANPacker(dbc_file)
+
+      count = 300
+      values = {sig: np.random.randint(0, 2, count) for sig in signals}
+      values[signals[0]] = np.random.randint(-200, 200, count)
+      dat = array_packer.pack_array(msg, values)
+      assert dat.dtype == np.uint8 and dat.shape[0] == count
+
+      # counters keep incrementing across calls, like make_can_msg
+      for i in range(count):
+        expected = packer.make_can_msg(msg, 0, {sig: v[i] for sig, v in values.items()})[1]
+        assert dat[i].tobytes() == expected
+      assert array_packer.make_can_msg(msg, 0, {}) == packer.make_can_msg(msg, 0, {})
+
+    # scalars are broadcast and counters can be given per row
+    packer = CANPacker("hyundai_canfd")
+    dat = packer.pack_array("LFA", {"TORQUE_REQUEST": 10, "COUNTER": np.arange(20) % 4})
+    assert dat.shape[0] == 20
+    assert packer.pack_array("SPAS1", {}, count=5).shape[0] == 5
+    assert packer.pack_array("SPAS1", {"COUNTER": []}).shape[0] == 0
+
+    with pytest.raises(ValueError):
+      packer.pack_array("LFA", {"TORQUE_REQUEST": np.zeros(3), "STEER_REQ": np.zeros(4)})
+    with pytest.raises(ValueError):
+      packer.pack_array("LFA", {"TORQUE_REQUEST": 10})
+    with pytest.raises(RuntimeError):
+      packer.pack_array("LFA", {"NOT_A_SIGNAL": np.zeros(3)})
+    with pytest.raises(RuntimeError):
+      packer.pack_array("NOT_A_MESSAGE", {"COUNTER": np.zeros(3)})
+    with pytest.raises(RuntimeError):
+      packer.pack_array(0x7ff00, {}, count=3)
@@ -0,0 +1,89 @@
+import pytest
+import time
+
+from opendbc.can.packer import CANPacker
+
+DBC_NAME = 'hyundai_canfd'
+
+
+def carcontroller_msgs(frame):
+  # the messages a HKG CAN FD CarController.update sends with openpilot longitudinal
+  msgs = []
+  steer = {
+    "LKA_MODE": 2,
+    "LKA_ICON": 2,
+    "TORQUE_REQUEST": frame % 256,
+    "LKA_ASSIST": 0,
+    "STEER_REQ": 1,
+    "STEER_MODE": 0,
+    "HAS_LANE_SAFETY": 0,
+    "NEW_SIGNAL_1": 0,
+    "NEW_SIGNAL_2": 0,
+  }
+  msgs.append(("LFA", 1, steer))
+  msgs.append(("LKAS", 0, steer))
+
+  if frame % 5 == 0:
+    msgs.append(("LFAHDA_CLUSTER", 1, {"HDA_ICON": 1, "LFA_ICON": 2}))
+    msgs.append(("SCC_CONTROL", 1, {
+      "ACCMode": 1,
+      "MainMode_ACC": 1,
+      "StopReq": 0,
+      "aReqValue": 0.5,
+      "aReqRaw": 0.5,
+      "VSetDis": 30,
+      "JerkLowerLimit": 1.0,
+      "JerkUpperLimit": 3.0,
+      "ACC_ObjDist": 1,
+      "ObjValid": 0,
+      "OBJ_STATUS": 2,
+      "SET_ME_2": 0x4,
+      "SET_ME_3": 0x3,
+      "SET_ME_TMP_64": 0x64,
+      "DISTANCE_SETTING": 2,
+    }))
+    msgs.append(("SPAS1", 1, {}))
+    msgs.append(("SPAS2", 1, {"BLINKER_CONTROL": 0}))
+
+  msgs.append(("ADRV_0x51", 0, {}))
+  if frame % 2 == 0:
+    msgs.append(("ADRV_0x160", 1, {'AEB_SETTING': 0x1, 'SET_ME_2': 0x2, 'SET_ME_FF': 0xff, 'SET_ME_FC': 0xfc, 'SET_ME_9': 0x9}))
+  if frame % 5 == 0:
+    msgs.append(("ADRV_0x1ea", 1, {'SET_ME_1C': 0x1c, 'SET_ME_FF': 0xff, 'SET_ME_TMP_F': 0xf, 'SET_ME_TMP_F_2': 0xf}))
+    msgs.append(("ADRV_0x200", 1, {'SET_ME_E1': 0xe1, 'SET_ME_3A': 0x3a}))
+  if frame % 20 == 0:
+    msgs.append(("ADRV_0x345", 1, {'SET_ME_15': 0x15}))
+  if frame % 100 == 0:
+    msgs.append(("ADRV_0x1da", 1, {'SET_ME_22': 0x22, 'SET_ME_41': 0x41}))
+  return msgs
+
+
+@pytest.mark.skip("TODO: varies too much between machines")
+class TestPacker:
+  def _benchmark(self, pack):
+    packer = CANPacker(DBC_NAME)
+    cycles = [carcontroller_msgs(frame) for frame in range(10000)]
+
+    ets = []
+    for _ in range(10):
+      t1 = time.process_time_ns()
+      for msgs in cycles:
+        pack(packer, msgs)
+      t2 = time.process_time_ns()
+      ets.append(t2 - t1)
+
+    et = sum(ets) / len(ets)
+    avg_nanos = et / len(cycles)
+    print(f'{pack.__name__}: {et / 1e6:.1f}ms to pack {len(cycles)} cycles, avg: {avg_nanos:.0f}ns')
+    return avg_nanos
+
+  def test_performance_make_can_msgs(self):
+    def make_can_msg(packer, msgs):
+      return [packer.make_can_msg(*m) for m in msgs]
+
+    def make_can_msgs(packer, msgs):
+      return packer.make_can_msgs(msgs)
+
+    loop_nanos = self._benchmark(make_can_msg)
+    batch_nanos = self._benchmark(make_can_msgs)
+    assert batch_nanos < loop_nanos
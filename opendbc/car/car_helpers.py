@@ -4,7 +4,7 @@ import time
 from opendbc.car import carlog, gen_empty_fingerprint
 from opendbc.car.can_definitions import CanRecvCallable, CanSendCallable
 from opendbc.car.structs import CarParams, CarParamsT
-from opendbc.car.fingerprints import eliminate_incompatible_cars, all_legacy_fingerprint_cars
+from opendbc.car.fingerprints import ALL_FINGERPRINT_CARS_MASK, cars_from_mask, compatible_cars_mask
 from opendbc.car.fw_versions import ObdCallback, get_fw_versions_ordered, get_present_ecus, match_fw_to_car
 from opendbc.car.interfaces import get_interface_attr
 from opendbc.car.mock.values import CAR as MOCK
@@ -42,7 +42,10 @@ interfaces = load_interfaces(interface_names)
 
 def can_fingerprint(can_recv: CanRecvCallable) -> tuple[str | None, dict[int, dict]]:
   finger = gen_empty_fingerprint()
-  candidate_cars = {i: all_legacy_fingerprint_cars() for i in [0, 1]}  # attempt fingerprint on both bus 0 and 1
+  # bitsets of candidate cars, see compatible_cars_mask. attempt fingerprint on both bus 0 and 1
+  candidate_cars = dict.fromkeys([0, 1], ALL_FINGERPRINT_CARS_MASK)
+  # (address, length) pairs already applied to candidate_cars, messages repeat at 10-100Hz
+  applied: dict[int, set[tuple[int, int]]] = {b: set() for b in candidate_cars}
   frame = 0
   car_fingerprint = None
   done = False
@@ -62,17 +65,21 @@ def can_fingerprint(can_recv: CanRecvCallable) -> tuple[str | None, dict[int, di
         for b in candidate_cars:
           # Ignore extended messages and VIN query response.
           if can.src == b and can.address < 0x800 and can.address not in (0x7df, 0x7e0, 0x7e8):
-            candidate_cars[b] = eliminate_incompatible_cars(can, candidate_cars[b])
+            key = (can.address, len(can.dat))
+            if key not in applied[b]:
+              applied[b].add(key)
+              candidate_cars[b] &= compatible_cars_mask(can)
 
       # if we only have one car choice and the time since we got our first
       # message has elapsed, exit
       for b in candidate_cars:
-        if len(candidate_cars[b]) == 1 and frame > FRAME_FINGERPRINT:
+        cc = candidate_cars[b]
+        if cc != 0 and cc & (cc - 1) == 0 and frame > FRAME_FINGERPRINT:
           # fingerprint done
-          car_fingerprint = candidate_cars[b][0]
+          car_fingerprint = cars_from_mask(cc)[0]
 
       # bail if no cars left or we've been waiting for more than 2s
-      failed = (all(len(cc) == 0 for cc in candidate_cars.values()) and frame > FRAME_FINGERPRINT) or frame > 200
+      failed = (all(cc == 0 for cc in candidate_cars.values()) and frame > FRAME_FINGERPRINT) or frame > 200
       succeeded = car_fingerprint is not None
       done = failed or succeeded
 
@@ -24,6 +24,41 @@ def is_valid_for_fingerprint(msg, car_fingerprint: dict[int, int]):
   return (adr in car_fingerprint and car_fingerprint[adr] == len(msg.dat)) or adr >= 0x800
 
 
+def _build_fingerprint_index(fingerprints: dict[str, list[dict[int, int]]]) -> tuple[list[str], dict[tuple[int, int], int]]:
+  """Indexes which cars could have sent each (address, length), as a bitset of
+     car indices. A car is compatible if any of its fingerprints has the message."""
+  cars = list(fingerprints)
+  index: dict[tuple[int, int], int] = {}
+  for i, car_name in enumerate(cars):
+    for fingerprint in fingerprints[car_name]:
+      # add alien debug address
+      for address, length in (fingerprint | _DEBUG_ADDRESS).items():
+        index[(address, length)] = index.get((address, length), 0) | (1 << i)
+  return cars, index
+
+
+_FINGERPRINT_CARS, _FINGERPRINT_INDEX = _build_fingerprint_index(_FINGERPRINTS)
+_FINGERPRINT_BITS = {car_name: 1 << i for i, car_name in enumerate(_FINGERPRINT_CARS)}
+ALL_FINGERPRINT_CARS_MASK = (1 << len(_FINGERPRINT_CARS)) - 1
+
+
+def compatible_cars_mask(msg) -> int:
+  """Returns the bitset of FPv1 cars that could have sent msg, see cars_from_mask."""
+  if msg.address >= 0x800:
+    return ALL_FINGERPRINT_CARS_MASK
+  return _FINGERPRINT_INDEX.get((msg.address, len(msg.dat)), 0)
+
+
+def cars_from_mask(mask: int) -> list[str]:
+  """Returns the cars in a bitset from compatible_cars_mask, in all_legacy_fingerprint_cars order."""
+  cars = []
+  while mask:
+    low_bit = mask & -mask
+    cars.append(_FINGERPRINT_CARS[low_bit.bit_length() - 1])
+    mask ^= low_bit
+  return cars
+
+
 def eliminate_incompatible_cars(msg, candidate_cars):
   """Removes cars that could not have sent msg.
 
@@ -34,18 +69,8 @@ def eliminate_incompatible_cars(msg, candidate_cars):
      Returns:
       A list containing the subset of candidate_cars that could have sent msg.
   """
-  compatible_cars = []
-
-  for car_name in candidate_cars:
-    car_fingerprints = _FINGERPRINTS[car_name]
-
-    for fingerprint in car_fingerprints:
-      # add alien debug address
-      if is_valid_for_fingerprint(msg, fingerprint | _DEBUG_ADDRESS):
-        compatible_cars.append(car_name)
-        break
-
-  return compatible_cars
+  compatible = compatible_cars_mask(msg)
+  return [car_name for car_name in candidate_cars if compatible & _FINGERPRINT_BITS[car_name]]
 
 
 def all_known_cars():
@@ -1,5 +1,7 @@
 from collections import defaultdict
 from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from functools import cache
 from typing import Protocol, TypeVar
 
 from tqdm import tqdm
@@ -52,20 +54,15 @@ class MatchFwToCar(Protocol):
     ...
 
 
-def match_fw_to_car_fuzzy(live_fw_versions: LiveFwVersions, match_brand: str = None, log: bool = True, exclude: str = None) -> set[str]:
-  """Do a fuzzy FW match. This function will return a match, and the number of firmware version
-  that were matched uniquely to that specific car. If multiple ECUs uniquely match to different cars
-  the match is rejected."""
-
-  # Build lookup table from (addr, sub_addr, fw) to list of candidate cars
+@cache
+def _fuzzy_fw_index(match_brand: str | None) -> dict[tuple[int, int | None, bytes], tuple[str, ...]]:
+  """Lookup table from (addr, sub_addr, fw) to the candidate cars of match_brand, or of all brands if
+  None, for match_fw_to_car_fuzzy. Built on first use for each brand."""
   all_fw_versions = defaultdict(list)
   for candidate, fw_by_addr in FW_VERSIONS.items():
     if not is_brand(MODEL_TO_BRAND[candidate], match_brand):
       continue
 
-    if candidate == exclude:
-      continue
-
     for addr, fws in fw_by_addr.items():
       # These ECUs are known to be shared between models (EPS only between hybrid/ICE version)
       # Getting this exactly right isn't crucial, but excluding camera and radar makes it almost
@@ -76,13 +73,25 @@ def match_fw_to_car_fuzzy(live_fw_versions: LiveFwVersions, match_brand: str = N
       for f in fws:
         all_fw_versions[(addr[1], addr[2], f)].append(candidate)
 
+  return {key: tuple(candidates) for key, candidates in all_fw_versions.items()}
+
+
+def match_fw_to_car_fuzzy(live_fw_versions: LiveFwVersions, match_brand: str = None, log: bool = True, exclude: str = None) -> set[str]:
+  """Do a fuzzy FW match. This function will return a match, and the number of firmware version
+  that were matched uniquely to that specific car. If multiple ECUs uniquely match to different cars
+  the match is rejected."""
+
+  all_fw_versions = _fuzzy_fw_index(match_brand)
+
   matched_ecus = set()
   match: str | None = None
   for addr, versions in live_fw_versions.items():
     ecu_key = (addr[0], addr[1])
     for version in versions:
       # All cars that have this FW response on the specified address
-      candidates = all_fw_versions[(*ecu_key, version)]
+      candidates = all_fw_versions.get((*ecu_key, version), ())
+      if exclude is not None:
+        candidates = tuple(c for c in candidates if c != exclude)
 
       if len(candidates) == 1:
         matched_ecus.add(ecu_key)
@@ -102,45 +111,76 @@ def match_fw_to_car_fuzzy(live_fw_versions: LiveFwVersions, match_brand: str = N
     return set()
 
 
-def match_fw_to_car_exact(live_fw_versions: LiveFwVersions, match_brand: str = None, log: bool = True, extra_fw_versions: dict = None) -> set[str]:
-  """Do an exact FW match. Returns all cars that match the given
-  FW versions for a list of "essential" ECUs. If an ECU is not considered
-  essential the FW version can be missing to get a fingerprint, but if it's present it
-  needs to match the database."""
-  if extra_fw_versions is None:
-    extra_fw_versions = {}
+@dataclass
+class _ExactFwEcu:
+  """Bitmaps of the cars in an exact match index that list one ECU"""
+  listed: int = 0
+  missing_ok: int = 0  # cars that still match if the ECU doesn't respond
+  versions: dict[bytes, int] = field(default_factory=dict)  # cars that accept each FW version
 
-  invalid = set()
-  candidates = {c: f for c, f in FW_VERSIONS.items() if
-                is_brand(MODEL_TO_BRAND[c], match_brand)}
 
-  for candidate, fws in candidates.items():
+@cache
+def _exact_fw_index(match_brand: str | None) -> tuple[list[str], dict[str, int], dict[tuple, _ExactFwEcu]]:
+  """Candidate cars of match_brand (all brands if None), their bits, and the bitmaps of every
+  (ecu_type, addr, sub_addr) they list, for match_fw_to_car_exact. Built on first use for each brand."""
+  cars = [c for c in FW_VERSIONS if is_brand(MODEL_TO_BRAND[c], match_brand)]
+  car_bits = {c: 1 << i for i, c in enumerate(cars)}
+  ecus: dict[tuple, _ExactFwEcu] = defaultdict(_ExactFwEcu)
+
+  for candidate in cars:
+    bit = car_bits[candidate]
     config = FW_QUERY_CONFIGS[MODEL_TO_BRAND[candidate]]
-    for ecu, expected_versions in fws.items():
-      expected_versions = expected_versions + extra_fw_versions.get(candidate, {}).get(ecu, [])
+    for ecu, expected_versions in FW_VERSIONS[candidate].items():
       ecu_type = ecu[0]
-      addr = ecu[1:]
-
-      found_versions = live_fw_versions.get(addr, set())
-      if not len(found_versions):
-        # Some models can sometimes miss an ecu, or show on two different addresses
-        # FIXME: this logic can be improved to be more specific, should require one of the two addresses
-        if candidate in config.non_essential_ecus.get(ecu_type, []):
-          continue
-
-        # Ignore non essential ecus
-        if ecu_type not in ESSENTIAL_ECUS:
-          continue
-
       # Virtual debug ecu doesn't need to match the database
       if ecu_type == Ecu.debug:
         continue
 
-      if not any(found_version in expected_versions for found_version in found_versions):
-        invalid.add(candidate)
-        break
+      entry = ecus[ecu]
+      entry.listed |= bit
+      # Some models can sometimes miss an ecu, or show on two different addresses
+      # FIXME: this logic can be improved to be more specific, should require one of the two addresses
+      # Non essential ecus can be missing too
+      if candidate in config.non_essential_ecus.get(ecu_type, []) or ecu_type not in ESSENTIAL_ECUS:
+        entry.missing_ok |= bit
+      for version in expected_versions:
+        entry.versions[version] = entry.versions.get(version, 0) | bit
+
+  return cars, car_bits, dict(ecus)
+
+
+def match_fw_to_car_exact(live_fw_versions: LiveFwVersions, match_brand: str = None, log: bool = True, extra_fw_versions: dict = None) -> set[str]:
+  """Do an exact FW match. Returns all cars that match the given
+  FW versions for a list of "essential" ECUs. If an ECU is not considered
+  essential the FW version can be missing to get a fingerprint, but if it's present it
+  needs to match the database."""
+  if extra_fw_versions is None:
+    extra_fw_versions = {}
 
-  return set(candidates.keys()) - invalid
+  cars, car_bits, ecus = _exact_fw_index(match_brand)
+
+  # cars whose extra FW versions match a responding ECU
+  extra_accepted: dict[tuple, int] = defaultdict(int)
+  for candidate, extra_ecus in extra_fw_versions.items():
+    for ecu, versions in extra_ecus.items():
+      found_versions = live_fw_versions.get(ecu[1:], set())
+      if any(found_version in versions for found_version in found_versions):
+        extra_accepted[ecu] |= car_bits.get(candidate, 0)
+
+  # a car is invalid if any ECU it lists responded without a version it accepts,
+  # or didn't respond and isn't allowed to be missing
+  invalid = 0
+  for ecu, entry in ecus.items():
+    found_versions = live_fw_versions.get(ecu[1:], set())
+    if len(found_versions):
+      accepted = extra_accepted.get(ecu, 0)
+      for found_version in found_versions:
+        accepted |= entry.versions.get(found_version, 0)
+    else:
+      accepted = entry.missing_ok
+    invalid |= entry.listed & ~accepted
+
+  return {c for c in cars if not invalid & car_bits[c]}
 
 
 def match_fw_to_car(fw_versions: list[CarParams.CarFw], vin: str, allow_exact: bool = True,
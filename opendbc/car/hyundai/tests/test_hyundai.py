@@ -12,7 +12,7 @@ from opendbc.car.hyundai.radar_interface import RADAR_START_ADDR
 from opendbc.car.hyundai.values import CAMERA_SCC_CAR, CANFD_CAR, CAN_GEARS, CAR, CHECKSUM, DATE_FW_ECUS, \
                                          HYBRID_CAR, EV_CAR, FW_QUERY_CONFIG, LEGACY_SAFETY_MODE_CAR, CANFD_FUZZY_WHITELIST, \
                                          UNSUPPORTED_LONGITUDINAL_CAR, PLATFORM_CODE_ECUS, HYUNDAI_VERSION_REQUEST_LONG, \
-                                         HyundaiFlags, get_platform_codes
+                                         HyundaiFlags, get_platform_codes, _get_offline_platform_codes
 from opendbc.car.hyundai.fingerprints import FW_VERSIONS
 
 Ecu = CarParams.Ecu
@@ -218,6 +218,14 @@ class TestHyundaiFingerprint:
     assert results == {(b"LX2-S8100", b"220222"), (b"LX2-S8100", b"211103"),
                                (b"ON-S9100", b"190405"), (b"ON-S9100", b"190720")}
 
+  def test_platform_codes_cache(self):
+    # Parsed FW versions are cached, but callers should still get their own results
+    fw = b"\xf1\x00DH LKAS 1.1 -150210"
+    results = get_platform_codes([fw])
+    results.add((b"DH", None))
+    assert get_platform_codes([fw]) == {(b"DH", b"150210")}
+    assert _get_offline_platform_codes((fw,)) == (frozenset({b"DH"}), frozenset({b"150210"}))
+
   def test_fuzzy_excluded_platforms(self):
     # Asserts a list of platforms that will not fuzzy fingerprint with platform codes due to them being shared.
     # This list can be shrunk as we combine platforms and detect features
@@ -1,6 +1,7 @@
 import re
 from dataclasses import dataclass, field
 from enum import Enum, IntFlag
+from functools import cache
 
 from panda import uds
 from opendbc.car import CarSpecs, DbcDict, PlatformConfig, Platforms, dbc_dict
@@ -565,31 +566,54 @@ class Buttons:
   CANCEL = 4  # on newer models, this is a pause/resume button
 
 
+@cache
+def _get_platform_code(fw: bytes) -> tuple[bytes, bytes | None] | None:
+  # Returns the (code-Optional[part], date) of one FW version, cached
+  # since the same offline FW versions are parsed on every fuzzy fingerprint
+  code_match = PLATFORM_CODE_FW_PATTERN.search(fw)
+  if code_match is None:
+    return None
+
+  part_match = PART_NUMBER_FW_PATTERN.search(fw)
+  date_match = DATE_FW_PATTERN.search(fw)
+  code: bytes = code_match.group()
+  part = part_match.group() if part_match else None
+  date = date_match.group() if date_match else None
+  if part is not None:
+    # part number starts with generic ECU part type, add what is specific to platform
+    code += b"-" + part[-5:]
+
+  return code, date
+
+
 def get_platform_codes(fw_versions: list[bytes]) -> set[tuple[bytes, bytes | None]]:
   # Returns unique, platform-specific identification codes for a set of versions
   codes = set()  # (code-Optional[part], date)
   for fw in fw_versions:
-    code_match = PLATFORM_CODE_FW_PATTERN.search(fw)
-    part_match = PART_NUMBER_FW_PATTERN.search(fw)
-    date_match = DATE_FW_PATTERN.search(fw)
-    if code_match is not None:
-      code: bytes = code_match.group()
-      part = part_match.group() if part_match else None
-      date = date_match.group() if date_match else None
-      if part is not None:
-        # part number starts with generic ECU part type, add what is specific to platform
-        code += b"-" + part[-5:]
-
-      codes.add((code, date))
+    platform_code = _get_platform_code(fw)
+    if platform_code is not None:
+      codes.add(platform_code)
   return codes
 
 
+def _split_platform_codes(codes: set[tuple[bytes, bytes | None]]) -> tuple[frozenset[bytes], frozenset[bytes]]:
+  return frozenset(code for code, _ in codes), frozenset(date for _, date in codes if date is not None)
+
+
+@cache
+def _get_offline_platform_codes(fw_versions: tuple[bytes, ...]) -> tuple[frozenset[bytes], frozenset[bytes]]:
+  # Platform codes & dates of the versions of one ECU in the offline database, shared between calls
+  return _split_platform_codes(get_platform_codes(fw_versions))
+
+
 def match_fw_to_car_fuzzy(live_fw_versions, vin, offline_fw_versions) -> set[str]:
   # Non-electric CAN FD platforms often do not have platform code specifiers needed
   # to distinguish between hybrid and ICE. All EVs so far are either exclusively
   # electric or specify electric in the platform code.
   fuzzy_platform_blacklist = {str(c) for c in (CANFD_CAR - EV_CAR - CANFD_FUZZY_WHITELIST)}
   candidates: set[str] = set()
+  # Live FW versions are parsed once for all candidates
+  live_platform_codes = {addr: _split_platform_codes(get_platform_codes(versions)) for addr, versions in live_fw_versions.items()}
 
   for candidate, fws in offline_fw_versions.items():
     # Keep track of ECUs which pass all checks (platform codes, within date range)
@@ -602,14 +626,10 @@ def match_fw_to_car_fuzzy(live_fw_versions, vin, offline_fw_versions) -> set[str
         continue
 
       # Expected platform codes & dates
-      codes = get_platform_codes(expected_versions)
-      expected_platform_codes = {code for code, _ in codes}
-      expected_dates = {date for _, date in codes if date is not None}
+      expected_platform_codes, expected_dates = _get_offline_platform_codes(tuple(expected_versions))
 
       # Found platform codes & dates
-      codes = get_platform_codes(live_fw_versions.get(addr, set()))
-      found_platform_codes = {code for code, _ in codes}
-      found_dates = {date for _, date in codes if date is not None}
+      found_platform_codes, found_dates = live_platform_codes.get(addr, (frozenset(), frozenset()))
 
       # Check platform code + part number matches for any found versions
       if not any(found_platform_code in expected_platform_codes for found_platform_code in found_platform_codes):
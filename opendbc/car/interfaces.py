@@ -17,6 +17,7 @@ from opendbc.car.common.conversions import Conversions as CV
 from opendbc.car.common.simple_kalman import KF1D, get_kalman_gain
 from opendbc.car.common.numpy_fast import clip
 from opendbc.car.values import PLATFORMS
+from opendbc.can.parser import CANParserGroup
 
 GearShifter = structs.CarState.GearShifter
 
@@ -98,6 +99,7 @@ class CarInterfaceBase(ABC):
     self.cp_body = self.CS.get_body_can_parser(CP)
     self.cp_loopback = self.CS.get_loopback_can_parser(CP)
     self.can_parsers = (self.cp, self.cp_cam, self.cp_adas, self.cp_body, self.cp_loopback)
+    self.can_parser_group = CANParserGroup([cp for cp in self.can_parsers if cp is not None])
 
     dbc_name = "" if self.cp is None else self.cp.dbc_name
     self.CC: CarControllerBase = CarController(dbc_name, CP)
@@ -224,16 +226,14 @@ class CarInterfaceBase(ABC):
     return self.CS.update(*self.can_parsers)
 
   def update(self, can_packets: list[tuple[int, list[CanData]]]) -> structs.CarState:
-    # parse can
-    for cp in self.can_parsers:
-      if cp is not None:
-        cp.update_strings(can_packets)
+    # parse can, converting the packets once for all parsers
+    self.can_parser_group.update_strings(can_packets)
 
     # get CarState
     ret = self._update()
 
-    ret.canValid = all(cp.can_valid for cp in self.can_parsers if cp is not None)
-    ret.canTimeout = any(cp.bus_timeout for cp in self.can_parsers if cp is not None)
+    ret.canValid = self.can_parser_group.can_valid
+    ret.canTimeout = self.can_parser_group.bus_timeout
 
     if ret.vEgoCluster == 0.0 and not self.v_ego_cluster_seen:
       ret.vEgoCluster = ret.vEgo
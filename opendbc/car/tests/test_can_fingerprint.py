@@ -1,8 +1,19 @@
+import pytest
+import random
+import time
 from parameterized import parameterized
 
 from opendbc.car.can_definitions import CanData
 from opendbc.car.car_helpers import FRAME_FINGERPRINT, can_fingerprint
-from opendbc.car.fingerprints import _FINGERPRINTS as FINGERPRINTS
+from opendbc.car.fingerprints import _FINGERPRINTS as FINGERPRINTS, _DEBUG_ADDRESS, all_legacy_fingerprint_cars, \
+                                     eliminate_incompatible_cars, is_valid_for_fingerprint
+from opendbc.car.interfaces import get_interface_attr
+
+
+def eliminate_incompatible_cars_reference(msg, candidate_cars):
+  # checks every fingerprint of every candidate, like before the index
+  return [car_name for car_name in candidate_cars
+          if any(is_valid_for_fingerprint(msg, fingerprint | _DEBUG_ADDRESS) for fingerprint in FINGERPRINTS[car_name])]
 
 
 class TestCanFingerprint:
@@ -54,3 +65,56 @@ class TestCanFingerprint:
         car_fingerprint, _ = can_fingerprint(can_recv)
         assert car_fingerprint == car_model
         assert frames == expected_frames + 2  # TODO: fix extra frames
+
+  def test_eliminate_incompatible_cars(self):
+    random.seed(0)
+    addresses = sorted({address for fingerprints in FINGERPRINTS.values() for fp in fingerprints for address in fp})
+    addresses += [1, 0x7ff, 0x800, 0x18daf100]
+    all_cars = all_legacy_fingerprint_cars()
+    for address in addresses:
+      for length in range(9):
+        can = CanData(address=address, dat=b'\x00' * length, src=0)
+        candidates = random.sample(all_cars, random.randint(0, len(all_cars)))
+        assert eliminate_incompatible_cars(can, candidates) == eliminate_incompatible_cars_reference(can, candidates)
+
+  @pytest.mark.skip("TODO: varies too much between machines")
+  def test_replay_benchmark(self):
+    """Replays 1s of each car's fingerprint on both buses, and compares the elimination time per brand"""
+    for brand, fingerprints in get_interface_attr('FINGERPRINTS', ignore_none=True).items():
+      cycles = []
+      for car_model, car_fingerprints in fingerprints.items():
+        for fingerprint in car_fingerprints:
+          can = [CanData(address=address, dat=b'\x00' * length, src=src)
+                 for address, length in fingerprint.items() for src in (0, 1)]
+          cycles.append((car_model, can))
+
+      t = time.perf_counter()
+      for car_model, can in cycles:
+        can_iter = iter([can] * (FRAME_FINGERPRINT + 2))
+        car_fingerprint, _ = can_fingerprint(lambda **kwargs: [next(can_iter, [])])  # noqa: B023
+        assert car_fingerprint == car_model
+      index_time = time.perf_counter() - t
+
+      t = time.perf_counter()
+      for _, can in cycles:
+        candidates = all_legacy_fingerprint_cars()
+        for _ in range(FRAME_FINGERPRINT + 2):
+          for msg in can:
+            candidates = eliminate_incompatible_cars_reference(msg, candidates)
+      reference_time = time.perf_counter() - t
+
+      assert index_time < reference_time, brand
+
+  def test_repeated_addresses(self):
+    # repeats are only applied once per bus, but a new length for a seen address still eliminates cars
+    car_model = "CHEVROLET_BOLT_EUV"
+    fingerprint = FINGERPRINTS[car_model][0]
+    can = [CanData(address=address, dat=b'\x00' * length, src=0) for address, length in fingerprint.items()]
+    address, length = next(iter(fingerprint.items()))
+    changed = [CanData(address=address, dat=b'\x00' * (length + 1), src=0)]
+
+    for cycles, car in (([can] * 150, car_model), ([can] * 50 + [changed] + [can] * 100, None)):
+      can_iter = iter(cycles)
+      car_fingerprint, finger = can_fingerprint(lambda **kwargs: [next(can_iter, [])])  # noqa: B023
+      assert car_fingerprint == car
+      assert finger[0][address] == length
@@ -2,6 +2,7 @@ import pytest
 import random
 import time
 from collections import defaultdict
+from functools import cache
 from parameterized import parameterized
 
 from opendbc.car.can_definitions import CanData
@@ -9,13 +10,72 @@ from opendbc.car.car_helpers import interfaces
 from opendbc.car.structs import CarParams
 from opendbc.car.fingerprints import FW_VERSIONS
 from opendbc.car.fw_versions import ESSENTIAL_ECUS, FW_QUERY_CONFIGS, FUZZY_EXCLUDE_ECUS, VERSIONS, build_fw_dict, \
-                                                match_fw_to_car, get_brand_ecu_matches, get_fw_versions, get_present_ecus
+                                                match_fw_to_car, get_brand_ecu_matches, get_fw_versions, get_present_ecus, \
+                                                match_fw_to_car_fuzzy, match_fw_to_car_exact, is_brand, MODEL_TO_BRAND
 from opendbc.car.vin import get_vin
 
 CarFw = CarParams.CarFw
 Ecu = CarParams.Ecu
 
 
+def match_fw_to_car_exact_reference(live_fw_versions, match_brand=None, extra_fw_versions=None):
+  # checks every ECU of every candidate car, like before the index
+  if extra_fw_versions is None:
+    extra_fw_versions = {}
+
+  invalid = set()
+  candidates = {c: f for c, f in FW_VERSIONS.items() if match_brand is None or MODEL_TO_BRAND[c] == match_brand}
+  for candidate, fws in candidates.items():
+    config = FW_QUERY_CONFIGS[MODEL_TO_BRAND[candidate]]
+    for ecu, expected_versions in fws.items():
+      expected_versions = expected_versions + extra_fw_versions.get(candidate, {}).get(ecu, [])
+      ecu_type = ecu[0]
+      found_versions = live_fw_versions.get(ecu[1:], set())
+      if not len(found_versions):
+        if candidate in config.non_essential_ecus.get(ecu_type, []) or ecu_type not in ESSENTIAL_ECUS:
+          continue
+      if ecu_type == Ecu.debug:
+        continue
+      if not any(found_version in expected_versions for found_version in found_versions):
+        invalid.add(candidate)
+        break
+
+  return set(candidates.keys()) - invalid
+
+
+@cache
+def fuzzy_fw_table_reference(match_brand, exclude):
+  # the lookup table from before the index, which had exclude built in
+  all_fw_versions = defaultdict(list)
+  for candidate, fw_by_addr in FW_VERSIONS.items():
+    if not is_brand(MODEL_TO_BRAND[candidate], match_brand) or candidate == exclude:
+      continue
+    for addr, fws in fw_by_addr.items():
+      if addr[0] in FUZZY_EXCLUDE_ECUS:
+        continue
+      for f in fws:
+        all_fw_versions[(addr[1], addr[2], f)].append(candidate)
+  return all_fw_versions
+
+
+def match_fw_to_car_fuzzy_reference(live_fw_versions, match_brand=None, exclude=None):
+  all_fw_versions = fuzzy_fw_table_reference(match_brand, exclude)
+  matched_ecus = set()
+  match = None
+  for addr, versions in live_fw_versions.items():
+    ecu_key = (addr[0], addr[1])
+    for version in versions:
+      candidates = all_fw_versions.get((*ecu_key, version), [])
+      if len(candidates) == 1:
+        matched_ecus.add(ecu_key)
+        if match is None:
+          match = candidates[0]
+        elif match != candidates[0]:
+          return set()
+
+  return {match} if match and len(matched_ecus) >= 2 else set()
+
+
 class TestFwFingerprint:
   def assertFingerprints(self, candidates, expected):
     candidates = list(candidates)
@@ -46,6 +106,29 @@ class TestFwFingerprint:
         if len(matches) != 0:
           self.assertFingerprints(matches, car_model)
 
+  def test_exact_match_reference(self):
+    # random subsets of each car's ECUs, FW from other cars of the brand, and extra FW versions
+    random.seed(0)
+    for brand, cars in VERSIONS.items():
+      brand_versions = [(ecu, fw) for ecus in cars.values() for ecu, fws in ecus.items() for fw in fws]
+      for car_model, ecus in cars.items():
+        for _ in range(10):
+          live_fw_versions = defaultdict(set)
+          for ecu, fws in ecus.items():
+            if random.random() < 0.8:
+              live_fw_versions[ecu[1:]].add(random.choice(fws))
+          for ecu, fw in random.sample(brand_versions, min(len(brand_versions), random.randint(0, 3))):
+            live_fw_versions[ecu[1:]].add(fw)
+          extra_fw_versions = {car_model: {random.choice(list(ecus)): [b'extra']}}
+          for ecu in extra_fw_versions[car_model]:
+            if random.random() < 0.5:
+              live_fw_versions[ecu[1:]].add(b'extra')
+
+          for match_brand in (brand, None):
+            for extra in (None, extra_fw_versions):
+              expected = match_fw_to_car_exact_reference(live_fw_versions, match_brand, extra)
+              assert match_fw_to_car_exact(live_fw_versions, match_brand, extra_fw_versions=extra) == expected
+
   @parameterized.expand([(b, c, e[c]) for b, e in VERSIONS.items() for c in e])
   def test_custom_fuzzy_match(self, brand, car_model, ecus):
     # Assert brand-specific fuzzy fingerprinting function doesn't disagree with standard fuzzy function
@@ -93,6 +176,25 @@ class TestFwFingerprint:
       elif len(matches):
         self.assertFingerprints(matches, car_model)
 
+  def test_fuzzy_match_reference(self):
+    # random subsets of each car's ECUs, with FW from other cars of the brand
+    random.seed(0)
+    for brand, cars in VERSIONS.items():
+      brand_versions = [(ecu, fw) for ecus in cars.values() for ecu, fws in ecus.items() for fw in fws]
+      for car_model, ecus in cars.items():
+        for _ in range(5):
+          live_fw_versions = defaultdict(set)
+          for ecu, fws in ecus.items():
+            if random.random() < 0.8:
+              live_fw_versions[ecu[1:]].add(random.choice(fws))
+          for ecu, fw in random.sample(brand_versions, min(len(brand_versions), random.randint(0, 2))):
+            live_fw_versions[ecu[1:]].add(fw)
+
+          for match_brand in (brand, None):
+            for exclude in (None, car_model):
+              expected = match_fw_to_car_fuzzy_reference(live_fw_versions, match_brand, exclude)
+              assert match_fw_to_car_fuzzy(live_fw_versions, match_brand, log=False, exclude=exclude) == expected
+
   def test_fw_version_lists(self, subtests):
     for car_model, ecus in FW_VERSIONS.items():
       with subtests.test(car_model=car_model.value):
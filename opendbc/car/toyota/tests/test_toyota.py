@@ -5,7 +5,7 @@ from opendbc.car.fw_versions import build_fw_dict
 from opendbc.car.toyota.fingerprints import FW_VERSIONS
 from opendbc.car.toyota.values import CAR, DBC, TSS2_CAR, ANGLE_CONTROL_CAR, RADAR_ACC_CAR, SECOC_CAR, \
                                                   FW_QUERY_CONFIG, PLATFORM_CODE_ECUS, FUZZY_EXCLUDED_PLATFORMS, \
-                                                  get_platform_codes
+                                                  get_platform_codes, _get_offline_platform_codes
 
 Ecu = CarParams.Ecu
 
@@ -144,6 +144,14 @@ class TestToyotaFingerprint:
     ])
     assert results == {b"F1526-07-1": {b"10", b"40"}, b"8646F-41-04": {b"100"}, b"58-79": {b"000"}}
 
+  def test_platform_codes_cache(self):
+    # Parsed FW versions are cached, but callers should still get their own results
+    fw = b"F152607110\x00\x00\x00\x00\x00\x00"
+    results = get_platform_codes([fw])
+    results[b"F1526-07-1"].add(b"40")
+    assert get_platform_codes([fw]) == {b"F1526-07-1": {b"10"}}
+    assert _get_offline_platform_codes((fw,)) == frozenset({b"F1526-07-1"})
+
   def test_fuzzy_excluded_platforms(self):
     # Asserts a list of platforms that will not fuzzy fingerprint with platform codes due to them being shared.
     platforms_with_shared_codes = set()
@@ -2,6 +2,7 @@ import re
 from collections import defaultdict
 from dataclasses import dataclass, field
 from enum import Enum, IntFlag
+from functools import cache
 
 from opendbc.car import CarSpecs, PlatformConfig, Platforms, AngleRateLimit, dbc_dict
 from opendbc.car.common.conversions import Conversions as CV
@@ -393,52 +394,72 @@ STATIC_DSU_MSGS = [
 ]
 
 
+@cache
+def _get_platform_code(fw: bytes) -> tuple[bytes, bytes] | None:
+  # Returns the Optional[part]-platform-major_version code and sub version of one FW version, cached
+  # since the same offline FW versions are parsed on every fuzzy fingerprint
+
+  # FW versions returned from UDS queries can return multiple fields/chunks of data (different ECU calibrations, different data?)
+  #  and are prefixed with a byte that describes how many chunks of data there are.
+  # But FW returned from KWP requires querying of each sub-data id and does not have a length prefix.
+
+  length_code = 1
+  length_code_match = FW_LEN_CODE.search(fw)
+  if length_code_match is not None:
+    length_code = length_code_match.group()[0]
+    fw = fw[1:]
+
+  # fw length should be multiple of 16 bytes (per chunk, even if no length code), skip parsing if unexpected length
+  if length_code * FW_CHUNK_LEN != len(fw):
+    return None
+
+  chunks = [fw[FW_CHUNK_LEN * i:FW_CHUNK_LEN * i + FW_CHUNK_LEN].strip(b'\x00 ') for i in range(length_code)]
+
+  # only first is considered for now since second is commonly shared (TODO: understand that)
+  first_chunk = chunks[0]
+  if len(first_chunk) == 8:
+    # TODO: no part number, but some short chunks have it in subsequent chunks
+    fw_match = SHORT_FW_PATTERN.search(first_chunk)
+    if fw_match is not None:
+      platform, major_version, sub_version = fw_match.groups()
+      return b'-'.join((platform, major_version)), sub_version
+
+  elif len(first_chunk) == 10:
+    fw_match = MEDIUM_FW_PATTERN.search(first_chunk)
+    if fw_match is not None:
+      part, platform, major_version, sub_version = fw_match.groups()
+      return b'-'.join((part, platform, major_version)), sub_version
+
+  elif len(first_chunk) == 12:
+    fw_match = LONG_FW_PATTERN.search(first_chunk)
+    if fw_match is not None:
+      part, platform, major_version, sub_version = fw_match.groups()
+      return b'-'.join((part, platform, major_version)), sub_version
+
+  return None
+
+
 def get_platform_codes(fw_versions: list[bytes]) -> dict[bytes, set[bytes]]:
   # Returns sub versions in a dict so comparisons can be made within part-platform-major_version combos
   codes = defaultdict(set)  # Optional[part]-platform-major_version: set of sub_version
   for fw in fw_versions:
-    # FW versions returned from UDS queries can return multiple fields/chunks of data (different ECU calibrations, different data?)
-    #  and are prefixed with a byte that describes how many chunks of data there are.
-    # But FW returned from KWP requires querying of each sub-data id and does not have a length prefix.
-
-    length_code = 1
-    length_code_match = FW_LEN_CODE.search(fw)
-    if length_code_match is not None:
-      length_code = length_code_match.group()[0]
-      fw = fw[1:]
-
-    # fw length should be multiple of 16 bytes (per chunk, even if no length code), skip parsing if unexpected length
-    if length_code * FW_CHUNK_LEN != len(fw):
-      continue
-
-    chunks = [fw[FW_CHUNK_LEN * i:FW_CHUNK_LEN * i + FW_CHUNK_LEN].strip(b'\x00 ') for i in range(length_code)]
-
-    # only first is considered for now since second is commonly shared (TODO: understand that)
-    first_chunk = chunks[0]
-    if len(first_chunk) == 8:
-      # TODO: no part number, but some short chunks have it in subsequent chunks
-      fw_match = SHORT_FW_PATTERN.search(first_chunk)
-      if fw_match is not None:
-        platform, major_version, sub_version = fw_match.groups()
-        codes[b'-'.join((platform, major_version))].add(sub_version)
-
-    elif len(first_chunk) == 10:
-      fw_match = MEDIUM_FW_PATTERN.search(first_chunk)
-      if fw_match is not None:
-        part, platform, major_version, sub_version = fw_match.groups()
-        codes[b'-'.join((part, platform, major_version))].add(sub_version)
-
-    elif len(first_chunk) == 12:
-      fw_match = LONG_FW_PATTERN.search(first_chunk)
-      if fw_match is not None:
-        part, platform, major_version, sub_version = fw_match.groups()
-        codes[b'-'.join((part, platform, major_version))].add(sub_version)
+    platform_code = _get_platform_code(fw)
+    if platform_code is not None:
+      codes[platform_code[0]].add(platform_code[1])
 
   return dict(codes)
 
 
+@cache
+def _get_offline_platform_codes(fw_versions: tuple[bytes, ...]) -> frozenset[bytes]:
+  # Platform codes of the versions of one ECU in the offline database, shared between calls
+  return frozenset(get_platform_codes(fw_versions))
+
+
 def match_fw_to_car_fuzzy(live_fw_versions, vin, offline_fw_versions) -> set[str]:
   candidates = set()
+  # Live FW versions are parsed once for all candidates
+  live_platform_codes = {addr: get_platform_codes(versions) for addr, versions in live_fw_versions.items()}
 
   for candidate, fws in offline_fw_versions.items():
     # Keep track of ECUs which pass all checks (platform codes, within sub-version range)
@@ -450,11 +471,11 @@ def match_fw_to_car_fuzzy(live_fw_versions, vin, offline_fw_versions) -> set[str
       if ecu[0] not in PLATFORM_CODE_ECUS:
         continue
 
-      # Expected platform codes & versions
-      expected_platform_codes = get_platform_codes(expected_versions)
+      # Expected platform codes
+      expected_platform_codes = _get_offline_platform_codes(tuple(expected_versions))
 
       # Found platform codes & versions
-      found_platform_codes = get_platform_codes(live_fw_versions.get(addr, set()))
+      found_platform_codes = live_platform_codes.get(addr, {})
 
       # Check part number + platform code + major version matches for any found versions
       # Platform codes and major versions change for different physical parts, generation, API, etc.